@@ -0,0 +1,38 @@
+"""Add analysis session snapshots
+
+Revision ID: 1b0206810992
+Revises: 5e9a1c3f8b27
+Create Date: 2026-10-20 00:12:37.504211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b0206810992'
+down_revision: Union[str, Sequence[str], None] = '5e9a1c3f8b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sessions published before this revision get their snapshot on first read
+    op.create_table('analysis_session_snapshots',
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('format', sa.Integer(), nullable=False),
+    sa.Column('body', sa.LargeBinary(), nullable=False),
+    sa.Column('result_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['analysis_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('session_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('analysis_session_snapshots')
@@ -0,0 +1,49 @@
+"""Clear the thread state of failed thread analyses
+
+Revision ID: 2156810e10c9
+Revises: 3b29a4b939db
+Create Date: 2026-10-21 10:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2156810e10c9'
+down_revision: Union[str, Sequence[str], None] = '3b29a4b939db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_DOCUMENT = sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')
+
+thread_analyses = sa.table('comment_thread_analyses', sa.column('id', sa.Integer),
+                           sa.column('result', JSON_DOCUMENT), sa.column('last_comment_id', sa.Integer))
+
+
+def _is_failed(result) -> bool:
+    steps = result.get('next_steps') if isinstance(result, dict) else None
+    return isinstance(steps, list) and len(steps) == 1 and isinstance(steps[0], dict) and steps[0].get('title') == 'エラー'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Error placeholders were stored with the thread state, so the thread was reported as
+    # unchanged and never analysed again. Without a state (NULL) the next analysis runs the LLM.
+    bind = op.get_bind()
+    failed = [
+        row_id for row_id, result in bind.execute(
+            sa.select(thread_analyses.c.id, thread_analyses.c.result).where(thread_analyses.c.last_comment_id.isnot(None))
+        ) if _is_failed(result)
+    ]
+    if failed:
+        bind.execute(thread_analyses.update().where(thread_analyses.c.id.in_(failed)).values(last_comment_id=None))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Data-only migration; the cleared states are not restored.
+    pass
@@ -0,0 +1,36 @@
+"""Add user directory search and member paging indexes
+
+Revision ID: 2d7a5c18e3f0
+Revises: b6e0f3a8d951
+Create Date: 2026-10-19 19:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7a5c18e3f0'
+down_revision: Union[str, Sequence[str], None] = 'b6e0f3a8d951'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # text_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%' under any collation
+    ops = ' text_pattern_ops' if op.get_bind().dialect.name == 'postgresql' else ''
+    op.create_index('ix_users_email_lower', 'users', [sa.text(f'lower(email){ops}')], unique=False)
+    op.create_index('ix_users_username_lower', 'users', [sa.text(f'lower(username){ops}')], unique=False)
+    op.create_index('ix_organization_members_org_id_id', 'organization_members', ['organization_id', 'id'], unique=False)
+    op.create_index('ix_organization_members_user_id', 'organization_members', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_organization_members_user_id', table_name='organization_members')
+    op.drop_index('ix_organization_members_org_id_id', table_name='organization_members')
+    op.drop_index('ix_users_username_lower', table_name='users')
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,79 @@
+"""Add comment_thread_analyses table
+
+Revision ID: 3b29a4b939db
+Revises: a3b34d4ca5c1
+Create Date: 2026-10-20 11:26:52.630418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b29a4b939db'
+down_revision: Union[str, Sequence[str], None] = 'a3b34d4ca5c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_DOCUMENT = sa.JSON(none_as_null=True).with_variant(postgresql.JSONB(none_as_null=True), 'postgresql')
+
+sessions = sa.table('analysis_sessions', sa.column('id', sa.Integer), sa.column('comment_analysis', JSON_DOCUMENT))
+comments = sa.table('comments', sa.column('id', sa.Integer), sa.column('session_id', sa.Integer))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    thread_analyses = op.create_table('comment_thread_analyses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('parent_comment_id', sa.Integer(), nullable=False),
+    sa.Column('result', JSON_DOCUMENT, nullable=True),
+    sa.Column('last_comment_id', sa.Integer(), nullable=True),
+    sa.Column('comment_count', sa.Integer(), nullable=True),
+    sa.Column('last_edited_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_comment_id'], ['comments.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['session_id'], ['analysis_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_comment_thread_analyses_id'), 'comment_thread_analyses', ['id'], unique=False)
+    op.create_index('uq_comment_thread_analyses_session_parent', 'comment_thread_analyses', ['session_id', 'parent_comment_id'], unique=True)
+
+    # Move the threads out of analysis_sessions.comment_analysis. Without a recorded thread state
+    # (last_comment_id NULL) the next analysis of each thread runs the LLM again.
+    bind = op.get_bind()
+    rows = []
+    for session_id, document in bind.execute(sa.select(sessions.c.id, sessions.c.comment_analysis).where(sessions.c.comment_analysis.isnot(None))):
+        threads = document.get('threads') if isinstance(document, dict) else None
+        if not isinstance(threads, dict):
+            continue
+        comment_ids = set(bind.execute(sa.select(comments.c.id).where(comments.c.session_id == session_id)).scalars())
+        for parent_id, result in threads.items():
+            if str(parent_id).isdigit() and int(parent_id) in comment_ids:
+                rows.append({'session_id': session_id, 'parent_comment_id': int(parent_id), 'result': result, 'comment_count': 0})
+    if rows:
+        op.bulk_insert(thread_analyses, rows)
+
+    op.drop_column('analysis_sessions', 'comment_analysis')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('analysis_sessions', sa.Column('comment_analysis', JSON_DOCUMENT, nullable=True))
+
+    bind = op.get_bind()
+    thread_analyses = sa.table('comment_thread_analyses', sa.column('session_id', sa.Integer),
+                               sa.column('parent_comment_id', sa.Integer), sa.column('result', JSON_DOCUMENT))
+    documents = {}
+    for session_id, parent_id, result in bind.execute(sa.select(thread_analyses.c.session_id, thread_analyses.c.parent_comment_id, thread_analyses.c.result)):
+        documents.setdefault(session_id, {'threads': {}})['threads'][str(parent_id)] = result
+    for session_id, document in documents.items():
+        bind.execute(sessions.update().where(sessions.c.id == session_id).values(comment_analysis=document))
+
+    op.drop_index('uq_comment_thread_analyses_session_parent', table_name='comment_thread_analyses')
+    op.drop_index(op.f('ix_comment_thread_analyses_id'), table_name='comment_thread_analyses')
+    op.drop_table('comment_thread_analyses')
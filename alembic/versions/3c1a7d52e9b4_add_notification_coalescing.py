@@ -0,0 +1,32 @@
+"""Add notification coalescing columns
+
+Revision ID: 3c1a7d52e9b4
+Revises: 9e7e4bb34ab0
+Create Date: 2026-10-19 10:12:03.418220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1a7d52e9b4'
+down_revision: Union[str, Sequence[str], None] = '9e7e4bb34ab0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notifications', sa.Column('count', sa.Integer(), server_default='1', nullable=True))
+    op.add_column('notifications', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing rows: last update is the creation time
+    op.execute("UPDATE notifications SET updated_at = created_at WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notifications', 'updated_at')
+    op.drop_column('notifications', 'count')
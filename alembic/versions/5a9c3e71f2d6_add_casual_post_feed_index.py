@@ -0,0 +1,35 @@
+"""Add casual post replies_count and feed index
+
+Revision ID: 5a9c3e71f2d6
+Revises: d4f81a6c2b73
+Create Date: 2026-10-19 16:41:27.506318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9c3e71f2d6'
+down_revision: Union[str, Sequence[str], None] = 'd4f81a6c2b73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('casual_posts', sa.Column('replies_count', sa.Integer(), server_default='0', nullable=True))
+    # Backfill from existing replies
+    op.execute(
+        "UPDATE casual_posts SET replies_count = ("
+        "SELECT COUNT(*) FROM casual_posts AS r WHERE r.parent_id = casual_posts.id)"
+    )
+    op.create_index('ix_casual_posts_org_created_id', 'casual_posts', ['organization_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_casual_posts_org_created_id', table_name='casual_posts')
+    op.drop_column('casual_posts', 'replies_count')
@@ -0,0 +1,120 @@
+"""Add organization dashboard rollup tables
+
+Revision ID: 5e9a1c3f8b27
+Revises: c41e8b2d7f05
+Create Date: 2026-10-19 23:05:41.118392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e9a1c3f8b27'
+down_revision: Union[str, Sequence[str], None] = 'c41e8b2d7f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('organization_daily_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('stat_date', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('subject_id', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_organization_daily_stats_id'), 'organization_daily_stats', ['id'], unique=False)
+    op.create_index('uq_organization_daily_stats_key', 'organization_daily_stats', ['organization_id', 'metric', 'subject_id', 'stat_date'], unique=True)
+    op.create_index('ix_organization_daily_stats_metric_date', 'organization_daily_stats', ['metric', 'stat_date'], unique=False)
+    op.create_table('organization_stats',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id', 'metric')
+    )
+    op.create_table('organization_member_activity',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_active_on', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id', 'user_id')
+    )
+    op.create_index('ix_organization_member_activity_org_date', 'organization_member_activity', ['organization_id', 'last_active_on'], unique=False)
+
+    # Backfill from existing data (same rules as backend.services.rollup_service.rebuild_rollups)
+    op.execute(
+        "INSERT INTO organization_daily_stats (organization_id, stat_date, metric, subject_id, value) "
+        "SELECT organization_id, day, 'survey_responses', survey_id, SUM(n) FROM ("
+        "  SELECT s.organization_id, date(p.created_at) AS day, p.survey_id, COUNT(*) AS n "
+        "  FROM survey_participations p JOIN surveys s ON s.id = p.survey_id "
+        "  GROUP BY s.organization_id, date(p.created_at), p.survey_id "
+        "  UNION ALL "
+        "  SELECT s.organization_id, date(a.created_at), a.survey_id, COUNT(DISTINCT a.created_at) "
+        "  FROM answers a JOIN surveys s ON s.id = a.survey_id WHERE a.user_id IS NULL "
+        "  GROUP BY s.organization_id, date(a.created_at), a.survey_id"
+        ") r WHERE organization_id IS NOT NULL AND day IS NOT NULL GROUP BY organization_id, day, survey_id"
+    )
+    op.execute(
+        "INSERT INTO organization_daily_stats (organization_id, stat_date, metric, subject_id, value) "
+        "SELECT s.organization_id, date(a.created_at), 'survey_answers', a.survey_id, COUNT(*) "
+        "FROM answers a JOIN surveys s ON s.id = a.survey_id "
+        "WHERE s.organization_id IS NOT NULL AND a.created_at IS NOT NULL AND a.content IS NOT NULL AND a.content <> '' "
+        "GROUP BY s.organization_id, date(a.created_at), a.survey_id"
+    )
+    op.execute(
+        "INSERT INTO organization_daily_stats (organization_id, stat_date, metric, subject_id, value) "
+        "SELECT organization_id, date(created_at), 'casual_posts', 0, COUNT(*) FROM casual_posts "
+        "WHERE created_at IS NOT NULL GROUP BY organization_id, date(created_at)"
+    )
+    op.execute(
+        "INSERT INTO organization_daily_stats (organization_id, stat_date, metric, subject_id, value) "
+        "SELECT se.organization_id, date(c.created_at), 'session_comments', c.session_id, COUNT(*) "
+        "FROM comments c JOIN analysis_sessions se ON se.id = c.session_id "
+        "WHERE se.organization_id IS NOT NULL AND c.created_at IS NOT NULL "
+        "GROUP BY se.organization_id, date(c.created_at), c.session_id"
+    )
+    op.execute(
+        "INSERT INTO organization_stats (organization_id, metric, value) "
+        "SELECT organization_id, metric, SUM(value) FROM organization_daily_stats GROUP BY organization_id, metric"
+    )
+    op.execute(
+        "INSERT INTO organization_stats (organization_id, metric, value) "
+        "SELECT organization_id, status, COUNT(*) FROM ("
+        "  SELECT organization_id, CASE "
+        "    WHEN approval_status IN ('pending', 'rejected') THEN 'surveys_' || approval_status "
+        "    WHEN is_active THEN 'surveys_active' ELSE 'surveys_closed' END AS status "
+        "  FROM surveys WHERE organization_id IS NOT NULL"
+        ") s GROUP BY organization_id, status"
+    )
+    op.execute(
+        "INSERT INTO organization_member_activity (organization_id, user_id, last_active_on) "
+        "SELECT a.organization_id, a.user_id, MAX(a.day) FROM ("
+        "  SELECT s.organization_id, p.user_id, date(p.created_at) AS day "
+        "  FROM survey_participations p JOIN surveys s ON s.id = p.survey_id "
+        "  UNION ALL SELECT organization_id, user_id, date(created_at) FROM casual_posts "
+        "  UNION ALL SELECT se.organization_id, c.user_id, date(c.created_at) "
+        "  FROM comments c JOIN analysis_sessions se ON se.id = c.session_id"
+        ") a WHERE a.day IS NOT NULL AND EXISTS ("
+        "  SELECT 1 FROM organization_members m WHERE m.organization_id = a.organization_id AND m.user_id = a.user_id"
+        ") GROUP BY a.organization_id, a.user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_organization_member_activity_org_date', table_name='organization_member_activity')
+    op.drop_table('organization_member_activity')
+    op.drop_table('organization_stats')
+    op.drop_index('ix_organization_daily_stats_metric_date', table_name='organization_daily_stats')
+    op.drop_index('uq_organization_daily_stats_key', table_name='organization_daily_stats')
+    op.drop_index(op.f('ix_organization_daily_stats_id'), table_name='organization_daily_stats')
+    op.drop_table('organization_daily_stats')
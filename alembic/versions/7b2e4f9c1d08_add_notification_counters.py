@@ -0,0 +1,39 @@
+"""Add notification_counters table
+
+Revision ID: 7b2e4f9c1d08
+Revises: 3c1a7d52e9b4
+Create Date: 2026-10-19 11:02:47.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e4f9c1d08'
+down_revision: Union[str, Sequence[str], None] = '3c1a7d52e9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Seed counters from the current unread notifications
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread_count) "
+        "SELECT user_id, COUNT(*) FROM notifications "
+        "WHERE is_read = false AND user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_counters')
@@ -0,0 +1,41 @@
+"""Add casual_daily_digests table
+
+Revision ID: 8c4d2b9e6f13
+Revises: e18b6d4a7c25
+Create Date: 2026-10-19 17:38:09.120774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4d2b9e6f13'
+down_revision: Union[str, Sequence[str], None] = 'e18b6d4a7c25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('casual_daily_digests',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('digest_date', sa.Date(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=True),
+    sa.Column('topics_json', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_casual_daily_digests_id'), 'casual_daily_digests', ['id'], unique=False)
+    op.create_index('uq_casual_daily_digests_org_date', 'casual_daily_digests', ['organization_id', 'digest_date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_casual_daily_digests_org_date', table_name='casual_daily_digests')
+    op.drop_index(op.f('ix_casual_daily_digests_id'), table_name='casual_daily_digests')
+    op.drop_table('casual_daily_digests')
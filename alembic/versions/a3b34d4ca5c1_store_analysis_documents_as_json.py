@@ -0,0 +1,66 @@
+"""Store analysis documents as JSON
+
+Revision ID: a3b34d4ca5c1
+Revises: 1b0206810992
+Create Date: 2026-10-20 09:41:18.227046
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3b34d4ca5c1'
+down_revision: Union[str, Sequence[str], None] = '1b0206810992'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DOCUMENT_COLUMNS = [
+    ('issue_definitions', 'content'),
+    ('analysis_sessions', 'comment_analysis'),
+    ('casual_analyses', 'result_json'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == 'postgresql'
+    if is_postgresql:
+        # A plain ::jsonb cast aborts the ALTER on the first row that is not valid JSON. Rows the
+        # old code ignored (empty or invalid JSON) become NULL instead, as on SQLite below.
+        op.execute("""
+            CREATE FUNCTION pg_temp.try_jsonb(doc text) RETURNS jsonb LANGUAGE plpgsql IMMUTABLE AS $$
+            BEGIN
+                RETURN doc::jsonb;
+            EXCEPTION WHEN invalid_text_representation THEN
+                RETURN NULL;
+            END
+            $$
+        """)
+    for table, col in DOCUMENT_COLUMNS:
+        if is_postgresql:
+            op.alter_column(table, col, type_=postgresql.JSONB(), existing_type=sa.Text(),
+                            postgresql_using=f"pg_temp.try_jsonb({col})")
+            # Mock analyses stored the issue list JSON-encoded twice (a JSON string holding the array)
+            op.execute(f"UPDATE {table} SET {col} = pg_temp.try_jsonb({col} #>> '{{}}') "
+                       f"WHERE jsonb_typeof({col}) = 'string' AND pg_temp.try_jsonb({col} #>> '{{}}') IS NOT NULL")
+        else:
+            # SQLite keeps the TEXT column; SQLAlchemy's JSON type reads and writes the same text.
+            # Rows the old code ignored (empty or invalid JSON) become NULL so they decode.
+            op.execute(f"UPDATE {table} SET {col} = NULL WHERE {col} IS NOT NULL AND NOT json_valid({col})")
+            op.execute(f"UPDATE {table} SET {col} = json_extract({col}, '$') "
+                       f"WHERE json_type({col}) = 'text' AND json_valid(json_extract({col}, '$'))")
+    if is_postgresql:
+        op.execute("DROP FUNCTION pg_temp.try_jsonb(text)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, col in DOCUMENT_COLUMNS:
+        op.alter_column(table, col, type_=sa.Text(), existing_type=postgresql.JSONB(),
+                        postgresql_using=f"{col}::text")
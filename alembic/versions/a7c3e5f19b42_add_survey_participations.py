@@ -0,0 +1,62 @@
+"""Add survey_participations and survey/question response counters
+
+Revision ID: a7c3e5f19b42
+Revises: f3b9d2c7a614
+Create Date: 2026-10-19 20:21:37.941025
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5f19b42'
+down_revision: Union[str, Sequence[str], None] = 'f3b9d2c7a614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('survey_participations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('survey_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['survey_id'], ['surveys.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_survey_participations_id'), 'survey_participations', ['id'], unique=False)
+    op.create_index('uq_survey_participations_survey_user', 'survey_participations', ['survey_id', 'user_id'], unique=True)
+    op.add_column('surveys', sa.Column('response_count', sa.Integer(), server_default='0', nullable=True))
+    op.add_column('questions', sa.Column('answer_count', sa.Integer(), server_default='0', nullable=True))
+
+    # Backfill from existing answers
+    op.execute(
+        "INSERT INTO survey_participations (survey_id, user_id, created_at) "
+        "SELECT survey_id, user_id, MIN(created_at) FROM answers "
+        "WHERE user_id IS NOT NULL AND survey_id IS NOT NULL GROUP BY survey_id, user_id"
+    )
+    # Logged-in respondents plus guest/imported responses (grouped by timestamp, as in the CSV export)
+    op.execute(
+        "UPDATE surveys SET response_count = "
+        "(SELECT COUNT(*) FROM survey_participations p WHERE p.survey_id = surveys.id) + "
+        "(SELECT COUNT(DISTINCT a.created_at) FROM answers a WHERE a.survey_id = surveys.id AND a.user_id IS NULL)"
+    )
+    op.execute(
+        "UPDATE questions SET answer_count = ("
+        "SELECT COUNT(*) FROM answers a WHERE a.question_id = questions.id "
+        "AND a.content IS NOT NULL AND a.content <> '')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('questions', 'answer_count')
+    op.drop_column('surveys', 'response_count')
+    op.drop_index('uq_survey_participations_survey_user', table_name='survey_participations')
+    op.drop_index(op.f('ix_survey_participations_id'), table_name='survey_participations')
+    op.drop_table('survey_participations')
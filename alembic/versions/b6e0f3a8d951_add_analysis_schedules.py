@@ -0,0 +1,43 @@
+"""Add analysis_schedules table
+
+Revision ID: b6e0f3a8d951
+Revises: 8c4d2b9e6f13
+Create Date: 2026-10-19 18:12:55.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e0f3a8d951'
+down_revision: Union[str, Sequence[str], None] = '8c4d2b9e6f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analysis_schedules',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('is_enabled', sa.Boolean(), nullable=True),
+    sa.Column('run_hour', sa.Integer(), nullable=True),
+    sa.Column('casual_enabled', sa.Boolean(), nullable=True),
+    sa.Column('casual_window_days', sa.Integer(), nullable=True),
+    sa.Column('casual_interval_days', sa.Integer(), nullable=True),
+    sa.Column('last_casual_run_at', sa.DateTime(), nullable=True),
+    sa.Column('survey_enabled', sa.Boolean(), nullable=True),
+    sa.Column('survey_answer_threshold', sa.Integer(), nullable=True),
+    sa.Column('survey_progress_json', sa.Text(), nullable=True),
+    sa.Column('last_run_date', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('analysis_schedules')
@@ -0,0 +1,29 @@
+"""Add email_outbox.claimed_at
+
+Revision ID: b8bd5cbe8b77
+Revises: 2156810e10c9
+Create Date: 2026-10-21 11:03:27.904615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8bd5cbe8b77'
+down_revision: Union[str, Sequence[str], None] = '2156810e10c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows already in 'sending' keep NULL, which the worker treats as an expired lease
+    op.add_column('email_outbox', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('email_outbox', 'claimed_at')
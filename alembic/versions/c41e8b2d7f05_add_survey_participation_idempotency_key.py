@@ -0,0 +1,28 @@
+"""Add idempotency_key to survey_participations
+
+Revision ID: c41e8b2d7f05
+Revises: a7c3e5f19b42
+Create Date: 2026-10-19 21:48:12.503617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e8b2d7f05'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e5f19b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('survey_participations', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('survey_participations', 'idempotency_key')
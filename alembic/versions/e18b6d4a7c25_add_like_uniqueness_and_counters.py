@@ -0,0 +1,51 @@
+"""Add unique like indexes and comment likes_count
+
+Revision ID: e18b6d4a7c25
+Revises: 5a9c3e71f2d6
+Create Date: 2026-10-19 17:05:42.913376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18b6d4a7c25'
+down_revision: Union[str, Sequence[str], None] = '5a9c3e71f2d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop duplicate likes left by concurrent toggles before enforcing uniqueness
+    op.execute(
+        "DELETE FROM casual_post_likes WHERE id NOT IN ("
+        "SELECT MIN(id) FROM casual_post_likes GROUP BY post_id, user_id)"
+    )
+    op.execute(
+        "DELETE FROM comment_likes WHERE id NOT IN ("
+        "SELECT MIN(id) FROM comment_likes GROUP BY comment_id, user_id)"
+    )
+    op.create_index('uq_casual_post_likes_post_user', 'casual_post_likes', ['post_id', 'user_id'], unique=True)
+    op.create_index('uq_comment_likes_comment_user', 'comment_likes', ['comment_id', 'user_id'], unique=True)
+
+    op.add_column('comments', sa.Column('likes_count', sa.Integer(), server_default='0', nullable=True))
+    # Counters are rebuilt from the like rows (casual_posts.likes_count may have lost updates)
+    op.execute(
+        "UPDATE comments SET likes_count = ("
+        "SELECT COUNT(*) FROM comment_likes WHERE comment_likes.comment_id = comments.id)"
+    )
+    op.execute(
+        "UPDATE casual_posts SET likes_count = ("
+        "SELECT COUNT(*) FROM casual_post_likes WHERE casual_post_likes.post_id = casual_posts.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('comments', 'likes_count')
+    op.drop_index('uq_comment_likes_comment_user', table_name='comment_likes')
+    op.drop_index('uq_casual_post_likes_post_user', table_name='casual_post_likes')
@@ -0,0 +1,57 @@
+"""Add indexes for hot endpoint filters
+
+Revision ID: f3b9d2c7a614
+Revises: 2d7a5c18e3f0
+Create Date: 2026-10-19 19:48:12.730561
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2c7a614'
+down_revision: Union[str, Sequence[str], None] = '2d7a5c18e3f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_answers_question_id', 'answers', ['question_id']),
+    ('ix_answers_survey_user', 'answers', ['survey_id', 'user_id']),
+    ('ix_comments_session_id_id', 'comments', ['session_id', 'id']),
+    ('ix_comments_parent_id', 'comments', ['parent_id']),
+    ('ix_notifications_user_updated', 'notifications', ['user_id', 'updated_at']),
+    ('ix_organization_members_user_org', 'organization_members', ['user_id', 'organization_id']),
+    ('ix_analysis_results_session_id_id', 'analysis_results', ['session_id', 'id']),
+]
+# Superseded by ix_organization_members_user_org (same leading column)
+REPLACED_INDEX = ('ix_organization_members_user_id', 'organization_members', ['user_id'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY avoids blocking writes on large tables, but cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+            op.drop_index(REPLACED_INDEX[0], table_name=REPLACED_INDEX[1], postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+        op.drop_index(REPLACED_INDEX[0], table_name=REPLACED_INDEX[1])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(REPLACED_INDEX[0], REPLACED_INDEX[1], REPLACED_INDEX[2], unique=False, postgresql_concurrently=True)
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        op.create_index(REPLACED_INDEX[0], REPLACED_INDEX[1], REPLACED_INDEX[2], unique=False)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie, Request
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 JST = timezone(timedelta(hours=9))
@@ -7,7 +8,13 @@ import secrets
 import os
 
 from backend.database import SessionLocal, User, UserSession, get_db
-from backend.security_utils import verify_password_safe, validate_password_strength, hash_pass
+from backend.security_utils import (
+    verify_password_bounded, validate_password_strength, hash_pass,
+    PasswordVerifierBusy, login_ip_limiter, login_account_limiter
+)
+from backend.services.metrics import metrics
+from backend.services.response_cache import response_cache, cached_json_response, CachedBody, MY_ORGS
+import math
 import bcrypt
 
 
@@ -36,28 +43,82 @@ class UserResponse(BaseModel):
     current_org_id: int | None = None
     org_role: str | None = None
 
-@router.post("/login")
-def login(login_data: LoginRequest, response: Response, db: Session = Depends(get_db)):
-    # Fetch user for verification
-    user = db.query(User).filter(User.email == login_data.username).first()
+def _client_ip(request: Request) -> str:
+    # Behind nginx the peer address is the proxy, so prefer the forwarded header
+    return request.headers.get("X-Real-IP") or (request.client.host if request.client else "unknown")
 
-    # Verify Password Safe (Timing Attack Resistant)
-    # If user is None, verify_password_safe handles it safely (using dummy hash if available or random delay).
-    if not verify_password_safe(login_data.password, user.password_hash if user else None):
-        raise HTTPException(status_code=401, detail="メールアドレスまたはパスワードが正しくありません")
-        
-    if not user: # Should be caught by verify_password_safe logic returning False, but explicit check for flow
-        raise HTTPException(status_code=401, detail="メールアドレスまたはパスワードが正しくありません")
+def _raise_throttled(retry_after: float):
+    raise HTTPException(
+        status_code=429,
+        detail="ログイン試行が多すぎます。しばらくしてから再度お試しください",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
 
-    # Create Session
+def _load_login_user(db: Session, email: str):
+    """The user's response fields and password hash, or (None, None). Nothing stays lazy-loaded."""
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        db.rollback()
+        return None, None
+    user_data = {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "role": user.role,
+        "must_change_password": user.must_change_password
+    }
+    password_hash = user.password_hash
+    # Return the DB connection to the pool while waiting on bcrypt
+    db.rollback()
+    return user_data, password_hash
+
+def _create_login_session(db: Session, user_id: int) -> str:
     session_token = secrets.token_urlsafe(32)
     
     # Session valid for 7 days
     expires_at = (datetime.now(JST) + timedelta(days=7)).replace(tzinfo=None)
     
-    db_session = UserSession(id=session_token, user_id=user.id, expires_at=expires_at)
+    db_session = UserSession(id=session_token, user_id=user_id, expires_at=expires_at)
     db.add(db_session)
     db.commit()
+    return session_token
+
+@router.post("/login")
+async def login(login_data: LoginRequest, request: Request, response: Response, db: Session = Depends(get_db)):
+    # async so that waiting on bcrypt does not hold a threadpool thread; DB work runs in the threadpool
+    metrics.increment("auth.login.attempts")
+
+    # Throttle before touching the DB or bcrypt so floods stay cheap
+    retry_after = login_ip_limiter.try_acquire(_client_ip(request))
+    if not retry_after:
+        retry_after = login_account_limiter.try_acquire(login_data.username.strip().lower())
+    if retry_after:
+        metrics.increment("auth.login.throttled")
+        _raise_throttled(retry_after)
+
+    # Fetch user for verification
+    user, password_hash = await run_in_threadpool(_load_login_user, db, login_data.username)
+
+    # Verify Password Safe (Timing Attack Resistant)
+    # If user is None, the check runs against a dummy hash so timing does not reveal unknown accounts.
+    try:
+        verified = await verify_password_bounded(login_data.password, password_hash)
+    except PasswordVerifierBusy:
+        metrics.increment("auth.login.busy")
+        raise HTTPException(
+            status_code=503,
+            detail="ログインが混み合っています。しばらくしてから再度お試しください",
+            headers={"Retry-After": "5"}
+        )
+
+    if not verified or not user:
+        metrics.increment("auth.login.failure")
+        raise HTTPException(status_code=401, detail="メールアドレスまたはパスワードが正しくありません")
+
+    metrics.increment("auth.login.success")
+
+    # Create Session
+    session_token = await run_in_threadpool(_create_login_session, db, user["id"])
 
     # Set Cookie
     response.set_cookie(
@@ -71,13 +132,7 @@ def login(login_data: LoginRequest, response: Response, db: Session = Depends(ge
 
     return {
         "message": "ログインに成功しました",
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "username": user.username,
-            "role": user.role,
-            "must_change_password": user.must_change_password
-        }
+        "user": user
     }
 
 @router.post("/logout")
@@ -197,11 +252,8 @@ def switch_org(
     return {"message": f"組織 {target_org_id} に切り替えました"}
 
 
-@router.get("/my-orgs")
-def get_my_orgs(
-    current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def list_my_organizations(db: Session, current_user: UserResponse):
+    """Organizations the user can switch to (shared by /my-orgs and the dashboard bootstrap)."""
     from backend.database import Organization, OrganizationMember
     
     if current_user.role == 'system_admin':
@@ -213,6 +265,18 @@ def get_my_orgs(
             OrganizationMember.user_id == current_user.id
         ).all()
 
+def cached_my_organizations(db: Session, current_user: UserResponse) -> CachedBody:
+    variant = "all" if current_user.role == 'system_admin' else current_user.id
+    return response_cache.get(MY_ORGS, None, variant, lambda: list_my_organizations(db, current_user))
+
+@router.get("/my-orgs")
+def get_my_orgs(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return cached_json_response(request, cached_my_organizations(db, current_user))
+
 
 
 class UserUpdate(BaseModel):
@@ -220,24 +284,45 @@ class UserUpdate(BaseModel):
     password: str | None = None
     current_password: str | None = None
 
+def _load_password_hash(db: Session, user_id: int):
+    """(found, password_hash) of a user; the connection is returned to the pool before bcrypt runs."""
+    row = db.query(User.password_hash).filter(User.id == user_id).first()
+    db.rollback()
+    return row is not None, row.password_hash if row else None
+
+def _save_profile(db: Session, user_id: int, username: str | None, password_hash: str | None) -> User:
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
+    if username is not None:
+        user.username = username
+    if password_hash is not None:
+        user.password_hash = password_hash
+    db.commit()
+    db.refresh(user)
+    return user
+
 @router.put("/me", response_model=UserResponse)
-def update_profile(
+async def update_profile(
     update_data: UserUpdate,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if not user:
+    # async for the same reason as login: the bcrypt check is awaited, DB work runs in the threadpool
+    found, current_hash = await run_in_threadpool(_load_password_hash, db, current_user.id)
+    if not found:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
-        
-    if update_data.username is not None:
-        user.username = update_data.username
-    
+
+    new_hash = None
     if update_data.password and update_data.password.strip():
         # Verify current password
         if not update_data.current_password:
              raise HTTPException(status_code=400, detail="現在のパスワードが必要です")
-        if not verify_password_safe(update_data.current_password, user.password_hash):
+        try:
+            verified = await verify_password_bounded(update_data.current_password, current_hash)
+        except PasswordVerifierBusy:
+            raise HTTPException(status_code=503, detail="処理が混み合っています。しばらくしてから再度お試しください", headers={"Retry-After": "5"})
+        if not verified:
              raise HTTPException(status_code=400, detail="現在のパスワードが正しくありません")
 
         # Validate Strength
@@ -246,10 +331,9 @@ def update_profile(
             raise HTTPException(status_code=400, detail=f"パスワード要件を満たしていません: {msg}")
 
         # Hash new password
-        user.password_hash = hash_pass(update_data.password)
+        new_hash = await run_in_threadpool(hash_pass, update_data.password)
         
-    db.commit()
-    db.refresh(user)
+    user = await run_in_threadpool(_save_profile, db, current_user.id, update_data.username, new_hash)
     
     return UserResponse(
         id=user.id,
@@ -318,10 +402,10 @@ def request_reset(payload: dict, db: Session = Depends(get_db)):
         
         user.reset_token = token
         user.reset_token_expiry = expiry
-        db.commit()
         
-        # Send Email (Mock)
-        send_reset_email(email, token)
+        # Queue Email in the same transaction (delivered by the background email worker)
+        send_reset_email(email, token, db=db)
+        db.commit()
         
     # Security: Always return success even if user not found to avoid account enumeration
     return {"message": "リセット手順を送信しました（有効なアドレスの場合）"}
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 JST = timezone(timedelta(hours=9))
 from typing import List, Optional
-from pydantic import BaseModel
-import json
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import tuple_
+import base64
+import binascii
 
-from backend.database import get_db, CasualPost, CasualPostLike, CasualAnalysis, OrganizationMember, Organization
+from backend.database import get_db, SessionLocal, CasualPost, CasualPostLike, CasualAnalysis, OrganizationMember, User, json_array_length
 from backend.api.auth import get_current_user, UserResponse
-from backend.services.analysis import analyze_casual_posts_logic
+from backend.api.notifications import format_sse, SSE_HEADERS
+from backend.services.analysis_runner import run_casual_analysis, casual_analysis_input, save_casual_analysis, NO_CASUAL_POSTS_RESULT
 from backend.services.notification_service import create_notification, notify_organization_members
+from backend.services.like_service import toggle_casual_post_like
+from backend.services.topic_stream import topic_streams
+from backend.services.rollup_service import record_activity, CASUAL_POSTS
+from backend.services.response_cache import response_cache, cached_json_response, invalidate_lists, CASUAL_ANALYSES
 
 router = APIRouter()
 
@@ -28,6 +37,21 @@ class CasualPostResponse(BaseModel):
     parent_id: Optional[int] = None
     replies_count: int = 0
 
+class CasualFeedResponse(BaseModel):
+    posts: List[CasualPostResponse]
+    next_cursor: Optional[str] = None   # より古い投稿を取得するカーソル (cursor に渡す)
+    latest_cursor: Optional[str] = None # 差分同期用カーソル (次回の since に渡す)
+    has_more: bool = False
+
+class TrendingTopicResponse(BaseModel):
+    topic_id: int
+    label: str # トピックを代表する投稿
+    momentum: float # 半減期付きの投稿数（直近の勢い）
+    post_count: int
+    first_post_at: datetime
+    last_post_at: datetime
+    sample_posts: List[str]
+
 class AnalysisResponse(BaseModel):
     id: int
     created_at: datetime
@@ -36,13 +60,74 @@ class AnalysisResponse(BaseModel):
     is_published: bool
     result: dict
 
+class AnalysisSummary(BaseModel):
+    """一覧用（分析結果の本文は含めない。本文は GET /analyses/{id}）"""
+    id: int
+    created_at: datetime
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    is_published: bool
+    recommendation_count: int = 0
+    message: Optional[str] = None
+
+ANALYSIS_LIST = TypeAdapter(List[AnalysisSummary])
+
 class AnalysisVisibilityUpdate(BaseModel):
     is_published: bool
 
+# フィード1回あたりの最大取得件数
+FEED_MAX_LIMIT = 100
+
+def _encode_cursor(post: CasualPost) -> str:
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+
+def _serialize_posts(db: Session, rows, user_id: int) -> List[dict]:
+    """Builds response dicts from (CasualPost, username) rows with a single likes lookup."""
+    post_ids = [post.id for post, _ in rows]
+    liked_post_ids = set()
+    if post_ids:
+        liked_post_ids = {
+            post_id for (post_id,) in db.query(CasualPostLike.post_id).filter(
+                CasualPostLike.user_id == user_id,
+                CasualPostLike.post_id.in_(post_ids)
+            )
+        }
+
+    return [
+        {
+            "id": post.id,
+            "content": post.content,
+            "created_at": post.created_at,
+            "user_name": username or "Unknown",
+            "likes_count": post.likes_count,
+            "is_liked_by_me": post.id in liked_post_ids,
+            "parent_id": post.parent_id,
+            "replies_count": post.replies_count or 0
+        }
+        for post, username in rows
+    ]
+
+def _posts_with_author(db: Session, organization_id: int):
+    # Author names come from the same query instead of lazy-loading post.user per row
+    return db.query(CasualPost, User.username).outerjoin(
+        User, CasualPost.user_id == User.id
+    ).filter(
+        CasualPost.organization_id == organization_id
+    )
+
 # Endpoints
 @router.post("/posts", response_model=CasualPostResponse)
 def create_post(
     post_data: CasualPostCreate,
+    background_tasks: BackgroundTasks,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -62,8 +147,17 @@ def create_post(
         parent_id=post_data.parent_id
     )
     db.add(post)
+    if post_data.parent_id:
+        # Keep the denormalized counter in step with the insert (atomic increment)
+        db.query(CasualPost).filter(CasualPost.id == post_data.parent_id).update(
+            {CasualPost.replies_count: CasualPost.replies_count + 1}, synchronize_session=False
+        )
+    record_activity(db, current_user.current_org_id, CASUAL_POSTS, user_id=current_user.id)
     db.commit()
     db.refresh(post)
+
+    # Assign the post to a live topic after the response is sent (embedding is not on the request path)
+    background_tasks.add_task(topic_streams.observe_post, post.organization_id, post.id, post.content, post.created_at)
     
     # Notify all organization members about the new post
     notification_title = "雑談掲示板: 新規投稿" if not post.parent_id else "雑談掲示板: 返信"
@@ -74,7 +168,8 @@ def create_post(
         notification_title,
         f"{current_user.username}さんがメッセージを投稿しました。",
         f"/dashboard?tab=casual",
-        exclude_user_id=current_user.id
+        exclude_user_id=current_user.id,
+        coalesce=True
     )
     
     return {
@@ -99,42 +194,73 @@ def get_posts(
         raise HTTPException(status_code=400, detail="組織に参加していません")
 
     # Get all posts (including replies) for the organization
-    posts = db.query(CasualPost).filter(
-        CasualPost.organization_id == current_user.current_org_id
-    ).order_by(CasualPost.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Check likes
-    post_ids = [p.id for p in posts]
-    my_likes = db.query(CasualPostLike).filter(
-        CasualPostLike.user_id == current_user.id,
-        CasualPostLike.post_id.in_(post_ids)
-    ).all()
-    liked_post_ids = {like.post_id for like in my_likes}
-
-    # Count replies for each post
-    from sqlalchemy import func
-    replies_count_query = db.query(
-        CasualPost.parent_id,
-        func.count(CasualPost.id).label('count')
-    ).filter(
-        CasualPost.parent_id.in_(post_ids)
-    ).group_by(CasualPost.parent_id).all()
-    
-    replies_count_map = {parent_id: count for parent_id, count in replies_count_query}
+    rows = _posts_with_author(db, current_user.current_org_id).order_by(
+        CasualPost.created_at.desc(), CasualPost.id.desc()
+    ).offset(skip).limit(limit).all()
 
-    results = []
-    for post in posts:
-        results.append({
-            "id": post.id,
-            "content": post.content,
-            "created_at": post.created_at,
-            "user_name": post.user.username if post.user else "Unknown",
-            "likes_count": post.likes_count,
-            "is_liked_by_me": post.id in liked_post_ids,
-            "parent_id": post.parent_id,
-            "replies_count": replies_count_map.get(post.id, 0)
-        })
-    return results
+    return _serialize_posts(db, rows, current_user.id)
+
+@router.get("/feed", response_model=CasualFeedResponse)
+def get_feed(
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = 50,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Keyset-paginated board feed (newest first, posts and replies).
+    - no params: latest page
+    - cursor: the page older than next_cursor of a previous response
+    - since: only posts newer than latest_cursor of a previous response (delta sync while polling)
+    """
+    if not current_user.current_org_id:
+        raise HTTPException(status_code=400, detail="組織に参加していません")
+    if cursor and since:
+        raise HTTPException(status_code=400, detail="cursor と since は同時に指定できません")
+    limit = max(1, min(limit, FEED_MAX_LIMIT))
+
+    query = _posts_with_author(db, current_user.current_org_id)
+    key = tuple_(CasualPost.created_at, CasualPost.id)
+    if since:
+        # Oldest new posts first so a large backlog can be drained page by page
+        query = query.filter(key > _decode_cursor(since)).order_by(
+            CasualPost.created_at.asc(), CasualPost.id.asc()
+        )
+    else:
+        if cursor:
+            query = query.filter(key < _decode_cursor(cursor))
+        query = query.order_by(CasualPost.created_at.desc(), CasualPost.id.desc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if since:
+        latest_cursor = _encode_cursor(rows[-1][0]) if rows else since
+        rows.reverse()
+        next_cursor = None
+    else:
+        latest_cursor = _encode_cursor(rows[0][0]) if rows and not cursor else None
+        next_cursor = _encode_cursor(rows[-1][0]) if rows and has_more else None
+
+    return {
+        "posts": _serialize_posts(db, rows, current_user.id),
+        "next_cursor": next_cursor,
+        "latest_cursor": latest_cursor,
+        "has_more": has_more
+    }
+
+@router.get("/trending", response_model=List[TrendingTopicResponse])
+def get_trending_topics(
+    limit: int = 5,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Topics gaining momentum right now, from the in-memory online clustering of new posts."""
+    if not current_user.current_org_id:
+        raise HTTPException(status_code=400, detail="組織に参加していません")
+    return topic_streams.trending(db, current_user.current_org_id, limit=max(1, min(limit, 20)))
 
 @router.post("/posts/{post_id}/like")
 def toggle_like(
@@ -142,36 +268,15 @@ def toggle_like(
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    post = db.query(CasualPost).filter(CasualPost.id == post_id).first()
+    post = db.query(CasualPost.id).filter(CasualPost.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="投稿が見つかりません")
-        
-    # Check if liked
-    existing_like = db.query(CasualPostLike).filter(
-        CasualPostLike.post_id == post_id,
-        CasualPostLike.user_id == current_user.id
-    ).first()
-    
-    if existing_like:
-        db.delete(existing_like)
-        post.likes_count = max(0, post.likes_count - 1)
-        is_liked = False
-    else:
-        new_like = CasualPostLike(post_id=post_id, user_id=current_user.id)
-        db.add(new_like)
-        post.likes_count += 1
-        is_liked = True
-        
+
+    is_liked, likes_count = toggle_casual_post_like(db, post_id, current_user.id)
     db.commit()
-    return {"liked": is_liked, "likes_count": post.likes_count}
+    return {"liked": is_liked, "likes_count": likes_count}
 
-@router.post("/analyze", response_model=AnalysisResponse)
-def analyze_posts(
-    start_date: str = None,
-    end_date: str = None,
-    current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _require_analysis_admin(current_user: UserResponse):
     # Only Admin (Org admin or System admin)
     if not current_user.current_org_id:
         raise HTTPException(status_code=400, detail="組織が選択されていません")
@@ -180,8 +285,7 @@ def analyze_posts(
     if not is_admin:
         raise HTTPException(status_code=403, detail="管理者権限が必要です")
 
-    org = db.query(Organization).filter(Organization.id == current_user.current_org_id).first()
-    
+def _analysis_window(start_date: Optional[str], end_date: Optional[str]):
     # Parse dates
     from datetime import datetime as dt
     if start_date:
@@ -197,38 +301,18 @@ def analyze_posts(
     else:
         # Default: now
         end_dt = datetime.now(JST).replace(tzinfo=None)
-    
-    # 1. Fetch posts
-    posts = db.query(CasualPost).filter(
-        CasualPost.organization_id == current_user.current_org_id,
-        CasualPost.created_at >= start_dt,
-        CasualPost.created_at <= end_dt
-    ).all()
-    
-    if not posts:
+    return start_dt, end_dt
+
+def _analysis_response(analysis: Optional[CasualAnalysis], result_data: dict, start_dt: datetime, end_dt: datetime) -> dict:
+    if analysis is None:
         return {
             "id": 0, # Dummy ID
             "created_at": datetime.now(JST).replace(tzinfo=None),
             "start_date": start_dt,
             "end_date": end_dt,
             "is_published": False,
-            "result": {"recommendations": [], "message": "期間内の投稿がありません"}
+            "result": result_data
         }
-
-    # 2. Analyze
-    result_data = analyze_casual_posts_logic(posts, org_name=org.name if org else "")
-    
-    # 3. Save
-    analysis = CasualAnalysis(
-        organization_id=current_user.current_org_id,
-        start_date=start_dt,
-        end_date=end_dt,
-        result_json=json.dumps(result_data, ensure_ascii=False),
-        is_published=False 
-    )
-    db.add(analysis)
-    db.commit()
-    db.refresh(analysis)
     
     return {
         "id": analysis.id,
@@ -239,19 +323,73 @@ def analyze_posts(
         "result": result_data
     }
 
-@router.get("/analyses", response_model=List[AnalysisResponse])
-def get_analyses(
+@router.post("/analyze", response_model=AnalysisResponse)
+def analyze_posts(
+    start_date: str = None,
+    end_date: str = None,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if not current_user.current_org_id:
-        raise HTTPException(status_code=400, detail="組織に参加していません")
-
-    # If Admin, show all. If Member, show only published.
-    is_admin = current_user.org_role == 'admin' or current_user.role == 'system_admin'
+    _require_analysis_admin(current_user)
+    start_dt, end_dt = _analysis_window(start_date, end_date)
     
-    query = db.query(CasualAnalysis).filter(
-        CasualAnalysis.organization_id == current_user.current_org_id
+    analysis, result_data = run_casual_analysis(db, current_user.current_org_id, start_dt, end_dt)
+    return _analysis_response(analysis, result_data, start_dt, end_dt)
+
+def _casual_analysis_event_stream(organization_id: int, start_dt: datetime, end_dt: datetime):
+    """SSE of a casual board analysis: a recommendation event per item as Gemini generates it, then the saved analysis."""
+    from backend.services.analysis import stream_casual_posts_logic
+
+    db = SessionLocal()
+    try:
+        inputs = casual_analysis_input(db, organization_id, start_dt, end_dt)
+        if inputs is None:
+            yield format_sse("result", jsonable_encoder(_analysis_response(None, dict(NO_CASUAL_POSTS_RESULT), start_dt, end_dt)))
+            return
+        # Release the connection while Gemini generates
+        db.close()
+
+        result_data = None
+        for event, data in stream_casual_posts_logic(**inputs):
+            if event == "result":
+                result_data = data
+            else:
+                yield format_sse(event, data)
+
+        analysis = save_casual_analysis(db, organization_id, start_dt, end_dt, result_data)
+        yield format_sse("result", jsonable_encoder(_analysis_response(analysis, result_data, start_dt, end_dt)))
+    finally:
+        db.close()
+
+@router.post("/analyze/stream")
+def analyze_posts_stream(
+    start_date: str = None,
+    end_date: str = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of POST /analyze (Server-Sent Events). Each recommendation is sent as a
+    `recommendation` event as soon as Gemini has generated it; the final `result` event carries
+    the same body as /analyze, after the analysis has been saved.
+    """
+    _require_analysis_admin(current_user)
+    start_dt, end_dt = _analysis_window(start_date, end_date)
+
+    return StreamingResponse(
+        _casual_analysis_event_stream(current_user.current_org_id, start_dt, end_dt),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+def list_analyses(db: Session, organization_id: int, is_admin: bool) -> List[dict]:
+    """Analysis list with the recommendation count and message projected in the database (result documents are not decoded)."""
+    query = db.query(
+        CasualAnalysis.id, CasualAnalysis.created_at, CasualAnalysis.start_date,
+        CasualAnalysis.end_date, CasualAnalysis.is_published,
+        json_array_length(CasualAnalysis.result_json, "recommendations").label("recommendation_count"),
+        CasualAnalysis.result_json["message"].as_string().label("message")
+    ).filter(
+        CasualAnalysis.organization_id == organization_id
     )
     
     if not is_admin:
@@ -259,22 +397,64 @@ def get_analyses(
         
     analyses = query.order_by(CasualAnalysis.created_at.desc()).all()
     
-    results = []
-    for a in analyses:
-        try:
-            res_content = json.loads(a.result_json)
-        except:
-            res_content = {}
-            
-        results.append({
+    return [
+        {
             "id": a.id,
             "created_at": a.created_at,
             "start_date": a.start_date,
             "end_date": a.end_date,
             "is_published": a.is_published,
-            "result": res_content
-        })
-    return results
+            "recommendation_count": a.recommendation_count or 0,
+            "message": a.message
+        } for a in analyses
+    ]
+
+@router.get("/analyses", response_model=List[AnalysisSummary])
+def get_analyses(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not current_user.current_org_id:
+        raise HTTPException(status_code=400, detail="組織に参加していません")
+
+    # If Admin, show all. If Member, show only published.
+    is_admin = current_user.org_role == 'admin' or current_user.role == 'system_admin'
+    cached = response_cache.get(
+        CASUAL_ANALYSES, current_user.current_org_id, "admin" if is_admin else "member",
+        lambda: list_analyses(db, current_user.current_org_id, is_admin), ANALYSIS_LIST
+    )
+    return cached_json_response(request, cached)
+
+@router.get("/analyses/{analysis_id}", response_model=AnalysisResponse)
+def get_analysis(
+    analysis_id: int,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not current_user.current_org_id:
+        raise HTTPException(status_code=400, detail="組織に参加していません")
+
+    is_admin = current_user.org_role == 'admin' or current_user.role == 'system_admin'
+    query = db.query(CasualAnalysis).filter(
+        CasualAnalysis.id == analysis_id,
+        CasualAnalysis.organization_id == current_user.current_org_id
+    )
+    if not is_admin:
+        query = query.filter(CasualAnalysis.is_published == True)
+    analysis = query.first()
+
+    if not analysis:
+        raise HTTPException(status_code=404, detail="分析レポートが見つかりません")
+
+    return {
+        "id": analysis.id,
+        "created_at": analysis.created_at,
+        "start_date": analysis.start_date,
+        "end_date": analysis.end_date,
+        "is_published": analysis.is_published,
+        "result": analysis.result_json or {}
+    }
 
 @router.patch("/analyses/{analysis_id}/visibility")
 def update_visibility(
@@ -300,6 +480,7 @@ def update_visibility(
         
     analysis.is_published = update.is_published
     db.commit()
+    invalidate_lists(analysis.organization_id, CASUAL_ANALYSES)
     
     if analysis.is_published:
         notify_organization_members(
@@ -337,5 +518,6 @@ def delete_analysis(
         
     db.delete(analysis)
     db.commit()
+    invalidate_lists(current_user.current_org_id, CASUAL_ANALYSES)
     
     return {"message": "分析レポートを削除しました"}
@@ -1,19 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-import json
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
-from typing import List, Optional
-from pydantic import BaseModel
-from datetime import datetime
+from sqlalchemy import desc, true
+from typing import Dict, List, Optional
+from pydantic import BaseModel, TypeAdapter
+from datetime import date, datetime
 import random
 import csv
 import io
 import re
+import orjson
 from urllib.parse import quote
 
-from backend.database import SessionLocal, AnalysisSession, AnalysisResult, IssueDefinition, Survey, Comment, CommentLike, Answer, get_db, OrganizationMember, User
-from backend.api.auth import get_current_user, UserResponse
+from backend.database import (
+    SessionLocal, AnalysisSession, IssueDefinition, Survey, Comment, get_db, OrganizationMember, User, Organization,
+    json_type, json_array_elements, now_jst
+)
+from backend.api.auth import get_current_user, UserResponse, cached_my_organizations
+from backend.api.organization import OrganizationResponse
+from backend.api.notifications import NotificationResponse, list_notifications, format_sse, SSE_HEADERS
+from backend.services.notification_service import get_unread_count
 from backend.services.notification_service import create_notification, notify_organization_members, notify_organization_admins
+from backend.services.like_service import toggle_comment_like
+from backend.services.analysis_runner import run_survey_question_analysis
+from backend.services.report_snapshot import load_report, materialize_snapshot, snapshot_response
+from backend.services.metrics import metrics
+from backend.services.thread_analysis import (
+    thread_state, format_thread_comments, run_thread_analysis, stream_thread_analysis, get_unchanged_result,
+    save_thread_analysis, thread_analyses_json, analyze_session_threads, is_failed_result
+)
+from backend.services.response_cache import (
+    response_cache, cached_json_response, invalidate_lists, CachedBody, SESSIONS, SURVEYS, SESSION_ISSUES
+)
+from backend.services.rollup_service import (
+    record_activity, touch_members, remove_subject, get_organization_rollup, get_all_organizations_rollup, SESSION_COMMENTS
+)
 
 router = APIRouter()
 
@@ -62,6 +83,66 @@ class SurveySummary(BaseModel):
     rejection_reason: Optional[str] = None
     created_by: Optional[int]
     description: Optional[str]
+    response_count: int = 0 # 回答者数（surveys.response_count カウンタ）
+
+# 一覧のシリアライズ用（キャッシュする本文を Pydantic で直接JSONにする）
+SESSION_LIST = TypeAdapter(List[SessionSummary])
+SURVEY_LIST = TypeAdapter(List[SurveySummary])
+
+# 集計 (organization_daily_stats / organization_stats のロールアップ)
+STATS_MAX_DAYS = 365
+
+class DailyCount(BaseModel):
+    day: date
+    value: int
+
+class SurveyActivity(BaseModel):
+    survey_id: int
+    title: str
+    responses: int
+    answers: int
+
+class SessionActivity(BaseModel):
+    session_id: int
+    title: str
+    comments: int
+
+class OrganizationStatsResponse(BaseModel):
+    organization_id: int
+    start_date: date
+    end_date: date
+    surveys_by_status: Dict[str, int] # pending, rejected, active, closed
+    totals: Dict[str, int] # 累計: survey_responses, survey_answers, casual_posts, session_comments
+    member_count: int
+    active_member_count: int # 期間内に回答・投稿・コメントしたメンバー数
+    daily: Dict[str, List[DailyCount]] # 指標ごとの日別件数（期間内）
+    surveys: List[SurveyActivity] # 期間内に回答があったアンケート
+    sessions: List[SessionActivity] # 期間内にコメントがあったレポート
+
+class OrganizationStatsSummary(BaseModel):
+    organization_id: int
+    organization_name: str
+    surveys_by_status: Dict[str, int]
+    totals: Dict[str, int]
+    window: Dict[str, int] # 期間内の件数
+    member_count: int
+    active_member_count: int
+
+class AllOrganizationsStatsResponse(BaseModel):
+    start_date: date
+    end_date: date
+    organizations: List[OrganizationStatsSummary]
+
+# 画面初期表示用にまとめて返す通知の件数（ベルを開いたときは /api/notifications で全件取得）
+BOOTSTRAP_NOTIFICATION_LIMIT = 20
+
+class BootstrapResponse(BaseModel):
+    user: UserResponse
+    organizations: List[OrganizationResponse]
+    notifications: List[NotificationResponse]
+    unread_count: int
+    sessions: List[SessionSummary]
+    surveys: List[SurveySummary]
 
 class PublishRequest(BaseModel):
     is_published: bool
@@ -96,15 +177,31 @@ class SessionDetail(BaseModel):
     comment_analysis: Optional[str] = None
     is_comment_analysis_published: bool = False
 
-@router.get("/sessions", response_model=List[SessionSummary])
-def get_sessions(
-    current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+class SessionReport(BaseModel):
+    """公開後は変わらないレポート本体（公開時のスナップショットから返す）"""
+    id: int
+    title: str
+    theme: str
+    created_at: datetime
+    report_content: Optional[str] = None
+    results: List[AnalysisResultItem] = []
+
+class SessionDiscussion(BaseModel):
+    """レポート画面のうち随時変わる部分（公開状態・AI分析・コメント）"""
+    is_published: bool
+    is_comment_analysis_published: bool = False
+    comment_analysis: Optional[str] = None
+    comments: List[CommentItem] = []
+
+def list_sessions(db: Session, current_user: UserResponse) -> List[SessionSummary]:
+    """Report list of the current organization (summary columns only; report bodies are not loaded)."""
     if not current_user.current_org_id:
         return []
         
-    query = db.query(AnalysisSession).filter(
+    query = db.query(
+        AnalysisSession.id, AnalysisSession.title, AnalysisSession.theme,
+        AnalysisSession.is_published, AnalysisSession.created_at
+    ).filter(
         AnalysisSession.organization_id == current_user.current_org_id
     )
     
@@ -125,12 +222,23 @@ def get_sessions(
         ) for s in sessions
     ]
 
-@router.get("/sessions/{session_id}", response_model=SessionDetail)
-def get_session_detail(
-    session_id: int,
+def cached_sessions(db: Session, current_user: UserResponse) -> CachedBody:
+    is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
+    return response_cache.get(
+        SESSIONS, current_user.current_org_id, "admin" if is_admin else "member",
+        lambda: list_sessions(db, current_user), SESSION_LIST
+    )
+
+@router.get("/sessions", response_model=List[SessionSummary])
+def get_sessions(
+    request: Request,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    return cached_json_response(request, cached_sessions(db, current_user))
+
+def get_readable_session(db: Session, current_user: UserResponse, session_id: int) -> AnalysisSession:
+    """Session of the current organization; unpublished ones only for admins."""
     if not current_user.current_org_id:
         raise HTTPException(status_code=403, detail="No organization context")
 
@@ -142,16 +250,14 @@ def get_session_detail(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
         
-    # Check permissions
     is_admin = current_user.role in ["admin", "system_admin"] or current_user.org_role == "admin"
     if not is_admin and not session.is_published:
          raise HTTPException(status_code=403, detail="Permission denied")
+    return session
 
-    issue_def = db.query(IssueDefinition).filter(IssueDefinition.session_id == session_id).first()
-    results = db.query(AnalysisResult).filter(AnalysisResult.session_id == session_id).order_by(AnalysisResult.id.desc()).all()
-    
+def discussion_fields(db: Session, session: AnalysisSession, is_admin: bool) -> dict:
     # Comments logic
-    comments_query = db.query(Comment).options(joinedload(Comment.user), joinedload(Comment.likes)).filter(Comment.session_id == session_id).order_by(Comment.id.desc()).all()
+    comments_query = db.query(Comment).options(joinedload(Comment.user)).filter(Comment.session_id == session.id).order_by(Comment.id.desc()).all()
     
     comment_items = []
     for c in comments_query:
@@ -163,35 +269,70 @@ def get_session_detail(
             user_name=name,
             is_anonymous=c.is_anonymous,
             created_at=c.created_at,
-            likes_count=len(c.likes),
+            likes_count=c.likes_count or 0,
             parent_id=c.parent_id
         ))
 
     # Privacy logic for comment analysis
-    comment_analysis_visible = is_admin or session.is_comment_analysis_published
+    comment_analysis = None
+    if is_admin or session.is_comment_analysis_published:
+        # JSON text {"threads": {...}} built from the per-thread rows (the client parses it)
+        comment_analysis = thread_analyses_json(db, session.id)
+
+    return {
+        "comments": comment_items,
+        "comment_analysis": comment_analysis,
+        "is_comment_analysis_published": session.is_comment_analysis_published
+    }
 
+@router.get("/sessions/{session_id}", response_model=SessionDetail)
+def get_session_detail(
+    session_id: int,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session = get_readable_session(db, current_user, session_id)
+    is_admin = current_user.role in ["admin", "system_admin"] or current_user.org_role == "admin"
+
+    report = load_report(db, session)
     return SessionDetail(
         id=session.id,
         title=session.title,
         theme=session.theme,
         is_published=session.is_published,
-        report_content=issue_def.content if issue_def else None,
-        results=[
-            AnalysisResultItem(
-                sub_topic=r.sub_topic,
-                summary=r.summary,
-                original_text=r.original_text,
-                x=float(r.x_coordinate) if r.x_coordinate is not None else 0.0,
-                y=float(r.y_coordinate) if r.y_coordinate is not None else 0.0,
-                cluster_id=r.cluster_id,
-                is_noise=r.cluster_id == -1 if r.cluster_id is not None else False
-            ) for r in results
-        ],
-        comments=comment_items,
-        comment_analysis=session.comment_analysis if comment_analysis_visible else None,
-        is_comment_analysis_published=session.is_comment_analysis_published
+        report_content=report["report_content"],
+        results=report["results"],
+        **discussion_fields(db, session, is_admin)
     )
 
+@router.get("/sessions/{session_id}/report", response_model=SessionReport)
+def get_session_report(
+    session_id: int,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Results and issues of a report. Published sessions are served from the snapshot taken at
+    publish time (one row read, sent still compressed); admins previewing an unpublished
+    session get it built from the tables.
+    """
+    session = get_readable_session(db, current_user, session_id)
+    if session.is_published:
+        return snapshot_response(db, request, session)
+    return load_report(db, session)
+
+@router.get("/sessions/{session_id}/discussion", response_model=SessionDiscussion)
+def get_session_discussion(
+    session_id: int,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Live part of a report page: publish flags, the AI comment analysis and the comments."""
+    session = get_readable_session(db, current_user, session_id)
+    is_admin = current_user.role in ["admin", "system_admin"] or current_user.org_role == "admin"
+    return SessionDiscussion(is_published=session.is_published, **discussion_fields(db, session, is_admin))
+
 @router.put("/sessions/{session_id}/publish")
 def publish_session(
     session_id: int,
@@ -214,7 +355,11 @@ def publish_session(
         raise HTTPException(status_code=404, detail="Session not found")
         
     session.is_published = payload.get("is_published", False)
+    if session.is_published:
+        # Freeze the report body now so readers get it with one row read
+        materialize_snapshot(db, session)
     db.commit()
+    invalidate_lists(session.organization_id, SESSIONS)
 
     if session.is_published:
         notify_organization_members(
@@ -285,8 +430,10 @@ def delete_session(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
         
+    remove_subject(db, session.organization_id, (SESSION_COMMENTS,), session.id)
     db.delete(session)
     db.commit()
+    invalidate_lists(current_user.current_org_id, SESSIONS, SESSION_ISSUES)
     return {"message": "Session deleted"}
 
 @router.post("/sessions/analyze")
@@ -304,90 +451,28 @@ def run_analysis_endpoint(
     if not survey_id or not question_id:
         raise HTTPException(status_code=400, detail="Missing survey_id or question_id")
     
-    # 1. Fetch Answers
-    answers = db.query(Answer).filter(Answer.question_id == question_id).all()
-    texts = [a.content for a in answers if a.content and a.content.strip()]
-    timestamps = [a.created_at for a in answers if a.content and a.content.strip()]
-    
-    if not texts or len(texts) < 2:
-        raise HTTPException(status_code=400, detail="分析には最低2件の回答が必要です。")
-        
     try:
-        from backend.services.analysis import analyze_clusters_logic, generate_issue_logic_from_clusters
-        from backend.services.mock_generator import generate_mock_analysis_data
-        import pandas as pd
-        
-        # 2. Analyze
-        # Determine theme from survey title (Mock or fetch)
-        survey = db.query(Survey).filter(Survey.id == survey_id).first()
-        theme = survey.title if survey else "General"
-        
-        if is_mock:
-            # Mock Analysis
-            print(f"Running MOCK analysis for theme: {theme}")
-            results, issue_content = generate_mock_analysis_data(theme, num_points=len(texts))
-            # Adjust generated mock results to map to actual original texts if possible, 
-            # OR just use the generated ones (which implies ignoring actual user input)
-            # User request: "Insert test data report". implying we use the test data content.
-            # So we will use the results from generator which contain "original_text" from the generator.
-        else:
-            # Real Analysis
-            results = analyze_clusters_logic(texts, theme, timestamps=timestamps)
-            if not results:
-                 raise HTTPException(status_code=500, detail="Analysis failed to produce results")
-                 
-            df = pd.DataFrame(results)
-            issue_content = generate_issue_logic_from_clusters(df, theme)
-        
-        # 3. Save
-        sess = AnalysisSession(
-            title=title, 
-            theme=theme, 
-            organization_id=current_user.current_org_id,
-            is_published=False
+        sess = run_survey_question_analysis(
+            db, current_user.current_org_id, survey_id, question_id, title, is_mock=is_mock
         )
-        db.add(sess)
-        db.commit()
-        db.refresh(sess)
-        
-        for r in results:
-            db.add(AnalysisResult(
-                session_id=sess.id, 
-                original_text=r['original_text'], 
-                sub_topic=r['sub_topic'], 
-                summary=r['summary'],
-                x_coordinate=r.get('x_coordinate'),
-                y_coordinate=r.get('y_coordinate'),
-                cluster_id=r.get('cluster_id')
-                # small_voice_score removed
-            ))
-        
-        if issue_content:
-            import json
-            db.add(IssueDefinition(
-                session_id=sess.id, 
-                content=json.dumps(issue_content, ensure_ascii=False)
-            ))
-            
-        db.commit()
-        
         return {"message": "Analysis completed", "session_id": sess.id}
-        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/surveys", response_model=List[SurveySummary])
-def get_surveys(
-    current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def list_surveys(db: Session, current_user: UserResponse) -> List[SurveySummary]:
+    """Survey list of the current organization, filtered by what the user may see."""
     if not current_user.current_org_id:
         return []
         
-    query = db.query(Survey).filter(
+    query = db.query(
+        Survey.id, Survey.title, Survey.uuid, Survey.is_active, Survey.approval_status,
+        Survey.rejection_reason, Survey.created_by, Survey.description, Survey.response_count
+    ).filter(
         Survey.organization_id == current_user.current_org_id
     )
     
@@ -409,10 +494,83 @@ def get_surveys(
             id=s.id, title=s.title, uuid=s.uuid, is_active=s.is_active, 
             approval_status=s.approval_status or 'pending',
             rejection_reason=s.rejection_reason,
-            created_by=s.created_by, description=s.description
+            created_by=s.created_by, description=s.description,
+            response_count=s.response_count or 0
         ) for s in surveys
     ]
 
+def cached_surveys(db: Session, current_user: UserResponse) -> CachedBody:
+    # Members also see their own requests, so their lists are cached per user
+    is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
+    return response_cache.get(
+        SURVEYS, current_user.current_org_id, "admin" if is_admin else current_user.id,
+        lambda: list_surveys(db, current_user), SURVEY_LIST
+    )
+
+@router.get("/surveys", response_model=List[SurveySummary])
+def get_surveys(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return cached_json_response(request, cached_surveys(db, current_user))
+
+@router.get("/stats", response_model=OrganizationStatsResponse)
+def get_organization_stats(
+    days: int = 30,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Dashboard totals of the current organization, read from the precomputed rollup rows."""
+    is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if not current_user.current_org_id:
+        raise HTTPException(status_code=403, detail="No organization context")
+
+    days = max(1, min(days, STATS_MAX_DAYS))
+    return get_organization_rollup(db, current_user.current_org_id, days)
+
+@router.get("/stats/organizations", response_model=AllOrganizationsStatsResponse)
+def get_all_organizations_stats(
+    days: int = 30,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-organization totals across all organizations (system admin only)."""
+    if current_user.role != 'system_admin':
+        raise HTTPException(status_code=403, detail="System Admin access required")
+
+    days = max(1, min(days, STATS_MAX_DAYS))
+    rollup = get_all_organizations_rollup(db, days)
+    names = dict(db.query(Organization.id, Organization.name).all())
+    # Rows of an organization deleted without FK cascades are skipped
+    rollup["organizations"] = [
+        {**s, "organization_name": names[s["organization_id"]]}
+        for s in rollup["organizations"] if s["organization_id"] in names
+    ]
+    return rollup
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+def get_bootstrap(
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Everything the dashboard shell needs on first paint, in one round trip: the user,
+    switchable organizations, latest notifications with the unread count, and the
+    report / survey lists. Authentication is resolved once for all sections, and the
+    organization / report / survey lists come from the response cache when warm.
+    """
+    return BootstrapResponse(
+        user=current_user,
+        organizations=cached_my_organizations(db, current_user).data,
+        notifications=list_notifications(db, current_user.id, BOOTSTRAP_NOTIFICATION_LIMIT),
+        unread_count=get_unread_count(db, current_user.id),
+        sessions=cached_sessions(db, current_user).data,
+        surveys=cached_surveys(db, current_user).data
+    )
+
 class CreateCommentRequest(BaseModel):
     content: str
     is_anonymous: bool = False
@@ -451,6 +609,7 @@ def create_comment(
         parent_id=payload.parent_id
     )
     db.add(new_comment)
+    record_activity(db, session.organization_id, SESSION_COMMENTS, session_id, current_user.id)
     db.commit()
     db.refresh(new_comment)
     
@@ -471,7 +630,8 @@ def create_comment(
             "レポートチャット新着",
             f"レポート「{session.title}」に新しいコメントが投稿されました。",
             f"/dashboard/sessions/{session_id}{url_suffix}",
-            exclude_user_id=current_user.id
+            exclude_user_id=current_user.id,
+            coalesce=True
         )
     else:
         # Only admins can see it
@@ -482,7 +642,8 @@ def create_comment(
             "レポートチャット新着 (未公開)",
             f"未公開レポート「{session.title}」に管理者コメントが投稿されました。",
             f"/dashboard/sessions/{session_id}{url_suffix}",
-            exclude_user_id=current_user.id
+            exclude_user_id=current_user.id,
+            coalesce=True
         )
     
     return {"message": "Comment created", "id": new_comment.id}
@@ -493,28 +654,12 @@ def like_comment(
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = db.query(Comment.id).filter(Comment.id == comment_id).first()
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-        
-    # Check if already liked
-    existing_like = db.query(CommentLike).filter(
-        CommentLike.comment_id == comment_id,
-        CommentLike.user_id == current_user.id
-    ).first()
-    
-    if existing_like:
-        db.delete(existing_like)
-        liked = False
-    else:
-        new_like = CommentLike(comment_id=comment_id, user_id=current_user.id)
-        db.add(new_like)
-        liked = True
-        
+
+    liked, count = toggle_comment_like(db, comment_id, current_user.id)
     db.commit()
-    
-    # Return new count
-    count = db.query(CommentLike).filter(CommentLike.comment_id == comment_id).count()
     return {"message": "Like updated", "count": count, "liked": liked}
 
 @router.put("/comments/{comment_id}")
@@ -533,6 +678,7 @@ def update_comment(
         raise HTTPException(status_code=403, detail="Not authorized to edit this comment")
         
     comment.content = payload.content
+    comment.updated_at = now_jst()
     db.commit()
     
     return {"message": "Comment updated"}
@@ -543,14 +689,10 @@ def update_comment(
 
 class ThreadAnalysisRequest(BaseModel):
     parent_comment_id: int
+    force: bool = False # スレッドが前回の分析から変わっていなくても再分析する
 
-@router.post("/sessions/{session_id}/analyze-thread")
-def analyze_thread(
-    session_id: int,
-    payload: ThreadAnalysisRequest,
-    current_user: UserResponse = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def _load_thread_for_analysis(db: Session, session_id: int, parent_comment_id: int, current_user: UserResponse):
+    """Admin check, then the session and the thread (parent followed by its replies) to analyse."""
     # Only Admin (System or Org)
     is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
     if not is_admin:
@@ -566,77 +708,52 @@ def analyze_thread(
         
     # 1. Fetch Comments for Thread
     # Parent
-    parent = db.query(Comment).filter(Comment.id == payload.parent_comment_id, Comment.session_id == session_id).first()
+    parent = db.query(Comment).options(joinedload(Comment.user)).filter(Comment.id == parent_comment_id, Comment.session_id == session_id).first()
     if not parent:
         raise HTTPException(status_code=404, detail="Parent comment not found")
         
     # Children
-    children = db.query(Comment).filter(Comment.parent_id == payload.parent_comment_id, Comment.session_id == session_id).order_by(Comment.created_at.asc()).all()
+    children = db.query(Comment).options(joinedload(Comment.user)).filter(Comment.parent_id == parent_comment_id, Comment.session_id == session_id).order_by(Comment.created_at.asc()).all()
     
-    # Prepare list for service
     # Combine parent + children sorted by time
-    thread_comments = [parent] + children
+    return session, [parent] + children
+
+def _thread_url_suffix(db: Session, parent_comment_id: int) -> str:
+    """Query string that opens the thread's issue on the report page (for notifications)."""
+    issue_info = get_issue_info_for_comment(db, parent_comment_id)
+    if not issue_info:
+        return ""
+    title_part = f"title={quote(issue_info['title'])}"
+    id_part = f"&issue_id={issue_info['id']}" if issue_info.get('id') else ""
+    return f"?{title_part}{id_part}"
+
+@router.post("/sessions/{session_id}/analyze-thread")
+def analyze_thread(
+    session_id: int,
+    payload: ThreadAnalysisRequest,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session, thread_comments = _load_thread_for_analysis(db, session_id, payload.parent_comment_id, current_user)
+
+    # No new, edited or removed comments since the last analysis: return it without calling the LLM
+    state = thread_state(thread_comments)
+    if not payload.force:
+        unchanged = get_unchanged_result(db, session_id, payload.parent_comment_id, state)
+        if unchanged is not None:
+            metrics.increment("thread_analysis.unchanged")
+            return {"message": "Thread unchanged since last analysis", "result": unchanged, "unchanged": True}
     
-    # Convert to simple objects for service
-    formatted_comments = []
-    for c in thread_comments:
-        name = "匿名" if c.is_anonymous else (c.user.username if c.user else "Unknown")
-        formatted_comments.append({
-            "content": c.content,
-            "user_name": name,
-            "created_at": c.created_at
-        })
-        
     try:
-        from backend.services.analysis import analyze_thread_logic
-        result = analyze_thread_logic(formatted_comments)
-        
-        # Update Session JSON
-        # Structure: { "threads": { "parent_id": { ...result... } }, ...other_existing_data... }
-        current_data = {}
-        if session.comment_analysis:
-            try:
-                current_data = json.loads(session.comment_analysis)
-            except:
-                current_data = {}
+        result = run_thread_analysis(format_thread_comments(thread_comments))
         
-        if "threads" not in current_data:
-            current_data["threads"] = {}
-            
-        current_data["threads"][str(payload.parent_comment_id)] = result
-        
-        session.comment_analysis = json.dumps(current_data, ensure_ascii=False)
+        # One row per thread (other threads of the session are not touched)
+        save_thread_analysis(db, session_id, payload.parent_comment_id, result, state)
         db.commit()
+        metrics.increment("thread_analysis.analyzed")
         
         # Notify organization members only if the AI analysis is actually published
-        issue_info = get_issue_info_for_comment(db, payload.parent_comment_id)
-        url_suffix = ""
-        if issue_info:
-            title_part = f"title={quote(issue_info['title'])}"
-            id_part = f"&issue_id={issue_info['id']}" if issue_info.get('id') else ""
-            url_suffix = f"?{title_part}{id_part}"
-
-        if session.is_comment_analysis_published:
-            notify_organization_members(
-                db,
-                session.organization_id,
-                "report_published",
-                "AI分析更新",
-                f"レポート「{session.title}」のAIスレッド分析が更新されました。",
-                f"/dashboard/sessions/{session_id}{url_suffix}",
-                exclude_user_id=current_user.id
-            )
-        else:
-            # Notify admins even if it's not published to general members
-            notify_organization_admins(
-                db,
-                session.organization_id,
-                "report_published",
-                "AI分析更新 (未公開)",
-                f"レポート「{session.title}」のAIスレッド分析（内部確認用）が更新されました。",
-                f"/dashboard/sessions/{session_id}{url_suffix}",
-                exclude_user_id=current_user.id
-            )
+        notify_thread_analysis_updated(db, session, current_user.id, "のAIスレッド分析", _thread_url_suffix(db, payload.parent_comment_id))
         
         return {"message": "Thread analysis completed", "result": result}
         
@@ -644,36 +761,171 @@ def analyze_thread(
         print(f"Thread Analysis error: {e}")
         raise HTTPException(status_code=500, detail="Thread analysis failed")
 
-@router.get("/sessions/{session_id}/issues")
-def get_session_issues(
+def _thread_analysis_event_stream(session_id: int, parent_comment_id: int, formatted: List[dict], state, actor_id: int):
+    """SSE of one thread analysis: a next_step event per step as Gemini generates it, then the saved result."""
+    result = None
+    try:
+        for event, data in stream_thread_analysis(formatted):
+            if event == "result":
+                result = data
+            else:
+                yield format_sse(event, data)
+        if is_failed_result(result):
+            raise ValueError("Thread analysis returned no usable result")
+    except Exception as e:
+        # Nothing is saved, so the thread is analysed again next time
+        print(f"Thread Analysis error: {e}")
+        yield format_sse("error", {"detail": "Thread analysis failed"})
+        return
+
+    db = SessionLocal()
+    try:
+        save_thread_analysis(db, session_id, parent_comment_id, result, state)
+        db.commit()
+        metrics.increment("thread_analysis.analyzed")
+        session = db.query(AnalysisSession).filter(AnalysisSession.id == session_id).first()
+        if session:
+            notify_thread_analysis_updated(db, session, actor_id, "のAIスレッド分析", _thread_url_suffix(db, parent_comment_id))
+    except Exception as e:
+        db.rollback()
+        print(f"Thread Analysis error: {e}")
+        yield format_sse("error", {"detail": "Thread analysis failed"})
+        return
+    finally:
+        db.close()
+    yield format_sse("result", {"message": "Thread analysis completed", "result": result})
+
+@router.post("/sessions/{session_id}/analyze-thread/stream")
+def analyze_thread_stream(
     session_id: int,
+    payload: ThreadAnalysisRequest,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Check access
-    if not current_user.current_org_id:
-        return []
-        
-    session = db.query(AnalysisSession).filter(
+    """
+    Streaming variant of analyze-thread (Server-Sent Events). Each next step is sent as a
+    `next_step` event as soon as Gemini has generated it; the final `result` event carries the
+    same body as analyze-thread, after the result has been saved. `error` if the analysis or saving failed (nothing is saved).
+    """
+    _, thread_comments = _load_thread_for_analysis(db, session_id, payload.parent_comment_id, current_user)
+
+    state = thread_state(thread_comments)
+    if not payload.force:
+        unchanged = get_unchanged_result(db, session_id, payload.parent_comment_id, state)
+        if unchanged is not None:
+            metrics.increment("thread_analysis.unchanged")
+            events = iter([format_sse("result", {"message": "Thread unchanged since last analysis", "result": unchanged, "unchanged": True})])
+            return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+    return StreamingResponse(
+        _thread_analysis_event_stream(session_id, payload.parent_comment_id, format_thread_comments(thread_comments), state, current_user.id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+def notify_thread_analysis_updated(db: Session, session: AnalysisSession, actor_id: int, subject: str, url_suffix: str = ""):
+    if session.is_comment_analysis_published:
+        notify_organization_members(
+            db,
+            session.organization_id,
+            "report_published",
+            "AI分析更新",
+            f"レポート「{session.title}」{subject}が更新されました。",
+            f"/dashboard/sessions/{session.id}{url_suffix}",
+            exclude_user_id=actor_id
+        )
+    else:
+        # Notify admins even if it's not published to general members
+        notify_organization_admins(
+            db,
+            session.organization_id,
+            "report_published",
+            "AI分析更新 (未公開)",
+            f"レポート「{session.title}」{subject}（内部確認用）が更新されました。",
+            f"/dashboard/sessions/{session.id}{url_suffix}",
+            exclude_user_id=actor_id
+        )
+
+class BulkThreadAnalysisRequest(BaseModel):
+    force: bool = False # 前回の分析から変わっていないスレッドも再分析する
+
+def _thread_analysis_stream(session_id: int, force: bool, actor_id: int):
+    """NDJSON progress of analyze_session_threads; one notification at the end if anything was analysed."""
+    for event in analyze_session_threads(session_id, force):
+        yield orjson.dumps(event) + b"\n"
+        summary = event.get("summary")
+        if summary and summary["analyzed"]:
+            db = SessionLocal()
+            try:
+                session = db.query(AnalysisSession).filter(AnalysisSession.id == session_id).first()
+                if session:
+                    notify_thread_analysis_updated(db, session, actor_id, f"のAIスレッド分析（{summary['analyzed']}件）")
+            finally:
+                db.close()
+
+@router.post("/sessions/{session_id}/analyze-threads")
+def analyze_all_threads(
+    session_id: int,
+    payload: BulkThreadAnalysisRequest,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyses every thread of a session. Threads unchanged since their last analysis are skipped;
+    the rest run concurrently and are saved one by one. Streams one JSON line per thread
+    ({"parent_comment_id", "status": analyzed|unchanged|error, "done", "total"}) and a summary line.
+    """
+    is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
+    if not is_admin:
+         raise HTTPException(status_code=403, detail="Permission denied")
+
+    exists = db.query(AnalysisSession.id).filter(
         AnalysisSession.id == session_id,
         AnalysisSession.organization_id == current_user.current_org_id
     ).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return StreamingResponse(
+        _thread_analysis_stream(session_id, payload.force, current_user.id), media_type="application/x-ndjson"
+    )
+
+def list_session_issues(db: Session, organization_id: int, session_id: int) -> List[dict]:
+    """Issue ids and titles of a session, projected in the database (the issue documents are not decoded)."""
+    exists = db.query(AnalysisSession.id).filter(
+        AnalysisSession.id == session_id,
+        AnalysisSession.organization_id == organization_id
+    ).first()
     
-    if not session:
+    if not exists:
         raise HTTPException(status_code=404, detail="Session not found")
         
-    # Get Issue Definition
-    issue_def = db.query(IssueDefinition).filter(IssueDefinition.session_id == session_id).first()
-    if not issue_def or not issue_def.content:
+    issue = json_array_elements(IssueDefinition.content)
+    rows = db.query(
+        issue.c.value["id"].as_string().label("id"),
+        issue.c.value["title"].as_string().label("title")
+    ).select_from(IssueDefinition).join(issue, true()).filter(
+        IssueDefinition.session_id == session_id,
+        json_type(IssueDefinition.content) == "array"
+    ).all()
+    return [{"id": r.id, "title": r.title} for r in rows if r.title]
+
+@router.get("/sessions/{session_id}/issues")
+def get_session_issues(
+    session_id: int,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Check access
+    if not current_user.current_org_id:
         return []
         
-    try:
-        issues = json.loads(issue_def.content)
-        if isinstance(issues, list):
-            return [{"id": issue.get("id"), "title": issue.get("title")} for issue in issues if issue.get("title")]
-        return []
-    except:
-        return []
+    cached = response_cache.get(
+        SESSION_ISSUES, current_user.current_org_id, session_id,
+        lambda: list_session_issues(db, current_user.current_org_id, session_id)
+    )
+    return cached_json_response(request, cached)
 
 @router.post("/sessions/{session_id}/comments/import")
 def import_session_comments(
@@ -720,6 +972,7 @@ def import_session_comments(
             is_anonymous=False
         )
         db.add(root_comment)
+        record_activity(db, session.organization_id, SESSION_COMMENTS, session_id)
         db.commit()
         db.refresh(root_comment)
         
@@ -774,6 +1027,8 @@ def import_session_comments(
             
         if comments_to_add:
             db.add_all(comments_to_add)
+            record_activity(db, session.organization_id, SESSION_COMMENTS, session_id, amount=len(comments_to_add))
+            touch_members(db, [(session.organization_id, c.user_id) for c in comments_to_add])
             db.commit()
             
         return {"message": f"Imported {len(comments_to_add)} comments", "root_id": root_comment.id}
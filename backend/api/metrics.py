@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.api.auth import get_current_user, UserResponse
+from backend.services.metrics import metrics
+
+router = APIRouter()
+
+@router.get("")
+def get_metrics(
+    current_user: UserResponse = Depends(get_current_user)
+):
+    # System Admin only
+    if current_user.role != 'system_admin':
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return metrics.snapshot()
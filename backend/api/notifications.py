@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Cookie
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
+import json
 
-from backend.database import get_db, Notification
+from backend.database import get_db, SessionLocal, Notification
 from backend.api.auth import get_current_user, UserResponse
+from backend.services.notification_broker import broker
+from backend.services.notification_service import get_unread_count, decrement_unread_count, publish_notification_event
 
 router = APIRouter()
 
+# SSE接続を維持するためのハートビート間隔（秒）
+STREAM_HEARTBEAT_SECONDS = 15
+
 class NotificationResponse(BaseModel):
     id: int
     type: str
@@ -17,19 +26,83 @@ class NotificationResponse(BaseModel):
     link: str
     is_read: bool
     created_at: datetime
+    count: int = 1
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+def list_notifications(db: Session, user_id: int, limit: int = 99) -> List[Notification]:
+    return db.query(Notification).filter(
+        Notification.user_id == user_id
+    ).order_by(Notification.updated_at.desc()).limit(limit).all()
+
 @router.get("", response_model=List[NotificationResponse])
 def get_notifications(
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).limit(99).all()
-    return notifications
+    return list_notifications(db, current_user.id)
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+def get_notification_unread_count(
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return {"unread_count": get_unread_count(db, current_user.id)}
+
+def _resolve_stream_user(small_voice_session: Optional[str], small_voice_org_context: Optional[str]):
+    """Authenticates the stream with a short-lived session so no DB connection is held while streaming."""
+    db = SessionLocal()
+    try:
+        user = get_current_user(small_voice_session, small_voice_org_context, db)
+        return user.id, get_unread_count(db, user.id)
+    finally:
+        db.close()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no" # Disable nginx buffering for SSE
+}
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    small_voice_session: str | None = Cookie(default=None),
+    small_voice_org_context: str | None = Cookie(default=None)
+):
+    """Server-Sent Events stream of new notifications and unread count changes."""
+    user_id, unread_count = await run_in_threadpool(
+        _resolve_stream_user, small_voice_session, small_voice_org_context
+    )
+
+    async def event_stream():
+        queue = broker.subscribe(user_id)
+        try:
+            yield format_sse("unread_count", {"unread_count": unread_count})
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(message["event"], message["data"])
+        finally:
+            broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
 
 @router.post("/{notification_id}/read")
 def mark_read(
@@ -41,12 +114,20 @@ def mark_read(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
     ).first()
-    
+
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
-        
-    notification.is_read = True
+
+    # Conditional update so concurrent requests decrement the counter only once
+    updated = db.query(Notification).filter(
+        Notification.id == notification_id,
+        Notification.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
+    decrement_unread_count(db, current_user.id, updated)
     db.commit()
+
+    if updated:
+        publish_notification_event(db, [current_user.id], "unread_count", {})
     return {"message": "Notification marked as read"}
 
 @router.post("/read-all")
@@ -54,9 +135,13 @@ def mark_all_read(
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db.query(Notification).filter(
+    updated = db.query(Notification).filter(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).update({"is_read": True})
+    ).update({"is_read": True}, synchronize_session=False)
+    decrement_unread_count(db, current_user.id, updated)
     db.commit()
+
+    if updated:
+        publish_notification_event(db, [current_user.id], "unread_count", {})
     return {"message": "All notifications marked as read"}
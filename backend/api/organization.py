@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from sqlalchemy.orm import Session, contains_eager
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
-from backend.database import get_db, Organization, OrganizationMember
+from backend.database import get_db, Organization, OrganizationMember, AnalysisSchedule
 from backend.api.auth import get_current_user, UserResponse
+from backend.api.users import user_search_filter, DIRECTORY_MAX_LIMIT
+from backend.services.response_cache import invalidate_lists, MY_ORGS
 
 router = APIRouter()
 
@@ -34,6 +36,28 @@ class MemberResponse(BaseModel):
     email: str
     role: str # org-specific role
 
+class MemberPageResponse(BaseModel):
+    items: List[MemberResponse]
+    next_cursor: Optional[int] = None # 次ページ取得用 (cursor に渡す)。None なら最終ページ
+    has_more: bool = False
+
+class AnalysisScheduleBase(BaseModel):
+    is_enabled: bool = False
+    run_hour: int = Field(3, ge=0, le=23) # JST
+    casual_enabled: bool = True
+    casual_window_days: int = Field(30, ge=1, le=365)
+    casual_interval_days: int = Field(7, ge=1, le=90)
+    survey_enabled: bool = True
+    survey_answer_threshold: int = Field(20, ge=2, le=10000)
+
+class AnalysisScheduleResponse(AnalysisScheduleBase):
+    organization_id: int
+    last_run_date: Optional[date] = None
+    last_casual_run_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Endpoints
 
 @router.get("", response_model=List[OrganizationResponse])
@@ -67,6 +91,7 @@ def create_organization(
     new_org = Organization(name=org.name, description=org.description)
     db.add(new_org)
     db.commit()
+    invalidate_lists(None, MY_ORGS)
     db.refresh(new_org)
     return new_org
 
@@ -93,6 +118,7 @@ def update_organization(
     org_obj.name = org_update.name
     org_obj.description = org_update.description
     db.commit()
+    invalidate_lists(None, MY_ORGS)
     db.refresh(org_obj)
     return org_obj
 
@@ -119,11 +145,16 @@ def delete_organization(
         
     db.delete(org_obj)
     db.commit()
+    invalidate_lists(None, MY_ORGS)
     return {"message": "Organization deleted"}
 
-@router.get("/{org_id}/members", response_model=List[MemberResponse])
+@router.get("/{org_id}/members", response_model=MemberPageResponse)
 def get_organization_members(
     org_id: int,
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    q: Optional[str] = None,
+    role: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -137,7 +168,22 @@ def get_organization_members(
     if not is_system_admin and not membership:
         raise HTTPException(status_code=403, detail="Access denied to this organization")
         
-    members = db.query(OrganizationMember).filter(OrganizationMember.organization_id == org_id).order_by(OrganizationMember.id.desc()).all()
+    limit = max(1, min(limit, DIRECTORY_MAX_LIMIT))
+
+    # Keyset on the membership id (organization_id, id index); the user row comes from the same query
+    query = db.query(OrganizationMember).join(OrganizationMember.user).options(
+        contains_eager(OrganizationMember.user)
+    ).filter(OrganizationMember.organization_id == org_id)
+    if cursor:
+        query = query.filter(OrganizationMember.id < cursor)
+    if q and q.strip():
+        query = query.filter(user_search_filter(q))
+    if role:
+        query = query.filter(OrganizationMember.role == role)
+
+    members = query.order_by(OrganizationMember.id.desc()).limit(limit + 1).all()
+    has_more = len(members) > limit
+    members = members[:limit]
     
     results = []
     for m in members:
@@ -147,4 +193,53 @@ def get_organization_members(
             email=m.user.email,
             role=m.role
         ))
-    return results
+    return MemberPageResponse(
+        items=results,
+        next_cursor=members[-1].id if has_more else None,
+        has_more=has_more
+    )
+
+def _require_org_admin(org_id: int, current_user: UserResponse, db: Session):
+    if current_user.role == 'system_admin':
+        return
+    membership = db.query(OrganizationMember).filter(
+        OrganizationMember.organization_id == org_id,
+        OrganizationMember.user_id == current_user.id,
+        OrganizationMember.role == 'admin'
+    ).first()
+    if not membership:
+        raise HTTPException(status_code=403, detail="管理者権限が必要です")
+
+@router.get("/{org_id}/analysis-schedule", response_model=AnalysisScheduleResponse)
+def get_analysis_schedule(
+    org_id: int,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_org_admin(org_id, current_user, db)
+    schedule = db.query(AnalysisSchedule).filter(AnalysisSchedule.organization_id == org_id).first()
+    if not schedule:
+        # Not configured yet: report the defaults (disabled)
+        return AnalysisScheduleResponse(organization_id=org_id)
+    return schedule
+
+@router.put("/{org_id}/analysis-schedule", response_model=AnalysisScheduleResponse)
+def update_analysis_schedule(
+    org_id: int,
+    payload: AnalysisScheduleBase,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_org_admin(org_id, current_user, db)
+    if not db.query(Organization.id).filter(Organization.id == org_id).first():
+        raise HTTPException(status_code=404, detail="Organization not found")
+
+    schedule = db.query(AnalysisSchedule).filter(AnalysisSchedule.organization_id == org_id).first()
+    if not schedule:
+        schedule = AnalysisSchedule(organization_id=org_id)
+        db.add(schedule)
+    for key, value in payload.model_dump().items():
+        setattr(schedule, key, value)
+    db.commit()
+    db.refresh(schedule)
+    return schedule
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Header, status, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from pydantic import BaseModel
@@ -9,10 +10,17 @@ def now_jst():
     return datetime.now(JST).replace(tzinfo=None)
 import csv
 import io
+from collections import Counter
 
 from backend.database import SessionLocal, Survey, Question, Answer, User, OrganizationMember, SurveyComment, get_db
 from backend.api.auth import get_current_user, UserResponse
 from backend.services.notification_service import create_notification, notify_organization_admins, notify_organization_members
+from backend.services.participation_service import has_answered, add_response_counts
+from backend.services.rollup_service import (
+    record_activity, move_survey_status, remove_subject, survey_status, SURVEY_RESPONSES, SURVEY_ANSWERS
+)
+from backend.services.response_cache import invalidate_lists, SURVEYS
+from backend.services.survey_submission import survey_forms, Submission, DUPLICATE, submit as submit_survey_response
 
 router = APIRouter()
 
@@ -57,6 +65,19 @@ class AnswerSubmit(BaseModel):
 class SurveySubmit(BaseModel):
     answers: List[AnswerSubmit]
 
+class QuestionStats(BaseModel):
+    question_id: int
+    text: str
+    order: int
+    answer_count: int
+
+class SurveyStatsResponse(BaseModel):
+    survey_id: int
+    response_count: int
+    member_count: int
+    response_rate: Optional[float] = None # response_count / member_count (メンバーがいない場合は None)
+    questions: List[QuestionStats]
+
 class CommentCreate(BaseModel):
     content: str
 
@@ -93,6 +114,7 @@ def create_survey(
         approval_status="approved" if is_admin else "pending"
     )
     db.add(new_survey)
+    move_survey_status(db, new_survey.organization_id, None, survey_status(new_survey.approval_status, new_survey.is_active))
     db.commit()
     db.refresh(new_survey)
     
@@ -106,6 +128,7 @@ def create_survey(
         db.add(new_q)
     
     db.commit()
+    invalidate_lists(new_survey.organization_id, SURVEYS)
     db.refresh(new_survey)
     
     # Notify Admins if it's a request
@@ -136,13 +159,8 @@ def get_survey_by_uuid(
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
-    # Check if user has answered
-    has_answered = db.query(Answer).filter(
-        Answer.survey_id == survey.id,
-        Answer.user_id == current_user.id
-    ).first() is not None
-    
-    survey.has_answered = has_answered
+    # Check if user has answered (unique index lookup on survey_participations)
+    survey.has_answered = has_answered(db, survey.id, current_user.id)
     return survey
 
 @router.get("/{survey_id}", response_model=SurveyResponse)
@@ -159,13 +177,8 @@ def get_survey(
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
-    # Check if user has answered
-    has_answered = db.query(Answer).filter(
-        Answer.survey_id == survey.id,
-        Answer.user_id == current_user.id
-    ).first() is not None
-    
-    survey.has_answered = has_answered
+    # Check if user has answered (unique index lookup on survey_participations)
+    survey.has_answered = has_answered(db, survey.id, current_user.id)
     
     return survey
 
@@ -173,51 +186,88 @@ def get_survey(
 def submit_response(
     survey_id: int,
     submission: SurveySubmit,
+    idempotency_key: Optional[str] = Header(default=None),
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Verify access again
-    survey = db.query(Survey).filter(Survey.id == survey_id).first()
-    if not survey:
+    # Survey organization and question ids come from a short-lived cache (no per-request reads)
+    form = survey_forms.get(db, survey_id)
+    if not form:
         raise HTTPException(status_code=404, detail="Survey not found")
-    
-    if survey.organization_id:
+    organization_id, question_ids = form
+
+    # get_current_user has already verified membership of the current organization
+    if organization_id and (organization_id != current_user.current_org_id or current_user.role == 'system_admin'):
          member = db.query(OrganizationMember).filter(
             OrganizationMember.user_id == current_user.id,
-            OrganizationMember.organization_id == survey.organization_id
+            OrganizationMember.organization_id == organization_id
         ).first()
          if not member:
              raise HTTPException(status_code=403, detail="Access denied")
 
-    # 1. Fetch existing answers
-    existing_answers = db.query(Answer).filter(
-        Answer.survey_id == survey.id,
-        Answer.user_id == current_user.id
-    ).all()
-    
-    if existing_answers:
-         raise HTTPException(status_code=400, detail="回答済みです。重複回答はできません。")
+    if any(ans.question_id not in question_ids for ans in submission.answers):
+        raise HTTPException(status_code=400, detail="このアンケートに存在しない設問への回答が含まれています。")
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 64:
+        raise HTTPException(status_code=400, detail="Idempotency-Key は1〜64文字で指定してください。")
 
-    existing_map = {a.question_id: a for a in existing_answers}
-    
-    # 2. Process submission
-    for ans in submission.answers:
-        if not ans.content.strip():
-            continue
-            
-        if ans.question_id in existing_map:
-            existing_map[ans.question_id].content = ans.content
-        else:
-            new_ans = Answer(
-                survey_id=survey.id,
-                question_id=ans.question_id,
-                user_id=current_user.id,
-                content=ans.content
-            )
-            db.add(new_ans)
-            
-    db.commit()
+    # Participation, answers (one multi-row INSERT) and counters are written in one transaction;
+    # a duplicate or concurrent submission loses on the unique participation index
+    try:
+        result = submit_survey_response(db, Submission(
+            survey_id,
+            organization_id,
+            current_user.id,
+            [(ans.question_id, ans.content) for ans in submission.answers if ans.content.strip()],
+            idempotency_key
+        ))
+    except IntegrityError:
+        # Questions changed since they were cached
+        survey_forms.invalidate(survey_id)
+        raise HTTPException(status_code=400, detail="このアンケートに存在しない設問への回答が含まれています。")
+    if result is None:
+        raise HTTPException(
+            status_code=503,
+            detail="回答が混み合っています。しばらくしてから再度送信してください。",
+            headers={"Retry-After": "1"}
+        )
+    if result == DUPLICATE:
+        raise HTTPException(status_code=400, detail="回答済みです。重複回答はできません。")
     return {"message": "Response submitted successfully"}
+
+@router.get("/{survey_id}/stats", response_model=SurveyStatsResponse)
+def get_survey_stats(
+    survey_id: int,
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Response counts from the maintained counters (no scan of answers)."""
+    is_admin = current_user.role in ['admin', 'system_admin'] or current_user.org_role == 'admin'
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    survey = db.query(Survey).filter(
+        Survey.id == survey_id,
+        Survey.organization_id == current_user.current_org_id
+    ).first()
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    questions = db.query(Question).filter(Question.survey_id == survey_id).order_by(Question.order).all()
+    member_count = db.query(OrganizationMember).filter(
+        OrganizationMember.organization_id == survey.organization_id
+    ).count() if survey.organization_id else 0
+    response_count = survey.response_count or 0
+
+    return SurveyStatsResponse(
+        survey_id=survey.id,
+        response_count=response_count,
+        member_count=member_count,
+        response_rate=round(response_count / member_count, 4) if member_count else None,
+        questions=[
+            QuestionStats(question_id=q.id, text=q.text, order=q.order, answer_count=q.answer_count or 0)
+            for q in questions
+        ]
+    )
 @router.post("/import")
 def import_csv(
     file: UploadFile = File(...),
@@ -258,6 +308,7 @@ def import_csv(
             approval_status="approved"
         )
         db.add(new_survey)
+        move_survey_status(db, new_survey.organization_id, None, survey_status(new_survey.approval_status, new_survey.is_active))
         db.commit()
         db.refresh(new_survey)
         
@@ -279,12 +330,15 @@ def import_csv(
             
         # 3. Answers (Iterate by ROW to preserve alignment and group by time)
         answers_to_add = []
+        answered = Counter()
+        respondents = 0
         base_time = now_jst()
         
         for idx, row in df.iterrows():
             # Use distinct timestamp per row to group answers (simulating a "session" or "response")
             # Adding 1 second per row to ensure uniqueness suitable for sorting/grouping
             row_time = base_time + timedelta(seconds=idx)
+            row_has_answer = False
             
             for col in target_cols:
                 val = row[col]
@@ -303,11 +357,20 @@ def import_csv(
                     content=val_str,
                     created_at=row_time
                 ))
+                answered[q.id] += 1
+                row_has_answer = True
+            if row_has_answer:
+                respondents += 1
         
         if answers_to_add:
             db.add_all(answers_to_add)
+        # Each imported row counts as one respondent
+        add_response_counts(db, new_survey.id, respondents, answered)
+        record_activity(db, new_survey.organization_id, SURVEY_RESPONSES, new_survey.id, amount=respondents)
+        record_activity(db, new_survey.organization_id, SURVEY_ANSWERS, new_survey.id, amount=len(answers_to_add))
             
         db.commit()
+        invalidate_lists(new_survey.organization_id, SURVEYS)
         return {"message": "Import successful", "survey_id": new_survey.id}
         
     except HTTPException as he:
@@ -417,6 +480,8 @@ def update_survey(
     if not is_admin and survey.approval_status not in ['pending', 'rejected']:
         raise HTTPException(status_code=403, detail="Cannot edit published surveys")
         
+    old_status = survey_status(survey.approval_status, survey.is_active)
+
     # Update basics
     survey.title = data.title
     survey.description = data.description
@@ -470,7 +535,10 @@ def update_survey(
                 order=idx + 1
             ))
         
+    move_survey_status(db, survey.organization_id, old_status, survey_status(survey.approval_status, survey.is_active))
     db.commit()
+    invalidate_lists(survey.organization_id, SURVEYS)
+    survey_forms.invalidate(survey_id)
     db.refresh(survey)
 
     # Notify admins when a user updates (re-applies) a survey
@@ -507,8 +575,12 @@ def delete_survey(
     if not is_admin and survey.approval_status != 'pending':
         raise HTTPException(status_code=403, detail="Cannot delete published or rejected surveys")
         
+    move_survey_status(db, survey.organization_id, survey_status(survey.approval_status, survey.is_active), None)
+    remove_subject(db, survey.organization_id, (SURVEY_RESPONSES, SURVEY_ANSWERS), survey.id)
     db.delete(survey)
     db.commit()
+    invalidate_lists(survey.organization_id, SURVEYS)
+    survey_forms.invalidate(survey_id)
     return {"message": "Survey deleted"}
 
 @router.patch("/{survey_id}/toggle")
@@ -526,13 +598,16 @@ def toggle_survey_status(
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
+    old_status = survey_status(survey.approval_status, survey.is_active)
     survey.is_active = not survey.is_active
     
     # 公開にした場合は承認済みとする
     if survey.is_active:
         survey.approval_status = "approved"
         
+    move_survey_status(db, survey.organization_id, old_status, survey_status(survey.approval_status, survey.is_active))
     db.commit()
+    invalidate_lists(survey.organization_id, SURVEYS)
 
     # Notify members if it became active
     if survey.is_active:
@@ -563,10 +638,13 @@ def approve_survey(
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
+    old_status = survey_status(survey.approval_status, survey.is_active)
     survey.approval_status = "approved"
     survey.is_active = False # Default to stopped after approval
     
+    move_survey_status(db, survey.organization_id, old_status, survey_status(survey.approval_status, survey.is_active))
     db.commit()
+    invalidate_lists(survey.organization_id, SURVEYS)
 
     # Notify creator on approval
     if survey.created_by:
@@ -597,11 +675,14 @@ def reject_survey(
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
         
+    old_status = survey_status(survey.approval_status, survey.is_active)
     survey.approval_status = "rejected"
     # survey.rejection_reason = reason # Removed per user request
     survey.is_active = False # Ensures it is treated as "Stopped" and hidden from general users
     
+    move_survey_status(db, survey.organization_id, old_status, survey_status(survey.approval_status, survey.is_active))
     db.commit()
+    invalidate_lists(survey.organization_id, SURVEYS)
     
     # Notify creator
     if survey.created_by:
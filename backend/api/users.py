@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 import secrets
 import string
 import logging
+import json
+import csv
+import io
 
-from backend.database import get_db, User, Organization, OrganizationMember
+from backend.database import get_db, SessionLocal, User, Organization, OrganizationMember
 from backend.api.auth import get_current_user, UserResponse
-from backend.security_utils import hash_pass, validate_password_strength, generate_strong_password
+from backend.security_utils import hash_pass, validate_password_strength, generate_strong_password, hash_passwords_parallel
 from backend.services.email_service import send_invitation_email, generate_reset_token
+from backend.services.like_service import release_user_likes
+from backend.services.participation_service import release_user_participations
+from backend.services.response_cache import invalidate_lists, MY_ORGS, SURVEYS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -51,16 +60,73 @@ class UserListResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("", response_model=List[UserListResponse])
+class UserPageResponse(BaseModel):
+    items: List[UserListResponse]
+    next_cursor: Optional[int] = None # 次ページ取得用 (cursor に渡す)。None なら最終ページ
+    has_more: bool = False
+
+DIRECTORY_MAX_LIMIT = 200
+
+def user_search_filter(q: str):
+    """
+    Case-insensitive prefix match on email or display name.
+    Written as lower(col) LIKE 'q%' so it is served by the ix_users_*_lower expression indexes.
+    """
+    escaped = q.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"{escaped}%"
+    return or_(
+        func.lower(User.email).like(pattern, escape="\\"),
+        func.lower(User.username).like(pattern, escape="\\")
+    )
+
+@router.get("", response_model=UserPageResponse)
 def get_users(
+    cursor: Optional[int] = None,
+    limit: int = 50,
+    q: Optional[str] = None,
+    org_id: Optional[int] = None,
+    role: Optional[str] = None,
+    org_role: Optional[str] = None,
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Keyset-paginated user directory (newest first).
+    - cursor: next_cursor of the previous page
+    - q: prefix search on email / display name
+    - org_id / org_role: members of an organization (optionally with that org role)
+    - role: system role (system_admin / system_user)
+    """
     if current_user.role != 'system_admin':
         raise HTTPException(status_code=403, detail="Permission denied")
-        
-    users = db.query(User).order_by(User.id.desc()).all()
-    
+    limit = max(1, min(limit, DIRECTORY_MAX_LIMIT))
+
+    query = db.query(User)
+    if cursor:
+        query = query.filter(User.id < cursor)
+    if q and q.strip():
+        query = query.filter(user_search_filter(q))
+    if role:
+        query = query.filter(User.role == role)
+    if org_id or org_role:
+        membership = []
+        if org_id:
+            membership.append(OrganizationMember.organization_id == org_id)
+        if org_role:
+            membership.append(OrganizationMember.role == org_role)
+        query = query.filter(User.organization_mappings.any(and_(*membership)))
+
+    # Page of ids first, then one joined query for the page's memberships and organization names
+    page_ids = [uid for (uid,) in query.with_entities(User.id).order_by(User.id.desc()).limit(limit + 1).all()]
+    has_more = len(page_ids) > limit
+    page_ids = page_ids[:limit]
+
+    users = []
+    if page_ids:
+        users = db.query(User).options(
+            joinedload(User.organization_mappings).joinedload(OrganizationMember.organization)
+        ).filter(User.id.in_(page_ids)).order_by(User.id.desc()).all()
+
     results = []
     for u in users:
         orgs = []
@@ -79,7 +145,11 @@ def get_users(
             organizations=orgs
         ))
         
-    return results
+    return UserPageResponse(
+        items=results,
+        next_cursor=page_ids[-1] if has_more else None,
+        has_more=has_more
+    )
 
 # generate_random_password removed, use generate_strong_password from security_utils
 
@@ -138,19 +208,264 @@ def create_user_endpoint(
                 ))
         db.commit()
         
-    # Send Invitation
+    # Queue Invitation (delivered by the background email worker)
     try:
-        success = send_invitation_email(user.email, token)
-        if success:
-            logger.info(f"Invitation email sent successfully to {user.email}")
-        else:
-            logger.warning(f"Failed to send invitation email to {user.email}")
+        send_invitation_email(user.email, token, db=db)
+        db.commit()
+        logger.info(f"Invitation email queued for {user.email}")
     except Exception as e:
-        logger.error(f"Failed to send invitation email to {user.email}: {e}")
+        db.rollback()
+        logger.error(f"Failed to queue invitation email to {user.email}: {e}")
         # Continue, don't rollback user creation
         
     return new_user
 
+# --- Bulk Provisioning ---
+
+# 1トランザクションで作成する件数 (この単位で結果をストリーミングする)
+BULK_CHUNK_SIZE = 100
+
+class BulkUserCreate(BaseModel):
+    users: List[UserCreate]
+
+# CSV (test_users_list.csv 形式) の列名と権限種別
+CSV_COLUMN_ALIASES = {
+    "username": ["表示名", "username"],
+    "email": ["メールアドレス", "email"],
+    "role": ["権限種別", "role"],
+    "organizations": ["所属組織", "organizations"],
+}
+CSV_ROLE_MAP = {
+    "システム管理者": ("system_admin", None),
+    "system_admin": ("system_admin", None),
+    "組織管理者": ("system_user", "admin"),
+    "admin": ("system_user", "admin"),
+    "一般ユーザー": ("system_user", "general"),
+    "general": ("system_user", "general"),
+}
+
+def _csv_value(row: dict, key: str) -> str:
+    for alias in CSV_COLUMN_ALIASES[key]:
+        if alias in row and row[alias] is not None:
+            return row[alias].strip()
+    return ""
+
+def _validate_bulk_rows(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    Validates all rows with set-based lookups (one query for emails, one for orgs).
+    Each row: {"row", "email", "username", "is_system_admin", "org_assignments": [(org_id, role)], "org_names": [(name, role)]}
+    Returns the rows with an "error" key set on invalid ones.
+    """
+    emails = [r["email"] for r in rows if r["email"]]
+    existing_emails = {
+        email for (email,) in db.query(User.email).filter(User.email.in_(emails)).all()
+    } if emails else set()
+
+    org_ids = {org_id for r in rows for org_id, _ in r["org_assignments"]}
+    org_names = {name for r in rows for name, _ in r["org_names"]}
+    orgs_query = db.query(Organization.id, Organization.name)
+    if org_ids or org_names:
+        from sqlalchemy import or_
+        orgs = orgs_query.filter(or_(Organization.id.in_(org_ids), Organization.name.in_(org_names))).all()
+    else:
+        orgs = []
+    valid_org_ids = {org_id for org_id, _ in orgs}
+    org_id_by_name = {name: org_id for org_id, name in orgs}
+
+    seen_emails = set()
+    for r in rows:
+        if r.get("error"):
+            continue
+        if not r["email"]:
+            r["error"] = "Email is required"
+            continue
+        if r["email"] in existing_emails:
+            r["error"] = "Email already exists"
+            continue
+        if r["email"] in seen_emails:
+            r["error"] = "Duplicate email in request"
+            continue
+        seen_emails.add(r["email"])
+
+        # Resolve names (CSV) into ids
+        unknown_names = [name for name, _ in r["org_names"] if name not in org_id_by_name]
+        if unknown_names:
+            r["error"] = f"Organization not found: {', '.join(unknown_names)}"
+            continue
+        assignments = r["org_assignments"] + [(org_id_by_name[name], role) for name, role in r["org_names"]]
+        missing_ids = [str(org_id) for org_id, _ in assignments if org_id not in valid_org_ids]
+        if missing_ids:
+            r["error"] = f"Organization with ID {', '.join(missing_ids)} not found."
+            continue
+
+        # Logic: Non-System Admins must join at least one Org; System Admins never have mappings
+        if r["is_system_admin"]:
+            r["org_assignments"] = []
+        elif not assignments:
+            r["error"] = "User must belong to at least one organization"
+            continue
+        else:
+            r["org_assignments"] = list(dict.fromkeys(assignments))
+    return rows
+
+def _provision_chunk(db: Session, rows: List[dict]) -> List[dict]:
+    """Creates users, memberships and queued invitations for valid rows in one transaction."""
+    hashes = hash_passwords_parallel([generate_strong_password() for _ in rows])
+    expiry = datetime.utcnow() + timedelta(hours=24)
+
+    new_users = []
+    tokens = []
+    for r, password_hash in zip(rows, hashes):
+        token = generate_reset_token()
+        tokens.append(token)
+        new_users.append(User(
+            email=r["email"],
+            username=r["username"],
+            password_hash=password_hash,
+            role="system_admin" if r["is_system_admin"] else "system_user",
+            must_change_password=True,
+            reset_token=token,
+            reset_token_expiry=expiry
+        ))
+    db.add_all(new_users)
+    db.flush() # Batched INSERT; populates ids for the membership rows
+
+    db.bulk_insert_mappings(OrganizationMember, [
+        {"user_id": u.id, "organization_id": org_id, "role": role}
+        for u, r in zip(new_users, rows)
+        for org_id, role in r["org_assignments"]
+    ])
+    for u, token in zip(new_users, tokens):
+        send_invitation_email(u.email, token, db=db)
+    db.commit()
+
+    return [
+        {"row": r["row"], "email": u.email, "status": "created", "user_id": u.id}
+        for u, r in zip(new_users, rows)
+    ]
+
+def _provision_error_detail(db: Session, r: dict, error: Exception) -> str:
+    """Why a row could not be created (checked after rollback), worded like the validation errors."""
+    if isinstance(error, IntegrityError):
+        # Changed since validation by a concurrent request
+        if db.query(User.id).filter(User.email == r["email"]).first():
+            return "Email already exists"
+        org_ids = [org_id for org_id, _ in r["org_assignments"]]
+        found = {org_id for (org_id,) in db.query(Organization.id).filter(Organization.id.in_(org_ids)).all()} if org_ids else set()
+        missing_ids = [str(org_id) for org_id in org_ids if org_id not in found]
+        if missing_ids:
+            return f"Organization with ID {', '.join(missing_ids)} not found."
+    return f"Failed to create user: {getattr(error, 'orig', None) or error}"
+
+def _provision_rows_individually(db: Session, rows: List[dict]) -> List[dict]:
+    """Fallback after a chunk failed: one transaction per row, so only the rows that fail are reported."""
+    results = []
+    for r in rows:
+        try:
+            results.extend(_provision_chunk(db, [r]))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Bulk user provisioning failed for row {r['row']}: {e}")
+            results.append({"row": r["row"], "email": r["email"], "status": "error", "detail": _provision_error_detail(db, r, e)})
+    return results
+
+def _bulk_provision_stream(rows: List[dict]):
+    """Yields one NDJSON line per input row, then a summary line."""
+    db = SessionLocal()
+    created = failed = 0
+    try:
+        rows = _validate_bulk_rows(db, rows)
+        valid_rows = []
+        for r in rows:
+            if r.get("error"):
+                failed += 1
+                yield json.dumps({"row": r["row"], "email": r["email"], "status": "error", "detail": r["error"]}, ensure_ascii=False) + "\n"
+            else:
+                valid_rows.append(r)
+
+        for i in range(0, len(valid_rows), BULK_CHUNK_SIZE):
+            chunk = valid_rows[i:i + BULK_CHUNK_SIZE]
+            try:
+                results = _provision_chunk(db, chunk)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Bulk user provisioning chunk failed, retrying row by row: {e}")
+                results = _provision_rows_individually(db, chunk)
+            for res in results:
+                if res["status"] == "created":
+                    created += 1
+                else:
+                    failed += 1
+                yield json.dumps(res, ensure_ascii=False) + "\n"
+
+        yield json.dumps({"summary": {"created": created, "failed": failed}}, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
+
+def _bulk_response(rows: List[dict]) -> StreamingResponse:
+    return StreamingResponse(_bulk_provision_stream(rows), media_type="application/x-ndjson")
+
+@router.post("/bulk")
+def bulk_create_users(
+    payload: BulkUserCreate,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Creates many users at once. Streams one JSON line per user (NDJSON)."""
+    if current_user.role != 'system_admin':
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    rows = [
+        {
+            "row": i + 1,
+            "email": u.email.strip(),
+            "username": u.username,
+            "is_system_admin": u.is_system_admin,
+            "org_assignments": [(a.org_id, a.role) for a in u.org_assignments],
+            "org_names": []
+        }
+        for i, u in enumerate(payload.users)
+    ]
+    return _bulk_response(rows)
+
+@router.post("/bulk/csv")
+def bulk_create_users_csv(
+    file: UploadFile = File(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Creates users from a CSV in the test_users_list.csv layout
+    (表示名, メールアドレス, 権限種別, 所属組織). Passwords in the file are ignored;
+    every user receives an invitation link instead.
+    """
+    if current_user.role != 'system_admin':
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    content = file.file.read()
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Try Shift-JIS just in case for excel exports
+        text = content.decode("shift-jis")
+
+    rows = []
+    for i, record in enumerate(csv.DictReader(io.StringIO(text))):
+        role_label = _csv_value(record, "role")
+        system_role, org_role = CSV_ROLE_MAP.get(role_label, ("system_user", "general"))
+        org_names = [name.strip() for name in _csv_value(record, "organizations").split(",") if name.strip()]
+        row = {
+            "row": i + 1,
+            "email": _csv_value(record, "email"),
+            "username": _csv_value(record, "username"),
+            "is_system_admin": system_role == "system_admin",
+            "org_assignments": [],
+            "org_names": [(name, org_role) for name in org_names] if org_role else []
+        }
+        if role_label and role_label not in CSV_ROLE_MAP:
+            row["error"] = f"Unknown role: {role_label}"
+        rows.append(row)
+
+    return _bulk_response(rows)
+
 @router.put("/{user_id}", response_model=UserListResponse)
 def update_user(
     user_id: int,
@@ -215,6 +530,7 @@ def update_user(
             ))
             
     db.commit()
+    invalidate_lists(None, MY_ORGS)
     db.refresh(u)
     
     # Return with orgs
@@ -251,7 +567,13 @@ def delete_user(
     u = db.query(User).filter(User.id == user_id).first()
     if not u:
          raise HTTPException(status_code=404, detail="User not found")
-         
+
+    # Keep like counters consistent with the like rows that go away with the user
+    release_user_likes(db, user_id)
+    # Same for survey response counters (the user's answers are deleted with the user)
+    release_user_participations(db, user_id)
     db.delete(u)
     db.commit()
+    # Response counts of the user's surveys changed (any organization)
+    invalidate_lists(None, SURVEYS)
     return {"message": "User deleted"}
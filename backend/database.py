@@ -1,5 +1,6 @@
 import uuid
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean, text
+from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, Text, Date, DateTime, Boolean, Index, LargeBinary, JSON, text, func, cast, column
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime, timedelta, timezone
 JST = timezone(timedelta(hours=9))
@@ -10,6 +11,7 @@ import secrets
 import bcrypt
 import os
 import logging
+import orjson
 from dotenv import load_dotenv
 
 from pathlib import Path
@@ -35,7 +37,11 @@ connect_args = {}
 if "sqlite" in DATABASE_URL:
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# JSON/JSONB columns are encoded with orjson (non-ASCII text is kept as-is)
+engine = create_engine(
+    DATABASE_URL, connect_args=connect_args,
+    json_serializer=lambda obj: orjson.dumps(obj).decode("utf-8"), json_deserializer=orjson.loads
+)
 
 from sqlalchemy import event
 if "sqlite" in DATABASE_URL:
@@ -54,6 +60,47 @@ def get_db():
     finally:
         db.close()
 
+def dialect_insert(table):
+    """
+    Returns an INSERT construct for the active dialect that supports
+    on_conflict_do_nothing / on_conflict_do_update (PostgreSQL and SQLite).
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table)
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert(table)
+
+# JSON文書の列: PostgreSQL では JSONB（キー単位で取り出せる）、SQLite では JSON テキスト
+# None は JSON の null ではなく SQL の NULL として保存する
+JSONDocument = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
+def json_text(document):
+    """The document as JSON text, for passing it through to a response without decoding it in Python."""
+    return cast(document, Text)
+
+def json_type(document):
+    """JSON type name of the document ('array', 'object', ...; SQLite and PostgreSQL spell the same names)."""
+    if engine.dialect.name == "postgresql":
+        return func.jsonb_typeof(document)
+    return func.json_type(document)
+
+def json_array_elements(document):
+    """
+    Table-valued function with one row per element of a JSON array, in array order
+    (column `value`; use value["key"].as_string() to project keys). Join it with true()
+    and filter on json_type(document) == 'array' first: PostgreSQL raises on non-arrays.
+    """
+    if engine.dialect.name == "postgresql":
+        return func.jsonb_array_elements(document).table_valued(column("value", JSONB))
+    return func.json_each(document).table_valued(column("value", JSON))
+
+def json_array_length(document, key: str):
+    """Number of elements of the array under a top-level key (NULL when it is missing)."""
+    if engine.dialect.name == "postgresql":
+        return func.jsonb_array_length(document[key])
+    return func.json_array_length(document, f"$.{key}")
+
 # --- ユーザー管理 ---
 class User(Base):
     __tablename__ = "users"
@@ -82,6 +129,11 @@ class User(Base):
     survey_comments = relationship("SurveyComment", back_populates="user")
     notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
 
+# ユーザー一覧の前方一致検索 (lower(email) LIKE 'q%') 用の式インデックス
+# PostgreSQL では照合順序に関係なく LIKE の前方一致に使えるよう text_pattern_ops を指定
+Index("ix_users_email_lower", func.lower(User.email).label("email_lower"), postgresql_ops={"email_lower": "text_pattern_ops"})
+Index("ix_users_username_lower", func.lower(User.username).label("username_lower"), postgresql_ops={"username_lower": "text_pattern_ops"})
+
 class UserSession(Base):
     __tablename__ = "sessions"
     id = Column(String, primary_key=True, default=lambda: secrets.token_urlsafe(32))
@@ -110,6 +162,12 @@ class OrganizationMember(Base):
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False)
     role = Column(String, default="general") # admin, general (Organization Level Role)
     joined_at = Column(DateTime, default=now_jst)
+
+    # メンバー一覧のキーセットページング (organization_id, id) と、所属確認・ユーザー側からの所属取得 (user_id, organization_id) 用
+    __table_args__ = (
+        Index("ix_organization_members_org_id_id", "organization_id", "id"),
+        Index("ix_organization_members_user_org", "user_id", "organization_id"),
+    )
     
     user = relationship("User", back_populates="organization_mappings")
     organization = relationship("Organization", back_populates="members")
@@ -134,6 +192,8 @@ class Survey(Base):
     # New columns for Approval Flow
     approval_status = Column(String, default="pending") # pending, approved, rejected
     rejection_reason = Column(Text, nullable=True) # Reason for rejection
+
+    response_count = Column(Integer, default=0, server_default="0") # 回答者数（回答送信・CSV取込時にSQLのインクリメントで更新）
     
     questions = relationship("Question", back_populates="survey", cascade="all, delete-orphan")
     answers = relationship("Answer", back_populates="survey", cascade="all, delete-orphan")
@@ -149,6 +209,7 @@ class Question(Base):
     text = Column(String) # 質問文
     order = Column(Integer) # 表示順
     is_required = Column(Boolean, default=True) # 必須かどうか
+    answer_count = Column(Integer, default=0, server_default="0") # 空でない回答の数（回答送信・CSV取込時に更新）
     
     survey = relationship("Survey", back_populates="questions")
     answers = relationship("Answer", back_populates="question", cascade="all, delete-orphan")
@@ -162,11 +223,30 @@ class Answer(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # ゲスト回答可能に
     content = Column(Text) # 回答内容
     created_at = Column(DateTime, default=now_jst)
+
+    # 設問ごとの回答取得 (分析) と、回答済みチェック (survey_id, user_id) 用
+    __table_args__ = (
+        Index("ix_answers_question_id", "question_id"),
+        Index("ix_answers_survey_user", "survey_id", "user_id"),
+    )
     
     survey = relationship("Survey", back_populates="answers")
     question = relationship("Question", back_populates="answers")
     user = relationship("User", back_populates="answers")
 
+class SurveyParticipation(Base):
+    """アンケートへの回答済み記録（ログインユーザー1人につき1行。回答済みチェックと二重回答防止に使用）"""
+    __tablename__ = "survey_participations"
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    idempotency_key = Column(String(64), nullable=True) # 送信時の Idempotency-Key（再送を成功として扱うため）
+    created_at = Column(DateTime, default=now_jst)
+
+    __table_args__ = (
+        Index("uq_survey_participations_survey_user", "survey_id", "user_id", unique=True),
+    )
+
 # --- 分析レポート (既存) ---
 class AnalysisSession(Base):
     __tablename__ = "analysis_sessions"
@@ -175,12 +255,13 @@ class AnalysisSession(Base):
     theme = Column(String)
     created_at = Column(DateTime, default=now_jst)
     is_published = Column(Boolean, default=False)
-    comment_analysis = Column(Text, nullable=True)
     is_comment_analysis_published = Column(Boolean, default=False)
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True) # Link to Org
     
     results = relationship("AnalysisResult", back_populates="session", cascade="all, delete-orphan")
     report = relationship("IssueDefinition", back_populates="session", uselist=False, cascade="all, delete-orphan")
+    snapshot = relationship("AnalysisSessionSnapshot", back_populates="session", uselist=False, cascade="all, delete-orphan")
+    thread_analyses = relationship("CommentThreadAnalysis", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
     comments = relationship("Comment", back_populates="session", cascade="all, delete-orphan")
     organization = relationship("Organization", back_populates="analysis_sessions")
 
@@ -196,15 +277,34 @@ class AnalysisResult(Base):
     y_coordinate = Column(Float, nullable=True)
     cluster_id = Column(Integer, nullable=True)
     # small_voice_score removed
+
+    # セッション詳細での結果一覧 (session_id で絞り込み、id 順) 用
+    __table_args__ = (
+        Index("ix_analysis_results_session_id_id", "session_id", "id"),
+    )
+
     session = relationship("AnalysisSession", back_populates="results")
 
 class IssueDefinition(Base):
     __tablename__ = "issue_definitions"
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("analysis_sessions.id"))
-    content = Column(Text)
+    # [{"id": "...", "title": "...", "description": "...", ...}]
+    content = Column(JSONDocument)
     session = relationship("AnalysisSession", back_populates="report")
 
+class AnalysisSessionSnapshot(Base):
+    """公開時に固定したレポート本体（分析結果・課題）。gzip圧縮したJSONをそのまま返す"""
+    __tablename__ = "analysis_session_snapshots"
+    session_id = Column(Integer, ForeignKey("analysis_sessions.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=1) # 公開のたびに増える（ETag に使用）
+    format = Column(Integer, nullable=False) # 本文の形式。形式が変わったら古いスナップショットは作り直す
+    body = Column(LargeBinary, nullable=False)
+    result_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=now_jst)
+
+    session = relationship("AnalysisSession", back_populates="snapshot")
+
 class Comment(Base):
     __tablename__ = "comments"
     id = Column(Integer, primary_key=True, index=True)
@@ -226,6 +326,33 @@ class Comment(Base):
     
     # いいね機能
     likes = relationship("CommentLike", back_populates="comment", cascade="all, delete-orphan")
+    likes_count = Column(Integer, default=0, server_default="0") # いいね数（SQLのインクリメントで更新）
+
+    # セッション詳細のコメント一覧 (session_id, id) と、スレッドの返信取得 (parent_id) 用
+    __table_args__ = (
+        Index("ix_comments_session_id_id", "session_id", "id"),
+        Index("ix_comments_parent_id", "parent_id"),
+    )
+
+class CommentThreadAnalysis(Base):
+    """AIファシリテーターのスレッド分析（親コメントごとに1行。スレッド単位で上書きする）"""
+    __tablename__ = "comment_thread_analyses"
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("analysis_sessions.id", ondelete="CASCADE"), nullable=False)
+    parent_comment_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"), nullable=False)
+    result = Column(JSONDocument)
+    # 分析したときのスレッド（親＋返信）の状態。変わっていなければ再分析しない
+    last_comment_id = Column(Integer, nullable=True) # 最大のコメントID（新しい返信の検出）
+    comment_count = Column(Integer, default=0) # コメント数（削除の検出）
+    last_edited_at = Column(DateTime, nullable=True) # 最新の作成・編集日時（編集の検出）
+    created_at = Column(DateTime, default=now_jst)
+    updated_at = Column(DateTime, default=now_jst)
+
+    __table_args__ = (
+        Index("uq_comment_thread_analyses_session_parent", "session_id", "parent_comment_id", unique=True),
+    )
+
+    session = relationship("AnalysisSession", back_populates="thread_analyses")
 
 class CommentLike(Base):
     __tablename__ = "comment_likes"
@@ -233,6 +360,10 @@ class CommentLike(Base):
     comment_id = Column(Integer, ForeignKey("comments.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=now_jst)
+
+    __table_args__ = (
+        Index("uq_comment_likes_comment_user", "comment_id", "user_id", unique=True),
+    )
     
     comment = relationship("Comment", back_populates="likes")
     user = relationship("User")
@@ -248,6 +379,12 @@ class CasualPost(Base):
     content = Column(Text)
     created_at = Column(DateTime, default=now_jst)
     likes_count = Column(Integer, default=0) # Simple counter for now, or relationship if needed
+    replies_count = Column(Integer, default=0, server_default="0") # 返信作成時にインクリメント（一覧でのGROUP BYを避けるため）
+
+    # フィードのキーセットページング (organization_id, created_at, id) 用
+    __table_args__ = (
+        Index("ix_casual_posts_org_created_id", "organization_id", "created_at", "id"),
+    )
     
     # Relationships
     organization = relationship("Organization")
@@ -263,6 +400,10 @@ class CasualPostLike(Base):
     post_id = Column(Integer, ForeignKey("casual_posts.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=now_jst)
+
+    __table_args__ = (
+        Index("uq_casual_post_likes_post_user", "post_id", "user_id", unique=True),
+    )
     
     post = relationship("CasualPost", back_populates="likes")
     user = relationship("User")
@@ -280,12 +421,49 @@ class CasualAnalysis(Base):
     
     # Content (JSON)
     # Expected format: { "recommendations": [ { "title": "...", "reason": "...", "suggested_questions": [...] } ] }
-    result_json = Column(Text)
+    result_json = Column(JSONDocument)
     
     is_published = Column(Boolean, default=False) # 公開/非公開
     
     organization = relationship("Organization")
 
+class CasualDailyDigest(Base):
+    """雑談投稿の日次ダイジェスト（1日分の投稿をトピックごとに要約したもの。分析期間の集計に再利用）"""
+    __tablename__ = "casual_daily_digests"
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    digest_date = Column(Date, nullable=False)
+    post_count = Column(Integer, default=0) # 作成時点の投稿数（件数が変わっていれば再作成）
+    # Expected format: [ { "count": 12, "duplicates": 3, "representatives": ["...", ...] } ]
+    topics_json = Column(Text)
+    created_at = Column(DateTime, default=now_jst)
+
+    __table_args__ = (
+        Index("uq_casual_daily_digests_org_date", "organization_id", "digest_date", unique=True),
+    )
+
+class AnalysisSchedule(Base):
+    """組織ごとの分析の定期実行設定（管理者が待たずに済むよう、オフピークに事前計算する）"""
+    __tablename__ = "analysis_schedules"
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    is_enabled = Column(Boolean, default=False)
+    run_hour = Column(Integer, default=3) # 実行時刻 (JST, 0-23)
+
+    # 雑談掲示板: 直近 casual_window_days 日分を casual_interval_days 日ごとに分析
+    casual_enabled = Column(Boolean, default=True)
+    casual_window_days = Column(Integer, default=30)
+    casual_interval_days = Column(Integer, default=7)
+    last_casual_run_at = Column(DateTime, nullable=True)
+
+    # アンケート: 設問ごとの回答数が survey_answer_threshold 件の倍数を超えるたびに分析
+    survey_enabled = Column(Boolean, default=True)
+    survey_answer_threshold = Column(Integer, default=20)
+    # Expected format: { "<question_id>": <前回分析時の回答数> }
+    survey_progress_json = Column(Text, nullable=True)
+
+    last_run_date = Column(Date, nullable=True) # 同じ日に二重実行しないための記録
+    updated_at = Column(DateTime, default=now_jst, onupdate=now_jst)
+
 class SurveyComment(Base):
     """申請フォーム上のチャットコメント"""
     __tablename__ = "survey_comments"
@@ -311,9 +489,77 @@ class Notification(Base):
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(JST))
 
+    # 通知の集約 (同一タイプ・同一リンクの未読通知は1行にまとめる)
+    count = Column(Integer, default=1, server_default="1") # 集約された通知の件数
+    updated_at = Column(DateTime, default=now_jst) # 最後に集約された日時
+
+    # 通知一覧は updated_at の新しい順 (集約で並び順が変わるため created_at ではなく updated_at)
+    __table_args__ = (
+        Index("ix_notifications_user_updated", "user_id", "updated_at"),
+    )
+
     user = relationship("User", back_populates="notifications")
     organization = relationship("Organization")
 
+class NotificationCounter(Base):
+    """ユーザーごとの未読通知数 (通知作成・既読化のたびに増減させる)"""
+    __tablename__ = "notification_counters"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+# --- 組織ダッシュボードの集計 (書き込み時に増減させるロールアップ) ---
+class OrganizationDailyStat(Base):
+    """組織ごと・日ごと・対象ごとの件数（回答・雑談投稿・コメントの作成時にSQLで加算）"""
+    __tablename__ = "organization_daily_stats"
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    stat_date = Column(Date, nullable=False) # JST
+    metric = Column(String(32), nullable=False) # survey_responses, survey_answers, casual_posts, session_comments
+    subject_id = Column(Integer, nullable=False, default=0, server_default="0") # survey_id / session_id（組織全体の指標は0）
+    value = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # 加算の UPSERT 用と、全組織の期間集計 (metric, stat_date) 用
+    __table_args__ = (
+        Index("uq_organization_daily_stats_key", "organization_id", "metric", "subject_id", "stat_date", unique=True),
+        Index("ix_organization_daily_stats_metric_date", "metric", "stat_date"),
+    )
+
+class OrganizationStat(Base):
+    """組織ごとの累計値・現在値（アンケートの状態別件数、回答・投稿・コメントの累計）"""
+    __tablename__ = "organization_stats"
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    metric = Column(String(32), primary_key=True)
+    value = Column(Integer, nullable=False, default=0, server_default="0")
+
+class OrganizationMemberActivity(Base):
+    """メンバーの最終活動日（回答・投稿・コメント時に更新。アクティブメンバー数の集計用）"""
+    __tablename__ = "organization_member_activity"
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_active_on = Column(Date, nullable=False) # JST
+
+    __table_args__ = (
+        Index("ix_organization_member_activity_org_date", "organization_id", "last_active_on"),
+    )
+
+# --- メール送信キュー ---
+class EmailOutbox(Base):
+    """送信待ちメール (バックグラウンドの送信ワーカーがまとめて配信する)"""
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String)
+    html_body = Column(Text)
+    text_body = Column(Text)
+    mock_title = Column(String, nullable=True) # ローカル環境でのログ出力用ラベル
+    status = Column(String, default="pending", index=True) # pending, sending, sent, failed
+    claimed_at = Column(DateTime, nullable=True) # sending にした日時 (期限切れなら他のプロセスが再送する)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=now_jst) # リトライ時のバックオフ後の送信予定日時
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=now_jst)
+    sent_at = Column(DateTime, nullable=True)
+
 # --- 初期化 ---
 def init_db():
     Base.metadata.create_all(bind=engine)
@@ -14,13 +14,29 @@ logging.basicConfig(
 # Add parent directory to path to allow importing 'backend' package when running uvicorn from backend/ directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api import auth, dashboard, survey, organization, users
 
-from backend.database import init_db
+from backend.database import init_db, engine
+from backend.services.query_budget import install_query_instrumentation, track_queries, report_request
+from backend.services.compression import CompressionMiddleware
 app = FastAPI(title="SmallVoice API")
 
+# Per-request statement count / DB time (headers in dev, metrics everywhere) and N+1 detection
+install_query_instrumentation(engine)
+
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    with track_queries() as stats:
+        response = await call_next(request)
+    # Label by handler (e.g. "casual_chat.get_feed") so path parameters do not split the metrics
+    endpoint = request.scope.get("endpoint")
+    label = f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}" if endpoint else "unmatched"
+    headers = report_request(label, stats)
+    response.headers.update(headers)
+    return response
+
 @app.on_event("startup")
 def on_startup():
     init_db()
@@ -32,6 +48,27 @@ def on_startup():
     except Exception as e:
         logging.error(f"Failed to preload embedding model: {e}")
 
+    # Background delivery of queued emails (invitations, password resets)
+    from backend.services.email_service import start_email_worker
+    start_email_worker()
+
+    # Off-peak precomputation of casual and survey analyses (per-organization schedules)
+    from backend.services.analysis_scheduler import start_analysis_scheduler
+    start_analysis_scheduler()
+
+    # Optional group commit of survey submissions (SURVEY_WRITE_BEHIND_ENABLED)
+    from backend.services.survey_submission import start_submission_buffer
+    start_submission_buffer()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    from backend.services.email_service import stop_email_worker
+    stop_email_worker()
+    from backend.services.analysis_scheduler import stop_analysis_scheduler
+    stop_analysis_scheduler()
+    from backend.services.survey_submission import stop_submission_buffer
+    stop_submission_buffer()
+
 # CORS Configuration
 allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "")
 if allowed_origins_str:
@@ -52,6 +89,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip / brotli for large responses (report details, analysis lists)
+app.add_middleware(CompressionMiddleware)
+
 # Include Routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
@@ -59,9 +99,10 @@ app.include_router(survey.router, prefix="/api/surveys", tags=["surveys"])
 app.include_router(organization.router, prefix="/api/organizations", tags=["organizations"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 
-from backend.api import casual_chat, notifications
+from backend.api import casual_chat, notifications, metrics
 app.include_router(casual_chat.router, prefix="/api/casual", tags=["casual_chat"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 @app.get("/")
 @app.get("/api")
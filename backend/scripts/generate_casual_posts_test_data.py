@@ -257,6 +257,7 @@ def generate_casual_posts(num_posts=100):
                             likes_count=random.randint(0, 5)
                         )
                         db.add(reply)
+                        post.replies_count = (post.replies_count or 0) + 1
                         reply_count += 1
             
             db.commit()
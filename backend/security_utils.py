@@ -1,7 +1,16 @@
+import os
 import re
 import secrets
 import bcrypt
 import string
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from backend.services.metrics import metrics
 
 # Constant time dummy hash for timing attack mitigation
 # This hash corresponds to "dummy_password" with a specific salt, pre-calculated
@@ -75,3 +84,147 @@ def verify_password_safe(plain_password: str, hashed_password: str | None) -> bo
 def hash_pass(password: str) -> str:
     """Hash a password using bcrypt."""
     return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+# 一括ユーザー作成時のハッシュ計算に使うプロセス数
+BCRYPT_HASH_WORKERS = int(os.getenv("BCRYPT_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+_hash_pool = None
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn: the API process runs background threads, which fork-based pools do not handle safely
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=BCRYPT_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+def hash_passwords_parallel(passwords: list[str]) -> list[str]:
+    """Hash many passwords with bcrypt across a process pool (order is preserved)."""
+    if not passwords:
+        return []
+    if len(passwords) == 1 or BCRYPT_HASH_WORKERS <= 1:
+        return [hash_pass(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (BCRYPT_HASH_WORKERS * 4))
+    return list(_get_hash_pool().map(hash_pass, passwords, chunksize=chunksize))
+
+# --- Bounded password verification (login storms) ---
+
+# bcrypt照合専用のプロセス数。APIの他のリクエストにCPUを残すため既定は半数のコア
+PASSWORD_VERIFY_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# 同時に受け付ける照合数 (実行中 + 待機中)。超えた分は即座に503で返す
+PASSWORD_VERIFY_MAX_PENDING = int(os.getenv("PASSWORD_VERIFY_MAX_PENDING", PASSWORD_VERIFY_WORKERS * 8))
+PASSWORD_VERIFY_TIMEOUT = float(os.getenv("PASSWORD_VERIFY_TIMEOUT", 10))
+
+class PasswordVerifierBusy(Exception):
+    """Raised when the verification queue is full or the check timed out."""
+
+_verify_pool = None
+_verify_pool_lock = threading.Lock()
+_verify_slots = threading.BoundedSemaphore(PASSWORD_VERIFY_MAX_PENDING)
+
+def _get_verify_pool() -> ProcessPoolExecutor:
+    global _verify_pool
+    with _verify_pool_lock:
+        if _verify_pool is None:
+            _verify_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_VERIFY_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _verify_pool
+
+def _reset_verify_pool():
+    global _verify_pool
+    with _verify_pool_lock:
+        if _verify_pool is not None:
+            _verify_pool.shutdown(wait=False, cancel_futures=True)
+        _verify_pool = None
+
+async def verify_password_bounded(plain_password: str, hashed_password: str | None) -> bool:
+    """
+    Same contract as verify_password_safe, but runs the bcrypt check in the dedicated
+    verification pool and awaits it without holding a thread. At most
+    PASSWORD_VERIFY_MAX_PENDING checks are admitted at once; beyond that
+    PasswordVerifierBusy is raised instead of queueing unboundedly.
+    """
+    if not _verify_slots.acquire(blocking=False):
+        metrics.increment("auth.verify.rejected_busy")
+        raise PasswordVerifierBusy()
+
+    metrics.gauge_add("auth.verify.in_flight", 1)
+
+    def release_slot(_future=None):
+        metrics.gauge_add("auth.verify.in_flight", -1)
+        _verify_slots.release()
+
+    start = time.monotonic()
+    try:
+        try:
+            future = _get_verify_pool().submit(verify_password_safe, plain_password, hashed_password)
+        except BrokenProcessPool:
+            release_slot()
+            raise
+        # The slot is freed when the job leaves the pool (done or cancelled), not when the caller
+        # gives up, so a timed-out check still counts until it is really gone
+        future.add_done_callback(release_slot)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=PASSWORD_VERIFY_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Drops the job if it is still queued; one already running frees its slot when it finishes
+            future.cancel()
+            metrics.increment("auth.verify.timeout")
+            raise PasswordVerifierBusy()
+    except BrokenProcessPool:
+        # A worker died; rebuild the pool for the next caller and answer this one in a thread
+        metrics.increment("auth.verify.pool_restart")
+        _reset_verify_pool()
+        return await asyncio.to_thread(verify_password_safe, plain_password, hashed_password)
+    finally:
+        metrics.observe("auth.verify", time.monotonic() - start)
+
+class TokenBucketLimiter:
+    """
+    In-memory token bucket per key (e.g. client IP or account email).
+    Each key holds up to `capacity` tokens and regains `refill_per_second`.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 100000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str) -> float:
+        """Takes one token. Returns 0 if allowed, otherwise seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / self.refill_per_second
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return retry_after
+
+    def _prune(self, now: float):
+        # Buckets idle long enough to be full again carry no state worth keeping
+        full_after = self.capacity / self.refill_per_second
+        self._buckets = {
+            k: v for k, v in self._buckets.items() if now - v[1] < full_after
+        }
+
+# ログイン試行の流量制限 (IP単位は同一NAT配下の全社員を考慮して緩め、アカウント単位は厳しめ)
+login_ip_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("LOGIN_RATE_IP_BURST", 60)),
+    refill_per_second=float(os.getenv("LOGIN_RATE_IP_PER_MINUTE", 120)) / 60
+)
+login_account_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("LOGIN_RATE_ACCOUNT_BURST", 5)),
+    refill_per_second=float(os.getenv("LOGIN_RATE_ACCOUNT_PER_MINUTE", 5)) / 60
+)
@@ -1,4 +1,5 @@
 
+import re
 import json
 import logging
 import numpy as np
@@ -473,24 +474,93 @@ def generate_issue_logic_from_clusters(df, theme_name):
         return []
 
 
-def analyze_thread_logic(comments):
+class JsonArrayItemParser:
     """
-    Analyze a discussion thread (parent + children) and generate a simple summary and actions.
+    Incremental reader for a streamed JSON document of the form {"<key>": [{...}, {...}], ...}.
+    feed() takes the next text chunk and returns the array elements completed by it, so each
+    item can be shown before the whole document has arrived. Only used for early display:
+    the complete text is still parsed with json.loads at the end.
     """
-    if not comments:
-        return {"summary": "議論がありません。", "key_points": [], "next_steps": []}
 
+    def __init__(self, key):
+        self.key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.buffer = ""
+        self.pos = None # scan position inside the array (None until the key is found)
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.item_start = None
+        self.closed = False
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        if self.pos is None:
+            match = self.key_pattern.search(self.buffer)
+            if not match:
+                return items
+            self.pos = match.end()
+        while self.pos < len(self.buffer) and not self.closed:
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 0:
+                    self.item_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0:
+                    # End of the array
+                    self.closed = True
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        try:
+                            items.append(json.loads(self.buffer[self.item_start:self.pos + 1]))
+                        except ValueError:
+                            pass
+                        self.item_start = None
+            self.pos += 1
+        return items
+
+def _chunk_text(chunk):
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+        return chunk.text
+    except ValueError:
+        # A chunk without text parts (e.g. the last one, carrying only the finish reason)
+        return ""
 
-        # Format comments for prompt
-        formatted_thread = ""
-        for c in comments:
-            # c is a dict with content, user_name, created_at
-            formatted_thread += f"[{c.get('user_name', '不明')}] {c.get('content', '')}\n"
-
-        prompt = f"""あなたは中立的かつ理性的で、議論を建設的な解決へと導く専門家（プロのファシリテーター）です。
+def _stream_array_items(prompt, key, event):
+    """
+    Generates with Gemini's streaming API and yields (event, item) for each element of the
+    `key` array as soon as it is complete. Returns the full response text (use `yield from`).
+    """
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+    parser = JsonArrayItemParser(key)
+    parts = []
+    for chunk in model.generate_content(prompt, stream=True):
+        text = _chunk_text(chunk)
+        parts.append(text)
+        for item in parser.feed(text):
+            yield event, item
+    return "".join(parts)
+
+def _thread_prompt(comments):
+    # Format comments for prompt
+    formatted_thread = ""
+    for c in comments:
+        # c is a dict with content, user_name, created_at
+        formatted_thread += f"[{c.get('user_name', '不明')}] {c.get('content', '')}\n"
+
+    return f"""あなたは中立的かつ理性的で、議論を建設的な解決へと導く専門家（プロのファシリテーター）です。
 以下のチャットスレッド（議論の流れ）を深く分析し、参加者の意見を尊重しつつ、状況を整理して次の具体的なアクションを提案してください。
 
 ### 議論の内容:
@@ -509,6 +579,20 @@ def analyze_thread_logic(comments):
     ]
 }}
 """
+
+def analyze_thread_logic(comments):
+    """
+    Analyze a discussion thread (parent + children) and generate a simple summary and actions.
+    Raises when Gemini fails, so that callers do not store a failure as the thread's analysis.
+    """
+    if not comments:
+        return {"summary": "議論がありません。", "key_points": [], "next_steps": []}
+
+    try:
+        genai.configure(api_key=GEMINI_API_KEY)
+        model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+
+        prompt = _thread_prompt(comments)
         logger.info("Generating Thread Analysis with Gemini...")
         response = model.generate_content(prompt)
         result = json.loads(response.text)
@@ -516,30 +600,127 @@ def analyze_thread_logic(comments):
 
     except Exception as e:
         logger.error(f"Thread analysis logic failed: {e}")
-        return {
-            "next_steps": [{"title": "エラー", "detail": f"分析中にエラーが発生しました: {str(e)}"}]
-        }
+        raise
 
-def analyze_casual_posts_logic(posts, org_name=""):
+def stream_thread_analysis_logic(comments):
     """
-    Analyze casual posts to identify topics that should be escalated to a formal survey.
-    Returns a list of recommendations.
+    Streaming variant of analyze_thread_logic. Yields ("next_step", item) for each next step as
+    soon as Gemini has produced it, then ("result", result) with the same result
+    analyze_thread_logic would return. Raises on failure, like analyze_thread_logic.
     """
-    if not posts:
-        return {"recommendations": []}
+    if not comments:
+        yield "result", {"summary": "議論がありません。", "key_points": [], "next_steps": []}
+        return
 
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+        logger.info("Streaming Thread Analysis with Gemini...")
+        text = yield from _stream_array_items(_thread_prompt(comments), "next_steps", "next_step")
+        result = json.loads(text)
+    except Exception as e:
+        logger.error(f"Thread analysis stream failed: {e}")
+        raise
+    yield "result", result
+
+# 雑談分析: この件数以下なら全件をそのままLLMに渡す
+CASUAL_ANALYSIS_DIRECT_LIMIT = 60
+# 件数が多い場合はローカルでトピック分けし、代表投稿のみを送る
+CASUAL_ANALYSIS_MAX_TOPICS = 12
+CASUAL_ANALYSIS_REPRESENTATIVES_PER_TOPIC = 5
+# コサイン類似度がこれ以上の投稿は重複とみなす
+CASUAL_ANALYSIS_DUPLICATE_SIMILARITY = 0.92
+# 最適K探索に使うサンプル数の上限（シルエット計算がO(N^2)のため）
+CASUAL_ANALYSIS_K_SEARCH_SAMPLE = 500
+# 1投稿あたりプロンプトに含める最大文字数
+CASUAL_ANALYSIS_MAX_POST_CHARS = 300
+
+def group_casual_posts(texts, weights=None, duplicate_weights=None):
+    """
+    Groups casual posts into topics with the local embedding pipeline and picks representatives.
+    Returns a list of {"count", "duplicates", "representatives"} sorted by topic size, so the
+    LLM prompt stays bounded (MAX_TOPICS x REPRESENTATIVES_PER_TOPIC) however many posts there are.
+
+    weights / duplicate_weights let already-grouped representatives (e.g. daily digests) be
+    regrouped: each text then stands for `weight` posts, `duplicate_weight` of them near-duplicates.
+    """
+    weights = np.ones(len(texts)) if weights is None else np.asarray(weights, dtype=float)
+    duplicate_weights = np.zeros(len(texts)) if duplicate_weights is None else np.asarray(duplicate_weights, dtype=float)
+
+    vectors = np.asarray(get_vectors_semantic(texts), dtype=float)
+    if len(vectors) == 0:
+        return [{
+            "count": int(round(weights.sum())),
+            "duplicates": int(round(duplicate_weights.sum())),
+            "representatives": texts[:CASUAL_ANALYSIS_REPRESENTATIVES_PER_TOPIC]
+        }]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
 
-        # Format posts
-        formatted_posts = ""
-        # Assuming posts is a list of strings or objects with 'content'
-        for p in posts:
-            content = p.content if hasattr(p, 'content') else str(p)
-            formatted_posts += f"- {content}\n"
+    n_samples = len(texts)
+    rng = np.random.default_rng(42)
+    sample = vectors
+    if n_samples > CASUAL_ANALYSIS_K_SEARCH_SAMPLE:
+        sample = vectors[rng.choice(n_samples, CASUAL_ANALYSIS_K_SEARCH_SAMPLE, replace=False)]
+    k = min(get_optimal_k(sample, max_k=CASUAL_ANALYSIS_MAX_TOPICS), n_samples)
+    if k > 1:
+        labels = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(vectors, sample_weight=weights)
+    else:
+        labels = np.zeros(n_samples, dtype=int)
+
+    topics = []
+    for cluster_id in np.unique(labels):
+        member_indices = np.where(labels == cluster_id)[0]
+        member_vectors = vectors[member_indices]
+        centroid = member_vectors.mean(axis=0)
+
+        # Closest to the centroid first; skip posts nearly identical to one already chosen
+        order = member_indices[np.argsort(-(member_vectors @ centroid))]
+        chosen = []
+        duplicates = duplicate_weights[member_indices].sum()
+        for idx in order:
+            if chosen and np.max(vectors[chosen] @ vectors[idx]) >= CASUAL_ANALYSIS_DUPLICATE_SIMILARITY:
+                duplicates += weights[idx]
+            elif len(chosen) < CASUAL_ANALYSIS_REPRESENTATIVES_PER_TOPIC:
+                chosen.append(idx)
+
+        topics.append({
+            "count": int(round(weights[member_indices].sum())),
+            "duplicates": int(round(min(duplicates, weights[member_indices].sum()))),
+            "representatives": [texts[i] for i in chosen]
+        })
 
-        prompt = f"""あなたは組織開発の専門家です。
+    topics.sort(key=lambda t: t["count"], reverse=True)
+    return topics
+
+def _casual_prompt(posts, org_name="", topics=None, total_posts=None):
+    """Prompt for analyze_casual_posts_logic, or None when there is nothing to analyze."""
+    # Assuming posts is a list of strings or objects with 'content'
+    texts = [p.content if hasattr(p, 'content') else str(p) for p in posts or []]
+    texts = [t for t in texts if t and t.strip()]
+    if not texts and not topics:
+        return None
+
+    def clip(text):
+        text = text.strip()
+        return text if len(text) <= CASUAL_ANALYSIS_MAX_POST_CHARS else text[:CASUAL_ANALYSIS_MAX_POST_CHARS] + "…"
+
+    # Format posts
+    formatted_posts = ""
+    if topics is None and len(texts) <= CASUAL_ANALYSIS_DIRECT_LIMIT:
+        for content in texts:
+            formatted_posts += f"- {clip(content)}\n"
+    else:
+        # Large boards: send topic representatives and counts instead of every post
+        if topics is None:
+            logger.info(f"Grouping {len(texts)} casual posts into topics before LLM analysis...")
+            topics = group_casual_posts(texts)
+            total_posts = len(texts)
+        formatted_posts += f"（投稿総数 {total_posts}件。類似する投稿をトピックごとにまとめ、代表的な投稿のみを掲載しています）\n"
+        for i, topic in enumerate(topics, 1):
+            formatted_posts += f"\n#### トピック{i}（投稿数: {topic['count']}件、うちほぼ同内容: {topic['duplicates']}件）\n"
+            for content in topic["representatives"]:
+                formatted_posts += f"- {clip(content)}\n"
+
+    return f"""あなたは組織開発の専門家です。
 「{org_name}」という組織の「雑談掲示板」に投稿された以下の内容を分析し、
 全社的なアンケート（サーベイ）を実施して意見を問うべき重要なトピックを特定してください。
 メンバーが直面している課題、潜在的な要望、組織として対応すべき兆候を拾い上げてください。
@@ -570,21 +751,62 @@ def analyze_casual_posts_logic(posts, org_name=""):
 }}
 推論の結果、特筆すべきアンケート推奨事項がない場合は、空のリストを返しても構いません。
 """
+
+def _parse_casual_result(result_text):
+    # Parse JSON
+    result_text = result_text.strip()
+    if "```" in result_text:
+         result_text = result_text.split("```")[-2] if "json" in result_text else result_text.split("```")[1]
+         if result_text.startswith("json"): result_text = result_text[4:]
+
+    return json.loads(result_text)
+
+def analyze_casual_posts_logic(posts, org_name="", topics=None, total_posts=None):
+    """
+    Analyze casual posts to identify topics that should be escalated to a formal survey.
+    Returns a list of recommendations.
+    Pass pre-grouped `topics` (see group_casual_posts) and `total_posts` instead of posts
+    when the window has already been reduced, e.g. from daily digests.
+    """
+    if not posts and not topics:
+        return {"recommendations": []}
+
+    try:
+        genai.configure(api_key=GEMINI_API_KEY)
+        model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+
+        prompt = _casual_prompt(posts, org_name, topics, total_posts)
+        if prompt is None:
+            return {"recommendations": []}
+
         logger.info("Generating Casual Post Analysis with Gemini...")
         response = model.generate_content(prompt)
-        # Parse JSON
-        result_text = response.text.strip()
-        if "```" in result_text:
-             result_text = result_text.split("```")[-2] if "json" in result_text else result_text.split("```")[1]
-             if result_text.startswith("json"): result_text = result_text[4:]
-        
-        result = json.loads(result_text)
-        return result
+        return _parse_casual_result(response.text)
 
     except Exception as e:
         logger.error(f"Casual post analysis failed: {e}")
         return {"recommendations": [], "error": str(e)}
 
+def stream_casual_posts_logic(posts, org_name="", topics=None, total_posts=None):
+    """
+    Streaming variant of analyze_casual_posts_logic (same arguments). Yields ("recommendation", item)
+    for each recommendation as soon as Gemini has produced it, then ("result", result) with the
+    same result analyze_casual_posts_logic would return.
+    """
+    if not posts and not topics:
+        yield "result", {"recommendations": []}
+        return
 
-            
-
+    try:
+        prompt = _casual_prompt(posts, org_name, topics, total_posts)
+        if prompt is None:
+            yield "result", {"recommendations": []}
+            return
+
+        logger.info("Streaming Casual Post Analysis with Gemini...")
+        text = yield from _stream_array_items(prompt, "recommendations", "recommendation")
+        result = _parse_casual_result(text)
+    except Exception as e:
+        logger.error(f"Casual post analysis stream failed: {e}")
+        result = {"recommendations": [], "error": str(e)}
+    yield "result", result
@@ -0,0 +1,151 @@
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from backend.database import (
+    CasualPost, CasualAnalysis, Organization, Survey, Answer,
+    AnalysisSession, AnalysisResult, IssueDefinition
+)
+from backend.services.casual_digest import count_posts_per_day, get_window_topics
+from backend.services.response_cache import invalidate_lists, CASUAL_ANALYSES, SESSIONS, SESSION_ISSUES
+
+logger = logging.getLogger(__name__)
+
+NO_CASUAL_POSTS_RESULT = {"recommendations": [], "message": "期間内の投稿がありません"}
+
+
+def casual_analysis_input(db: Session, organization_id: int, start_dt: datetime, end_dt: datetime) -> Optional[dict]:
+    """
+    Keyword arguments for analyze_casual_posts_logic / stream_casual_posts_logic covering
+    [start_dt, end_dt], or None when the window has no posts.
+    """
+    from backend.services.analysis import CASUAL_ANALYSIS_DIRECT_LIMIT
+
+    org = db.query(Organization).filter(Organization.id == organization_id).first()
+    org_name = org.name if org else ""
+
+    # Count posts per day (index-only; decides between the direct and digest paths)
+    post_counts = count_posts_per_day(db, organization_id, start_dt, end_dt)
+    total_posts = sum(post_counts.values())
+    if not total_posts:
+        return None
+
+    if total_posts <= CASUAL_ANALYSIS_DIRECT_LIMIT:
+        posts = db.query(CasualPost).filter(
+            CasualPost.organization_id == organization_id,
+            CasualPost.created_at >= start_dt,
+            CasualPost.created_at <= end_dt
+        ).all()
+        return {"posts": posts, "org_name": org_name}
+
+    # Past days come from stored daily digests; only the days not yet digested are read
+    topics, total_posts = get_window_topics(db, organization_id, start_dt, end_dt, post_counts)
+    return {"posts": None, "org_name": org_name, "topics": topics, "total_posts": total_posts}
+
+def save_casual_analysis(db: Session, organization_id: int, start_dt: datetime, end_dt: datetime, result_data: dict) -> CasualAnalysis:
+    """Saves a casual board analysis as an unpublished CasualAnalysis (commits)."""
+    analysis = CasualAnalysis(
+        organization_id=organization_id,
+        start_date=start_dt,
+        end_date=end_dt,
+        result_json=result_data,
+        is_published=False
+    )
+    db.add(analysis)
+    db.commit()
+    invalidate_lists(organization_id, CASUAL_ANALYSES)
+    db.refresh(analysis)
+    return analysis
+
+def run_casual_analysis(db: Session, organization_id: int, start_dt: datetime, end_dt: datetime):
+    """
+    Analyzes the casual board of an organization for [start_dt, end_dt] and saves the result
+    as an unpublished CasualAnalysis. Returns (analysis, result_data); analysis is None when
+    the window has no posts (nothing is saved then).
+    Shared by POST /api/casual/analyze and the scheduled precomputation.
+    """
+    from backend.services.analysis import analyze_casual_posts_logic
+
+    inputs = casual_analysis_input(db, organization_id, start_dt, end_dt)
+    if inputs is None:
+        return None, dict(NO_CASUAL_POSTS_RESULT)
+
+    result_data = analyze_casual_posts_logic(**inputs)
+    return save_casual_analysis(db, organization_id, start_dt, end_dt, result_data), result_data
+
+def run_survey_question_analysis(
+    db: Session,
+    organization_id: int,
+    survey_id: int,
+    question_id: int,
+    title: str,
+    is_mock: bool = False
+) -> AnalysisSession:
+    """
+    Clusters the answers of one survey question and saves them as an unpublished AnalysisSession.
+    Raises ValueError when there are fewer than 2 answers.
+    Shared by POST /api/dashboard/sessions/analyze and the scheduled precomputation.
+    """
+    from backend.services.analysis import analyze_clusters_logic, generate_issue_logic_from_clusters
+    from backend.services.mock_generator import generate_mock_analysis_data
+    import pandas as pd
+
+    # 1. Fetch Answers
+    answers = db.query(Answer).filter(Answer.question_id == question_id).all()
+    texts = [a.content for a in answers if a.content and a.content.strip()]
+    timestamps = [a.created_at for a in answers if a.content and a.content.strip()]
+
+    if not texts or len(texts) < 2:
+        raise ValueError("分析には最低2件の回答が必要です。")
+
+    # 2. Analyze
+    # Determine theme from survey title (Mock or fetch)
+    survey = db.query(Survey).filter(Survey.id == survey_id).first()
+    theme = survey.title if survey else "General"
+
+    if is_mock:
+        # Mock Analysis (uses the generator's own texts as test data)
+        logger.info(f"Running MOCK analysis for theme: {theme}")
+        results, issue_content = generate_mock_analysis_data(theme, num_points=len(texts))
+    else:
+        # Real Analysis
+        results = analyze_clusters_logic(texts, theme, timestamps=timestamps)
+        if not results:
+            raise RuntimeError("Analysis failed to produce results")
+
+        df = pd.DataFrame(results)
+        issue_content = generate_issue_logic_from_clusters(df, theme)
+
+    # 3. Save
+    sess = AnalysisSession(
+        title=title,
+        theme=theme,
+        organization_id=organization_id,
+        is_published=False
+    )
+    db.add(sess)
+    db.commit()
+    db.refresh(sess)
+
+    for r in results:
+        db.add(AnalysisResult(
+            session_id=sess.id,
+            original_text=r['original_text'],
+            sub_topic=r['sub_topic'],
+            summary=r['summary'],
+            x_coordinate=r.get('x_coordinate'),
+            y_coordinate=r.get('y_coordinate'),
+            cluster_id=r.get('cluster_id')
+        ))
+
+    if issue_content:
+        db.add(IssueDefinition(
+            session_id=sess.id,
+            content=issue_content
+        ))
+
+    db.commit()
+    invalidate_lists(organization_id, SESSIONS, SESSION_ISSUES)
+    return sess
@@ -0,0 +1,195 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, AnalysisSchedule, Survey, Question, now_jst
+from backend.services.analysis_runner import casual_analysis_input, save_casual_analysis, run_survey_question_analysis
+from backend.services.notification_service import notify_organization_admins
+
+logger = logging.getLogger(__name__)
+
+# 環境変数で無効化可能（複数インスタンス構成で1台だけ実行させる場合など）
+ANALYSIS_SCHEDULER_ENABLED = os.getenv("ANALYSIS_SCHEDULER_ENABLED", "True").lower() == "true"
+ANALYSIS_SCHEDULER_POLL_SECONDS = int(os.getenv("ANALYSIS_SCHEDULER_POLL_SECONDS", 300))
+# 1組織・1晩あたりに実行する設問分析の上限
+ANALYSIS_SCHEDULER_MAX_SURVEY_RUNS = int(os.getenv("ANALYSIS_SCHEDULER_MAX_SURVEY_RUNS", 5))
+
+
+def _claim_today(db: Session, organization_id: int, today) -> bool:
+    # Conditional update so a schedule runs at most once per day, even if two workers poll at once
+    claimed = db.query(AnalysisSchedule).filter(
+        AnalysisSchedule.organization_id == organization_id,
+        or_(AnalysisSchedule.last_run_date == None, AnalysisSchedule.last_run_date < today)
+    ).update({AnalysisSchedule.last_run_date: today}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def _run_casual(db: Session, schedule: AnalysisSchedule, now: datetime) -> bool:
+    last = schedule.last_casual_run_at
+    # One hour of slack so a run that finished slightly later than the previous one is not skipped
+    if last and now - last < timedelta(days=schedule.casual_interval_days) - timedelta(hours=1):
+        return False
+
+    from backend.services.analysis import analyze_casual_posts_logic
+
+    start_dt = now - timedelta(days=schedule.casual_window_days)
+    analysis = None
+    inputs = casual_analysis_input(db, schedule.organization_id, start_dt, now)
+    if inputs is not None:
+        result_data = analyze_casual_posts_logic(**inputs)
+        # A failed Gemini call is not a result to publish; raising keeps last_casual_run_at so it is retried
+        if result_data.get("error"):
+            raise RuntimeError(result_data["error"])
+        analysis = save_casual_analysis(db, schedule.organization_id, start_dt, now, result_data)
+    schedule.last_casual_run_at = now
+    db.commit()
+    return analysis is not None
+
+def _run_surveys(db: Session, schedule: AnalysisSchedule, now: datetime) -> int:
+    threshold = max(1, schedule.survey_answer_threshold or 1)
+    progress = json.loads(schedule.survey_progress_json) if schedule.survey_progress_json else {}
+
+    # Maintained per-question answer counters (no scan of the answers table)
+    counts = db.query(Question.survey_id, Question.id, Question.answer_count).join(
+        Survey, Survey.id == Question.survey_id
+    ).filter(
+        Survey.organization_id == schedule.organization_id,
+        Question.answer_count >= 2
+    ).all()
+
+    created = 0
+    for survey_id, question_id, count in counts:
+        if created >= ANALYSIS_SCHEDULER_MAX_SURVEY_RUNS:
+            break
+        last_count = progress.get(str(question_id), 0)
+        # Run each time the answer count crosses the next multiple of the threshold
+        if count < 2 or count // threshold <= last_count // threshold:
+            continue
+
+        survey_title, question_text = db.query(Survey.title, Question.text).join(
+            Question, Question.survey_id == Survey.id
+        ).filter(Question.id == question_id).first() or ("", "")
+        title = f"{survey_title} / {question_text}（定期分析 {now:%Y-%m-%d}）"
+        try:
+            run_survey_question_analysis(db, schedule.organization_id, survey_id, question_id, title)
+            created += 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Scheduled survey analysis failed (question {question_id}): {e}")
+        # Record progress either way so a failing question is retried at the next threshold, not nightly
+        progress[str(question_id)] = count
+
+    schedule.survey_progress_json = json.dumps(progress)
+    db.commit()
+    return created
+
+def run_schedule(db: Session, organization_id: int, now: datetime | None = None):
+    """Runs the enabled parts of one organization's schedule and notifies its admins of new results."""
+    now = now or now_jst()
+    schedule = db.query(AnalysisSchedule).filter(AnalysisSchedule.organization_id == organization_id).first()
+    if not schedule:
+        return
+
+    casual_created = False
+    casual_failed = False
+    surveys_created = 0
+    if schedule.casual_enabled:
+        try:
+            casual_created = _run_casual(db, schedule, now)
+        except Exception as e:
+            db.rollback()
+            casual_failed = True
+            logger.exception(f"Scheduled casual analysis failed (org {organization_id}): {e}")
+    if schedule.survey_enabled:
+        surveys_created = _run_surveys(db, schedule, now)
+    if casual_failed:
+        # Release today's claim so the next poll retries the casual analysis
+        # (surveys recorded their progress above and are not run twice)
+        schedule.last_run_date = None
+        db.commit()
+
+    logger.info(f"Scheduled analysis done: org={organization_id} casual={casual_created} surveys={surveys_created}")
+    if casual_created:
+        notify_organization_admins(
+            db,
+            organization_id,
+            "analysis_ready",
+            "定期分析: 雑談掲示板",
+            "雑談掲示板の定期分析が完了しました（非公開）。内容を確認して公開できます。",
+            "/dashboard?tab=casual"
+        )
+    if surveys_created:
+        notify_organization_admins(
+            db,
+            organization_id,
+            "analysis_ready",
+            "定期分析: アンケート",
+            f"回答数が増えた設問の分析を{surveys_created}件作成しました（非公開）。",
+            "/dashboard?tab=reports"
+        )
+
+def run_due_schedules(now: datetime | None = None) -> int:
+    """Runs every enabled schedule whose run_hour is the current hour and that has not run today."""
+    now = now or now_jst()
+    today = now.date()
+    db = SessionLocal()
+    try:
+        org_ids = [oid for (oid,) in db.query(AnalysisSchedule.organization_id).filter(
+            AnalysisSchedule.is_enabled == True,
+            AnalysisSchedule.run_hour == now.hour,
+            or_(AnalysisSchedule.last_run_date == None, AnalysisSchedule.last_run_date < today)
+        ).all()]
+
+        ran = 0
+        for organization_id in org_ids:
+            if not _claim_today(db, organization_id, today):
+                continue
+            try:
+                run_schedule(db, organization_id, now)
+                ran += 1
+            except Exception as e:
+                db.rollback()
+                logger.exception(f"Scheduled analysis failed (org {organization_id}): {e}")
+        return ran
+    finally:
+        db.close()
+
+class AnalysisScheduler(threading.Thread):
+    """analysis_schedules を定期的に確認し、実行時刻になった組織の分析を事前計算するバックグラウンドスレッド"""
+
+    def __init__(self):
+        super().__init__(name="analysis-scheduler", daemon=True)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                run_due_schedules()
+            except Exception as e:
+                logger.exception(f"Analysis scheduler tick failed: {e}")
+            self._stop_event.wait(ANALYSIS_SCHEDULER_POLL_SECONDS)
+
+_scheduler = None
+
+def start_analysis_scheduler():
+    global _scheduler
+    if not ANALYSIS_SCHEDULER_ENABLED:
+        return
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = AnalysisScheduler()
+        _scheduler.start()
+
+def stop_analysis_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler.join(timeout=10)
+        _scheduler = None
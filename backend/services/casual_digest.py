@@ -0,0 +1,120 @@
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.database import CasualPost, CasualDailyDigest, dialect_insert, now_jst
+from backend.services.analysis import (
+    group_casual_posts, CASUAL_ANALYSIS_MAX_TOPICS, CASUAL_ANALYSIS_REPRESENTATIVES_PER_TOPIC
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value) -> date:
+    # SQLite returns 'YYYY-MM-DD' strings from date(), PostgreSQL returns date objects
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def count_posts_per_day(db: Session, organization_id: int, start_dt: datetime, end_dt: datetime) -> Dict[date, int]:
+    """Post counts per calendar day (JST) in [start_dt, end_dt], from the (organization_id, created_at) index."""
+    day = func.date(CasualPost.created_at)
+    rows = db.query(day, func.count(CasualPost.id)).filter(
+        CasualPost.organization_id == organization_id,
+        CasualPost.created_at >= start_dt,
+        CasualPost.created_at <= end_dt
+    ).group_by(day).all()
+    return {_as_date(d): count for d, count in rows}
+
+def _post_texts(db: Session, organization_id: int, start_dt: datetime, end_dt: datetime) -> List[str]:
+    rows = db.query(CasualPost.content).filter(
+        CasualPost.organization_id == organization_id,
+        CasualPost.created_at >= start_dt,
+        CasualPost.created_at < end_dt
+    ).all()
+    return [content for (content,) in rows if content and content.strip()]
+
+def summarize_posts(texts: List[str]) -> List[dict]:
+    """Compact topic summary of a set of posts. A handful of posts is kept verbatim."""
+    if len(texts) <= CASUAL_ANALYSIS_REPRESENTATIVES_PER_TOPIC:
+        return [{"count": 1, "duplicates": 0, "representatives": [t]} for t in texts]
+    return group_casual_posts(texts)
+
+def get_daily_digest(db: Session, organization_id: int, day: date, post_count: int) -> List[dict]:
+    """
+    Returns the stored topic summary of one day, building it on first use.
+    A digest whose post_count no longer matches the day's posts is rebuilt.
+    """
+    digest = db.query(CasualDailyDigest).filter(
+        CasualDailyDigest.organization_id == organization_id,
+        CasualDailyDigest.digest_date == day
+    ).first()
+    if digest and digest.post_count == post_count:
+        return json.loads(digest.topics_json)
+
+    day_start = datetime.combine(day, time.min)
+    topics = summarize_posts(_post_texts(db, organization_id, day_start, day_start + timedelta(days=1)))
+    logger.info(f"Built casual daily digest: org={organization_id} date={day} posts={post_count} topics={len(topics)}")
+
+    values = {
+        "post_count": post_count,
+        "topics_json": json.dumps(topics, ensure_ascii=False),
+        "created_at": now_jst()
+    }
+    stmt = dialect_insert(CasualDailyDigest.__table__).values(
+        organization_id=organization_id, digest_date=day, **values
+    ).on_conflict_do_update(index_elements=["organization_id", "digest_date"], set_=values)
+    db.execute(stmt)
+    db.commit()
+    return topics
+
+def get_window_topics(
+    db: Session,
+    organization_id: int,
+    start_dt: datetime,
+    end_dt: datetime,
+    post_counts: Dict[date, int] | None = None
+) -> Tuple[List[dict], int]:
+    """
+    Topic summary of all posts in [start_dt, end_dt] and the total post count.
+
+    Complete past days come from their daily digests; only partial days (window edges,
+    today) are summarized from the posts themselves. The per-day topics are then
+    regrouped, weighted by how many posts each representative stands for.
+    """
+    if post_counts is None:
+        post_counts = count_posts_per_day(db, organization_id, start_dt, end_dt)
+    total_posts = sum(post_counts.values())
+    if not total_posts:
+        return [], 0
+
+    today = now_jst().date()
+    day_topics = []
+    for day, count in sorted(post_counts.items()):
+        day_start = datetime.combine(day, time.min)
+        day_end = day_start + timedelta(days=1)
+        is_full_day = start_dt <= day_start and end_dt >= day_end - timedelta(seconds=1) and day < today
+        if is_full_day:
+            day_topics.extend(get_daily_digest(db, organization_id, day, count))
+        else:
+            texts = _post_texts(
+                db, organization_id, max(start_dt, day_start), min(end_dt + timedelta(microseconds=1), day_end)
+            )
+            day_topics.extend(summarize_posts(texts))
+
+    if len(day_topics) <= CASUAL_ANALYSIS_MAX_TOPICS:
+        return sorted(day_topics, key=lambda t: t["count"], reverse=True), total_posts
+
+    texts, weights, duplicate_weights = [], [], []
+    for topic in day_topics:
+        representatives = topic["representatives"]
+        if not representatives:
+            continue
+        for text in representatives:
+            texts.append(text)
+            weights.append(topic["count"] / len(representatives))
+            duplicate_weights.append(topic["duplicates"] / len(representatives))
+
+    return group_casual_posts(texts, weights, duplicate_weights), total_posts
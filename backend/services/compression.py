@@ -0,0 +1,110 @@
+import os
+import logging
+
+import anyio.lowlevel
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# これより小さいレスポンスは圧縮しない（圧縮のCPUに見合わないため）
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", 1024))
+# 動的レスポンスは毎回圧縮するため、圧縮率より速度を優先したレベル
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
+
+# これ以上のチャンクはワーカースレッドで圧縮する（イベントループを止めないため。Starlette の GZip と同じ閾値）
+COMPRESSION_THREAD_MIN_BYTES = 128 * 1024
+
+_brotli_capacity_limiter: anyio.lowlevel.RunVar[anyio.CapacityLimiter] = anyio.lowlevel.RunVar("_brotli_capacity_limiter")
+
+def _get_brotli_capacity_limiter() -> anyio.CapacityLimiter:
+    # Separate from AnyIO's default thread limiter, so compression cannot starve sync endpoints
+    try:
+        return _brotli_capacity_limiter.get()
+    except LookupError:
+        limiter = anyio.CapacityLimiter(40)
+        _brotli_capacity_limiter.set(limiter)
+        return limiter
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int,
+                 thread_minimum_size: int = COMPRESSION_THREAD_MIN_BYTES):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self.thread_minimum_size = thread_minimum_size
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # Compressing large chunks (reports, long lists) inline would block the event loop
+            return await anyio.to_thread.run_sync(
+                self._compress_body, body, more_body, limiter=_get_brotli_capacity_limiter()
+            )
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality, mode=brotli.MODE_TEXT)
+        data = self._compressor.process(body)
+        # Streaming responses (NDJSON) are flushed per chunk so the client still sees each line
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+def accepted_encodings(header: str) -> set:
+    """Codings listed in Accept-Encoding, without the ones explicitly refused with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Negotiated response compression: brotli when the client accepts it (and the brotli package
+    is installed), otherwise gzip. Responses under RESPONSE_COMPRESSION_MIN_BYTES, SSE streams and
+    responses that already carry a Content-Encoding (report snapshots) are sent as they are.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        if brotli is None:
+            logger.info("brotli is not installed; responses are compressed with gzip only")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, RESPONSE_BROTLI_QUALITY)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=RESPONSE_GZIP_LEVEL,
+                                      thread_minimum_size=COMPRESSION_THREAD_MIN_BYTES)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
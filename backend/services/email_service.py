@@ -1,11 +1,21 @@
 import secrets
 import os
+import queue
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 import logging
 
+from sqlalchemy import event, or_
+
+from backend.database import SessionLocal, EmailOutbox, now_jst
+
 logger = logging.getLogger(__name__)
 
 # Environment Configuration
@@ -17,8 +27,20 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL", "noreply@example.com")
 SENDER_NAME = os.getenv("SENDER_NAME", "Small Voice")
+# STARTTLS (ポート465以外)。ローカルのSMTPスタブ (aiosmtpd等) に送る場合のみ false にする
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "True").lower() == "true"
 
-def send_invitation_email(email, token):
+# Delivery Queue Configuration
+MAIL_SMTP_POOL_SIZE = int(os.getenv("MAIL_SMTP_POOL_SIZE", 2)) # 同時に保持する認証済みSMTP接続数
+MAIL_SMTP_IDLE_TIMEOUT = int(os.getenv("MAIL_SMTP_IDLE_TIMEOUT", 60)) # この秒数使われなかった接続は閉じる
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 50)) # 1回の取り出しで送信する件数
+MAIL_RATE_PER_SECOND = float(os.getenv("MAIL_RATE_PER_SECOND", 5)) # 送信レート上限 (通/秒)
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5)) # これを超えたら failed とする
+MAIL_RETRY_BASE_SECONDS = int(os.getenv("MAIL_RETRY_BASE_SECONDS", 30)) # リトライ間隔 (指数バックオフの基数)
+MAIL_POLL_INTERVAL_SECONDS = float(os.getenv("MAIL_POLL_INTERVAL_SECONDS", 5))
+MAIL_CLAIM_LEASE_SECONDS = int(os.getenv("MAIL_CLAIM_LEASE_SECONDS", 600)) # sending のまま この秒数を過ぎた行は、送信中のプロセスが落ちたとみなして再送する (1バッチの送信時間より十分長く)
+
+def send_invitation_email(email, token, db=None):
     """招待メール送信（環境に応じて分岐）"""
     frontend_base = FRONTEND_URL.rstrip('/')
     invitation_link = f"{frontend_base}/invite?token={token}"
@@ -77,12 +99,12 @@ Small Voice システムへの招待が届きました。
 Small Voice System - {frontend_base}
     """
 
-    return _send_email(email, subject, html_body, text_body, "MOCK INVITATION EMAIL")
+    return enqueue_email(email, subject, html_body, text_body, "MOCK INVITATION EMAIL", db=db)
 
 def generate_reset_token():
     return secrets.token_urlsafe(32)
 
-def send_reset_email(email, token):
+def send_reset_email(email, token, db=None):
     """パスワードリセットメール送信（環境に応じて分岐）"""
     frontend_base = FRONTEND_URL.rstrip('/')
     reset_link = f"{frontend_base}/invite?token={token}"
@@ -112,63 +134,309 @@ def send_reset_email(email, token):
     """
     text_body = f"以下のリンクからパスワードを再設定してください。\n{reset_link}\n(有効期限: 1時間)"
 
-    return _send_email(email, subject, body, text_body, "MOCK RESET EMAIL")
+    return enqueue_email(email, subject, body, text_body, "MOCK RESET EMAIL", db=db)
 
-def _send_email(to_email, subject, html_body, text_body, mock_title):
-    """メール送信の共通内部関数"""
-    if ENVIRONMENT == "production":
-        # Production: Send via SMTP
-        if not SMTP_SERVER or not SMTP_USERNAME or not SMTP_PASSWORD:
-            logger.error("SMTP configuration is missing. Cannot send email.")
-            return False
-            
-        try:
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = formataddr((SENDER_NAME, SENDER_EMAIL))
-            msg["To"] = to_email
-            
-            msg["Reply-To"] = formataddr((SENDER_NAME, SENDER_EMAIL))
-            
-            # Add Date and Message-ID for spam score improvement
-            from email.utils import formatdate, make_msgid
-            msg["Date"] = formatdate(localtime=True)
-            msg["Message-ID"] = make_msgid(domain=SENDER_EMAIL.split('@')[-1] if '@' in SENDER_EMAIL else None)
-            
-            # Add Auto-Submitted header to indicate this is an automated system email
-            # This helps prevent auto-responders and clarifies the nature of the email to filters
-            msg["Auto-Submitted"] = "auto-generated"
-            msg["X-Auto-Response-Suppress"] = "OOF, DR, RN, NRN, AutoReply"
-
-            # Explicitly set charset to utf-8 to avoid encoding issues
-            part1 = MIMEText(text_body, "plain", "utf-8")
-            part2 = MIMEText(html_body, "html", "utf-8")
-
-            msg.attach(part1)
-            msg.attach(part2)
-
-            # Use SMTP_SSL if port is 465, otherwise assume STARTTLS with 587 or similar
-            if SMTP_PORT == 465:
-                with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-                    server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                    server.send_message(msg)
-            else:
-                with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                    server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                    server.send_message(msg)
-            
-            logger.info(f"Email sent successfully to {to_email}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {e}")
-            return False
+def enqueue_email(to_email, subject, html_body, text_body, mock_title, db=None):
+    """
+    メールを送信キュー (email_outbox) に登録する。実際の送信はバックグラウンドワーカーが行う。
+    db を渡した場合は呼び出し元のトランザクションに含める (commit は呼び出し元が行う)。
+    """
+    row = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        mock_title=mock_title
+    )
+    if db is not None:
+        db.add(row)
+        # Wake the worker once the caller's transaction is committed
+        event.listen(db, "after_commit", lambda session: wake_email_worker(), once=True)
     else:
+        own_db = SessionLocal()
+        try:
+            own_db.add(row)
+            own_db.commit()
+        finally:
+            own_db.close()
+        wake_email_worker()
+    return True
+
+def _build_message(to_email, subject, html_body, text_body):
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = formataddr((SENDER_NAME, SENDER_EMAIL))
+    msg["To"] = to_email
+    
+    msg["Reply-To"] = formataddr((SENDER_NAME, SENDER_EMAIL))
+    
+    # Add Date and Message-ID for spam score improvement
+    from email.utils import formatdate, make_msgid
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid(domain=SENDER_EMAIL.split('@')[-1] if '@' in SENDER_EMAIL else None)
+    
+    # Add Auto-Submitted header to indicate this is an automated system email
+    # This helps prevent auto-responders and clarifies the nature of the email to filters
+    msg["Auto-Submitted"] = "auto-generated"
+    msg["X-Auto-Response-Suppress"] = "OOF, DR, RN, NRN, AutoReply"
+
+    # Explicitly set charset to utf-8 to avoid encoding issues
+    part1 = MIMEText(text_body, "plain", "utf-8")
+    part2 = MIMEText(html_body, "html", "utf-8")
+
+    msg.attach(part1)
+    msg.attach(part2)
+    return msg
+
+class SMTPConnectionPool:
+    """
+    認証済みSMTP接続のプール。
+    接続・STARTTLS・ログインは接続作成時の1回だけで、以降の送信では使い回す。
+    """
+
+    def __init__(self, size, idle_timeout):
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle_timeout = idle_timeout
+
+    def _connect(self):
+        # Use SMTP_SSL if port is 465, otherwise assume STARTTLS with 587 or similar
+        if SMTP_PORT == 465:
+            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT)
+        else:
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+            server.ehlo()
+            if SMTP_STARTTLS:
+                server.starttls()
+                server.ehlo()
+        if SMTP_USERNAME and SMTP_PASSWORD:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used > self._idle_timeout:
+                self._close(server)
+                continue
+            return server
+
+    @contextmanager
+    def connection(self):
+        """プールから接続を借りる。例外時はその接続を破棄する。"""
+        self._slots.acquire()
+        server = None
+        try:
+            server = self._checkout()
+            yield server
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+            if server is not None:
+                self._close(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self._idle.put((server, time.monotonic()))
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+class _RateLimiter:
+    """送信間隔を一定以上に保つ単純なレート制限 (スレッドセーフ)"""
+
+    def __init__(self, rate_per_second):
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_for = max(0.0, self._next_at - now)
+            self._next_at = max(now, self._next_at) + self._interval
+        if wait_for:
+            time.sleep(wait_for)
+
+_smtp_pool = SMTPConnectionPool(MAIL_SMTP_POOL_SIZE, MAIL_SMTP_IDLE_TIMEOUT)
+_rate_limiter = _RateLimiter(MAIL_RATE_PER_SECOND)
+
+def _deliver(to_email, subject, html_body, text_body, mock_title):
+    """1通を送信する。失敗時は例外を送出する (リトライはワーカー側で管理)。"""
+    if ENVIRONMENT != "production":
         # Local: Mock Output
         print(f"--- [{mock_title}] To: {to_email} ---")
         print(f"Subject: {subject}")
         print(f"Body: {text_body}")
         print("--------------------------------")
-        return True
+        return
+
+    if not SMTP_SERVER:
+        raise RuntimeError("SMTP configuration is missing. Cannot send email.")
+
+    msg = _build_message(to_email, subject, html_body, text_body)
+    _rate_limiter.wait()
+    try:
+        with _smtp_pool.connection() as server:
+            server.send_message(msg)
+    except smtplib.SMTPServerDisconnected:
+        # Pooled connection was closed by the server while idle; retry once on a fresh one
+        with _smtp_pool.connection() as server:
+            server.send_message(msg)
+
+def _claim_batch(db):
+    """送信予定時刻を過ぎた pending のメールを取り出し、sending に更新する。"""
+    query = db.query(EmailOutbox).filter(
+        EmailOutbox.status == "pending",
+        EmailOutbox.next_attempt_at <= now_jst()
+    ).order_by(EmailOutbox.id).limit(MAIL_BATCH_SIZE)
+    if db.bind.dialect.name == "postgresql":
+        # Let concurrent workers (multiple processes) pick disjoint rows
+        query = query.with_for_update(skip_locked=True)
+    rows = query.all()
+    now = now_jst()
+    for row in rows:
+        row.status = "sending"
+        row.claimed_at = now
+    db.commit()
+    return rows
+
+def _release_expired_claims(db):
+    """
+    Returns rows whose 'sending' lease expired (the claiming process died mid-batch) to pending.
+    Rows another live process is still sending keep their lease and are left alone.
+    """
+    expired_before = now_jst() - timedelta(seconds=MAIL_CLAIM_LEASE_SECONDS)
+    released = db.query(EmailOutbox).filter(
+        EmailOutbox.status == "sending",
+        or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at < expired_before)
+    ).update({"status": "pending", "claimed_at": None}, synchronize_session=False)
+    db.commit()
+    if released:
+        logger.warning(f"Re-queued {released} emails whose sending lease expired")
+    return released
+
+def process_email_batch():
+    """キューから1バッチ分を送信し、結果を記録する。処理した件数を返す。"""
+    # Keep claimed rows loaded after commit so sender threads never touch the session
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        rows = _claim_batch(db)
+        if not rows:
+            return 0
+
+        def send_one(row):
+            try:
+                _deliver(row.to_email, row.subject, row.html_body, row.text_body, row.mock_title)
+                return row, None
+            except Exception as e:
+                return row, e
+
+        with ThreadPoolExecutor(max_workers=max(1, MAIL_SMTP_POOL_SIZE)) as executor:
+            results = list(executor.map(send_one, rows))
+
+        now = now_jst()
+        for row, error in results:
+            row.attempts = (row.attempts or 0) + 1
+            if error is None:
+                row.status = "sent"
+                row.sent_at = now
+                row.last_error = None
+                logger.info(f"Email sent successfully to {row.to_email}")
+            elif row.attempts >= MAIL_MAX_ATTEMPTS:
+                row.status = "failed"
+                row.last_error = str(error)
+                logger.error(f"Failed to send email to {row.to_email} (giving up after {row.attempts} attempts): {error}")
+            else:
+                row.status = "pending"
+                row.last_error = str(error)
+                row.next_attempt_at = now + timedelta(seconds=MAIL_RETRY_BASE_SECONDS * (2 ** (row.attempts - 1)))
+                logger.warning(f"Failed to send email to {row.to_email} (attempt {row.attempts}), retrying at {row.next_attempt_at}: {error}")
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+
+class EmailDeliveryWorker(threading.Thread):
+    """email_outbox を監視し、バッチ単位でメールを送信するバックグラウンドスレッド"""
+
+    def __init__(self):
+        super().__init__(name="email-delivery-worker", daemon=True)
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._next_recovery_at = 0.0
+
+    def wake(self):
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def _recover_interrupted(self):
+        # Rows left in 'sending' by a process that died mid-batch. Checked at startup and then
+        # periodically while idle, since another process may die while this one keeps running
+        if time.monotonic() < self._next_recovery_at:
+            return
+        self._next_recovery_at = time.monotonic() + min(60, MAIL_CLAIM_LEASE_SECONDS)
+        db = SessionLocal()
+        try:
+            _release_expired_claims(db)
+        except Exception as e:
+            logger.error(f"Email worker recovery failed: {e}")
+        finally:
+            db.close()
+
+    def run(self):
+        self._recover_interrupted()
+
+        while not self._stop_event.is_set():
+            try:
+                processed = process_email_batch()
+            except Exception as e:
+                logger.exception(f"Email worker batch failed: {e}")
+                processed = 0
+            if processed == 0:
+                self._recover_interrupted()
+                self._wake_event.wait(MAIL_POLL_INTERVAL_SECONDS)
+                self._wake_event.clear()
+        _smtp_pool.close_all()
+
+_worker = None
+
+def start_email_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = EmailDeliveryWorker()
+        _worker.start()
+
+def stop_email_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker.join(timeout=10)
+        _worker = None
+
+def wake_email_worker():
+    if _worker is not None:
+        _worker.wake()
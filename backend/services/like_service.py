@@ -0,0 +1,69 @@
+from sqlalchemy import case, delete, update
+from sqlalchemy.orm import Session
+
+from backend.database import CasualPost, CasualPostLike, Comment, CommentLike, dialect_insert, now_jst
+
+
+def _adjust_count(column, delta: int):
+    # Never let a counter go negative, even if it drifted before this change
+    if delta >= 0:
+        return column + delta
+    return case((column > -delta, column + delta), else_=0)
+
+def toggle_like(db: Session, like_model, target_column: str, target_model, target_id: int, user_id: int):
+    """
+    Toggles a like without reading the like row or the counter into Python.
+
+    A DELETE removes an existing like; if nothing was deleted, an INSERT ... ON CONFLICT DO NOTHING
+    adds one (the unique (target, user) index makes concurrent double-clicks collapse into one row).
+    The counter on the target row is then adjusted with a single SQL increment and returned.
+    Returns (liked, likes_count). The caller commits.
+    """
+    like_table = like_model.__table__
+    deleted = db.execute(
+        delete(like_table).where(
+            like_table.c[target_column] == target_id,
+            like_table.c.user_id == user_id
+        )
+    ).rowcount
+
+    if deleted:
+        liked, delta = False, -deleted
+    else:
+        inserted = db.execute(
+            dialect_insert(like_table).values(
+                {target_column: target_id, "user_id": user_id, "created_at": now_jst()}
+            ).on_conflict_do_nothing()
+        ).rowcount
+        # A concurrent request inserted the same like first: already liked, counter already bumped
+        liked, delta = True, inserted
+
+    likes_count = db.execute(
+        update(target_model).where(target_model.id == target_id).values(
+            likes_count=_adjust_count(target_model.likes_count, delta)
+        ).returning(target_model.likes_count)
+    ).scalar()
+    return liked, likes_count or 0
+
+def toggle_casual_post_like(db: Session, post_id: int, user_id: int):
+    return toggle_like(db, CasualPostLike, "post_id", CasualPost, post_id, user_id)
+
+def toggle_comment_like(db: Session, comment_id: int, user_id: int):
+    return toggle_like(db, CommentLike, "comment_id", Comment, comment_id, user_id)
+
+def release_user_likes(db: Session, user_id: int):
+    """Removes every like of a user and decrements the affected counters (before deleting the user; caller commits)."""
+    for like_model, target_column, target_model in (
+        (CasualPostLike, "post_id", CasualPost),
+        (CommentLike, "comment_id", Comment),
+    ):
+        like_table = like_model.__table__
+        target_ids = db.execute(
+            delete(like_table).where(like_table.c.user_id == user_id).returning(like_table.c[target_column])
+        ).scalars().all()
+        if target_ids:
+            db.execute(
+                update(target_model).where(target_model.id.in_(target_ids)).values(
+                    likes_count=_adjust_count(target_model.likes_count, -1)
+                )
+            )
@@ -0,0 +1,63 @@
+import threading
+from collections import defaultdict
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store (counters, gauges, timing and value summaries).
+    Values are per process and reset on restart; read them via GET /api/metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = defaultdict(float)
+        self._timings = {}
+        self._summaries = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge_add(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] += value
+
+    def _add_sample(self, store: dict, name: str, value: float):
+        with self._lock:
+            t = store.get(name)
+            if t is None:
+                store[name] = {"count": 1, "total": value, "max": value}
+            else:
+                t["count"] += 1
+                t["total"] += value
+                t["max"] = max(t["max"], value)
+
+    def observe(self, name: str, seconds: float):
+        self._add_sample(self._timings, name, seconds)
+
+    def summarize(self, name: str, value: float):
+        """Records a non-time sample (e.g. queries per request)."""
+        self._add_sample(self._summaries, name, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {
+                    name: {
+                        "count": t["count"],
+                        "avg_seconds": t["total"] / t["count"],
+                        "max_seconds": t["max"],
+                    }
+                    for name, t in self._timings.items()
+                },
+                "summaries": {
+                    name: {"count": t["count"], "avg": t["total"] / t["count"], "max": t["max"]}
+                    for name, t in self._summaries.items()
+                },
+            }
+
+
+metrics = MetricsRegistry()
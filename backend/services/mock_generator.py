@@ -1,6 +1,5 @@
 
 import random
-import json
 import datetime
 from typing import List, Dict, Any
 
@@ -708,7 +707,7 @@ def get_value_comment_q3():
 def generate_mock_analysis_data(theme: str, num_points: int = 50):
     """
     Generates mock analysis results and a mock report.
-    Returns: (results_list, report_json_string)
+    Returns: (results_list, report_issues)
     """
     
     # Detemine category from theme
@@ -815,4 +814,4 @@ def generate_mock_analysis_data(theme: str, num_points: int = 50):
         "category": "organizational"
     })
 
-    return results, json.dumps(report_issues, ensure_ascii=False)
+    return results, report_issues
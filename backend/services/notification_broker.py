@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+# 1接続あたりに溜めておくイベントの上限 (超えた分は破棄し、クライアントは件数APIで再同期する)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class NotificationBroker:
+    """
+    In-process pub/sub for realtime notification delivery (SSE).
+
+    Subscribers are asyncio queues owned by the event loop; publishers are the
+    synchronous request handlers running in the thread pool, so events are handed
+    over with call_soon_threadsafe. State lives in this process only, which matches
+    the single uvicorn worker deployment.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Registers a new connection for user_id. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def connected_user_ids(self, user_ids: Iterable[int]) -> Set[int]:
+        """Returns the subset of user_ids that currently have an open stream."""
+        with self._lock:
+            return {uid for uid in user_ids if uid in self._subscribers}
+
+    def publish(self, user_id: int, event: dict):
+        """Pushes an event to every open stream of user_id. Safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        for queue in queues:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Notification stream queue full; dropping event")
+
+
+broker = NotificationBroker()
@@ -1,6 +1,135 @@
+import os
+from datetime import timedelta
+from sqlalchemy import case
 from sqlalchemy.orm import Session
-from backend.database import Notification, User, OrganizationMember
-from typing import Optional
+from backend.database import Notification, NotificationCounter, User, OrganizationMember, now_jst, dialect_insert
+from backend.services.notification_broker import broker
+from typing import Optional, Iterable
+
+# 同一ユーザー・同一タイプ・同一リンクの未読通知をまとめる時間幅（分）
+NOTIFICATION_COALESCE_WINDOW_MINUTES = int(os.getenv("NOTIFICATION_COALESCE_WINDOW_MINUTES", 60))
+
+def _deliver_notifications(
+    db: Session,
+    user_ids: Iterable[int],
+    type: str,
+    title: str,
+    content: str,
+    link: str,
+    organization_id: Optional[int] = None,
+    coalesce: bool = False
+):
+    """
+    Writes one notification per recipient in a single transaction.
+    With coalesce=True, a recipient who still has an unread notification of the
+    same type and link (updated within the coalescing window) gets that row bumped
+    (count + 1, latest title/content, updated_at) instead of a new row.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+
+    now = now_jst()
+    coalesced_user_ids = set()
+
+    if coalesce:
+        window_start = now - timedelta(minutes=NOTIFICATION_COALESCE_WINDOW_MINUTES)
+        candidates = db.query(Notification.id, Notification.user_id).filter(
+            Notification.user_id.in_(user_ids),
+            Notification.type == type,
+            Notification.link == link,
+            Notification.is_read == False,
+            Notification.updated_at >= window_start
+        ).all()
+
+        # Bump only the newest digest row per user
+        latest_by_user = {}
+        for notification_id, uid in candidates:
+            if notification_id > latest_by_user.get(uid, 0):
+                latest_by_user[uid] = notification_id
+
+        if latest_by_user:
+            db.query(Notification).filter(
+                Notification.id.in_(list(latest_by_user.values()))
+            ).update({
+                Notification.count: Notification.count + 1,
+                Notification.title: title,
+                Notification.content: content,
+                Notification.updated_at: now
+            }, synchronize_session=False)
+            coalesced_user_ids = set(latest_by_user)
+
+    new_rows = [
+        {
+            "user_id": uid,
+            "organization_id": organization_id,
+            "type": type,
+            "title": title,
+            "content": content,
+            "link": link,
+            "is_read": False,
+            "count": 1,
+            "created_at": now,
+            "updated_at": now
+        }
+        for uid in user_ids if uid not in coalesced_user_ids
+    ]
+    if new_rows:
+        db.bulk_insert_mappings(Notification, new_rows)
+        # Coalesced rows were already unread, so only new rows move the counter
+        increment_unread_counts(db, [row["user_id"] for row in new_rows])
+
+    db.commit()
+
+    publish_notification_event(db, user_ids, "notification", {
+        "type": type,
+        "title": title,
+        "content": content,
+        "link": link
+    })
+
+def increment_unread_counts(db: Session, user_ids: Iterable[int]):
+    """Adds 1 to each user's unread counter in one upsert (caller commits)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    stmt = dialect_insert(NotificationCounter.__table__).values(
+        [{"user_id": uid, "unread_count": 1} for uid in user_ids]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"unread_count": NotificationCounter.unread_count + 1}
+    )
+    db.execute(stmt)
+
+def decrement_unread_count(db: Session, user_id: int, amount: int = 1):
+    """Subtracts amount from the user's unread counter, never going below zero (caller commits)."""
+    if amount <= 0:
+        return
+    db.query(NotificationCounter).filter(NotificationCounter.user_id == user_id).update({
+        NotificationCounter.unread_count: case(
+            (NotificationCounter.unread_count > amount, NotificationCounter.unread_count - amount),
+            else_=0
+        )
+    }, synchronize_session=False)
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    count = db.query(NotificationCounter.unread_count).filter(NotificationCounter.user_id == user_id).scalar()
+    return count or 0
+
+def publish_notification_event(db: Session, user_ids: Iterable[int], event: str, data: dict):
+    """
+    Pushes an event (with the recipient's current unread count) to users that
+    have an open notification stream. No-op when nobody is connected.
+    """
+    connected = broker.connected_user_ids(user_ids)
+    if not connected:
+        return
+    counts = dict(db.query(NotificationCounter.user_id, NotificationCounter.unread_count).filter(
+        NotificationCounter.user_id.in_(list(connected))
+    ).all())
+    for uid in connected:
+        broker.publish(uid, {"event": event, "data": {**data, "unread_count": counts.get(uid, 0)}})
 
 def create_notification(
     db: Session,
@@ -9,20 +138,10 @@ def create_notification(
     title: str,
     content: str,
     link: str,
-    organization_id: Optional[int] = None
+    organization_id: Optional[int] = None,
+    coalesce: bool = False
 ):
-    notification = Notification(
-        user_id=user_id,
-        organization_id=organization_id,
-        type=type,
-        title=title,
-        content=content,
-        link=link
-    )
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
-    return notification
+    _deliver_notifications(db, [user_id], type, title, content, link, organization_id, coalesce)
 
 def notify_organization_members(
     db: Session,
@@ -31,13 +150,15 @@ def notify_organization_members(
     title: str,
     content: str,
     link: str,
-    exclude_user_id: Optional[int] = None
+    exclude_user_id: Optional[int] = None,
+    coalesce: bool = False
 ):
-    members = db.query(OrganizationMember).filter(OrganizationMember.organization_id == organization_id).all()
-    for member in members:
-        if exclude_user_id and member.user_id == exclude_user_id:
-            continue
-        create_notification(db, member.user_id, type, title, content, link, organization_id)
+    member_user_ids = db.query(OrganizationMember.user_id).filter(OrganizationMember.organization_id == organization_id).all()
+    user_ids = [
+        uid for (uid,) in member_user_ids
+        if not (exclude_user_id and uid == exclude_user_id)
+    ]
+    _deliver_notifications(db, user_ids, type, title, content, link, organization_id, coalesce)
 
 def notify_organization_admins(
     db: Session,
@@ -46,22 +167,21 @@ def notify_organization_admins(
     title: str,
     content: str,
     link: str,
-    exclude_user_id: Optional[int] = None
+    exclude_user_id: Optional[int] = None,
+    coalesce: bool = False
 ):
     # Get organization admins
-    org_admins = db.query(OrganizationMember).filter(
+    org_admins = db.query(OrganizationMember.user_id).filter(
         OrganizationMember.organization_id == organization_id,
         OrganizationMember.role == 'admin'
     ).all()
     
     # Get system admins (they should also see org-level notifications usually, but let's stick to org admins for now as per request)
     # Actually, system admins might want to know about form applications too.
-    system_admins = db.query(User).filter(User.role == 'system_admin').all()
+    system_admins = db.query(User.id).filter(User.role == 'system_admin').all()
     
-    admin_user_ids = {m.user_id for m in org_admins}
-    admin_user_ids.update({u.id for u in system_admins})
+    admin_user_ids = {uid for (uid,) in org_admins}
+    admin_user_ids.update({uid for (uid,) in system_admins})
     
-    for uid in admin_user_ids:
-        if exclude_user_id and uid == exclude_user_id:
-            continue
-        create_notification(db, uid, type, title, content, link, organization_id)
+    user_ids = [uid for uid in admin_user_ids if not (exclude_user_id and uid == exclude_user_id)]
+    _deliver_notifications(db, user_ids, type, title, content, link, organization_id, coalesce)
@@ -0,0 +1,67 @@
+from collections import Counter
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from backend.database import Answer, Question, Survey, SurveyParticipation
+
+
+def has_answered(db: Session, survey_id: int, user_id: int) -> bool:
+    """Single lookup on the unique (survey_id, user_id) index."""
+    return db.query(SurveyParticipation.id).filter(
+        SurveyParticipation.survey_id == survey_id,
+        SurveyParticipation.user_id == user_id
+    ).first() is not None
+
+def add_response_counts(db: Session, survey_id: int, respondents: int, answers_per_question: Counter):
+    """Increments the survey's respondent counter and the per-question answer counters in SQL (caller commits)."""
+    if respondents:
+        db.execute(
+            update(Survey).where(Survey.id == survey_id).values(
+                response_count=func.coalesce(Survey.response_count, 0) + respondents
+            )
+        )
+    # Group questions by increment so a normal submission (+1 each) is a single UPDATE
+    by_delta = {}
+    for question_id, delta in answers_per_question.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(question_id)
+    for delta, question_ids in by_delta.items():
+        db.execute(
+            update(Question).where(Question.id.in_(question_ids)).values(
+                answer_count=func.coalesce(Question.answer_count, 0) + delta
+            )
+        )
+
+def _decrement(column, delta: int):
+    # Never let a counter go negative, even if it drifted before the counters existed
+    return case((column > delta, column - delta), else_=0)
+
+def release_user_participations(db: Session, user_id: int):
+    """
+    Removes a user's participations and decrements the counters for the answers that are
+    deleted along with the user (before deleting the user; caller commits).
+    """
+    survey_ids = db.execute(
+        delete(SurveyParticipation).where(SurveyParticipation.user_id == user_id).returning(SurveyParticipation.survey_id)
+    ).scalars().all()
+    if survey_ids:
+        db.execute(
+            update(Survey).where(Survey.id.in_(survey_ids)).values(
+                response_count=_decrement(Survey.response_count, 1)
+            )
+        )
+
+    per_question = db.execute(
+        select(Answer.question_id, func.count(Answer.id)).where(
+            Answer.user_id == user_id,
+            Answer.content.isnot(None),
+            Answer.content != ""
+        ).group_by(Answer.question_id)
+    ).all()
+    for question_id, count in per_question:
+        db.execute(
+            update(Question).where(Question.id == question_id).values(
+                answer_count=_decrement(Question.answer_count, count)
+            )
+        )
@@ -0,0 +1,127 @@
+import os
+import re
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "local")
+# レスポンスヘッダー (X-DB-*) にクエリ数・DB時間を付与するか（デフォルトは production 以外で有効）
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", str(ENVIRONMENT != "production")).lower() == "true"
+# 1リクエスト内で同じ形のSQLがこの回数以上実行されたら N+1 とみなす
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", 5))
+
+# IN (?, ?, ?) / IN (%(id_1)s, %(id_2)s) のような展開済みリストを1つにまとめる
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|%s))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalizes a statement so the same query with different parameters or IN-list sizes compares equal."""
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    """Statements executed while one request (or one assert_query_budget block) was active."""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        # An enclosing block (e.g. assert_query_budget around a request) sees the same statements
+        self.parent = parent
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+        if self.parent is not None:
+            self.parent.record(statement, seconds)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Statement shapes executed at least `threshold` times (likely N+1 lazy loads), most frequent first."""
+        threshold = threshold or QUERY_N_PLUS_ONE_THRESHOLD
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started_at = getattr(context, "_query_started_at", None)
+    if stats is not None and started_at is not None:
+        stats.record(statement, time.perf_counter() - started_at)
+
+def install_query_instrumentation(engine):
+    """Counts statements per request via engine events. Queries outside a tracked block (workers, startup) are ignored."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def track_queries():
+    """Collects the statements executed in this context (also inside endpoints run in the threadpool)."""
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+def report_request(name: str, stats: QueryStats) -> dict:
+    """Records one request's query stats as metrics, logs likely N+1 patterns and returns the debug headers."""
+    metrics.summarize(f"db.queries {name}", stats.count)
+    metrics.observe(f"db.time {name}", stats.seconds)
+
+    repeated = stats.repeated()
+    if repeated:
+        metrics.increment(f"db.n_plus_one {name}")
+        shape, n = repeated[0]
+        logger.warning(f"Possible N+1 in {name}: {n}x {shape[:200]} ({stats.count} queries total)")
+
+    if not QUERY_STATS_HEADERS:
+        return {}
+    headers = {
+        "X-DB-Query-Count": str(stats.count),
+        "X-DB-Query-Time-Ms": f"{stats.seconds * 1000:.1f}",
+    }
+    if repeated:
+        headers["X-DB-N-Plus-One"] = str(repeated[0][1])
+    return headers
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Test helper: fails if the block runs more than `max_queries` statements, or (when given)
+    any single statement shape more than `max_repeats` times.
+
+        with assert_query_budget(5, max_repeats=1):
+            client.get("/api/users")
+    """
+    with track_queries() as stats:
+        yield stats
+
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} queries (budget {max_queries})")
+    if max_repeats is not None:
+        for shape, n in stats.shapes.most_common():
+            if n <= max_repeats:
+                break
+            problems.append(f"{n}x {shape[:200]}")
+    if problems:
+        raise AssertionError("Query budget exceeded: " + "; ".join(problems))
@@ -0,0 +1,123 @@
+import os
+import gzip
+
+import orjson
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from backend.database import AnalysisSession, AnalysisResult, AnalysisSessionSnapshot, IssueDefinition, dialect_insert, json_text, now_jst
+from backend.services.metrics import metrics
+from backend.services.response_cache import etag_matches
+from backend.services.compression import accepted_encodings
+
+# スナップショット本文の形式（build_report の出力を変えたら上げる。古い形式は読み出し時に作り直す）
+SNAPSHOT_FORMAT = 1
+# 公開時に1回だけ圧縮するため、転送量を優先して高めの圧縮レベル
+SNAPSHOT_COMPRESS_LEVEL = int(os.getenv("SNAPSHOT_COMPRESS_LEVEL", 9))
+
+
+def build_report(db: Session, session: AnalysisSession) -> dict:
+    """
+    The immutable part of a report (analysis results and issue list) built from the tables.
+    Comments, publish flags and the AI comment analysis are live and not included.
+    """
+    # The issue list stays JSON text (the client parses report_content)
+    report_content = db.query(json_text(IssueDefinition.content)).filter(IssueDefinition.session_id == session.id).scalar()
+    rows = db.query(
+        AnalysisResult.sub_topic, AnalysisResult.summary, AnalysisResult.original_text,
+        AnalysisResult.x_coordinate, AnalysisResult.y_coordinate, AnalysisResult.cluster_id
+    ).filter(AnalysisResult.session_id == session.id).order_by(AnalysisResult.id.desc()).all()
+
+    return {
+        "id": session.id,
+        "title": session.title,
+        "theme": session.theme,
+        "created_at": session.created_at,
+        "report_content": report_content,
+        "results": [
+            {
+                "sub_topic": r.sub_topic,
+                "summary": r.summary,
+                "original_text": r.original_text,
+                "x": float(r.x_coordinate) if r.x_coordinate is not None else 0.0,
+                "y": float(r.y_coordinate) if r.y_coordinate is not None else 0.0,
+                "cluster_id": r.cluster_id,
+                "is_noise": r.cluster_id == -1 if r.cluster_id is not None else False
+            } for r in rows
+        ]
+    }
+
+def materialize_snapshot(db: Session, session: AnalysisSession) -> int:
+    """
+    Stores the compressed report of a session (new row, or the next version of the existing one)
+    in the caller's transaction. Returns the number of results in the snapshot.
+    """
+    report = build_report(db, session)
+    encoded = orjson.dumps(report)
+    # mtime=0 keeps the bytes identical for identical content
+    body = gzip.compress(encoded, compresslevel=SNAPSHOT_COMPRESS_LEVEL, mtime=0)
+
+    stmt = dialect_insert(AnalysisSessionSnapshot.__table__).values(
+        session_id=session.id, version=1, format=SNAPSHOT_FORMAT, body=body,
+        result_count=len(report["results"]), created_at=now_jst()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["session_id"],
+        set_={
+            "version": AnalysisSessionSnapshot.version + 1,
+            "format": stmt.excluded.format,
+            "body": stmt.excluded.body,
+            "result_count": stmt.excluded.result_count,
+            "created_at": stmt.excluded.created_at,
+        }
+    ))
+    metrics.increment("report_snapshot.materialized")
+    metrics.summarize("report_snapshot.bytes", len(body))
+    return len(report["results"])
+
+def _load_snapshot(db: Session, session_id: int, with_body: bool = False):
+    columns = (AnalysisSessionSnapshot.version, AnalysisSessionSnapshot.body) if with_body else (AnalysisSessionSnapshot.version,)
+    return db.query(*columns).filter(
+        AnalysisSessionSnapshot.session_id == session_id,
+        AnalysisSessionSnapshot.format == SNAPSHOT_FORMAT
+    ).first()
+
+def load_report(db: Session, session: AnalysisSession) -> dict:
+    """Report of a session: from the snapshot when published, otherwise from the tables."""
+    if session.is_published:
+        snapshot = _load_snapshot(db, session.id, with_body=True)
+        if snapshot is not None:
+            return orjson.loads(gzip.decompress(snapshot.body))
+    return build_report(db, session)
+
+def snapshot_response(db: Session, request: Request, session: AnalysisSession) -> Response:
+    """
+    Serves the report of a published session from its snapshot, building the snapshot first if
+    the session was published before snapshots existed (or in an older format).
+
+    The stored gzip bytes are sent as-is with Content-Encoding when the client accepts gzip,
+    so a read is one row fetch without decompression or JSON work; a client that already has
+    the version gets 304 without the body being read at all.
+    """
+    snapshot = _load_snapshot(db, session.id)
+    if snapshot is None:
+        materialize_snapshot(db, session)
+        db.commit()
+        snapshot = _load_snapshot(db, session.id)
+
+    headers = {
+        "ETag": f'"report-{session.id}-v{snapshot.version}"',
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding, Cookie",
+    }
+    if etag_matches(request, headers["ETag"]):
+        metrics.increment("report_snapshot.not_modified")
+        return Response(status_code=304, headers=headers)
+
+    snapshot = _load_snapshot(db, session.id, with_body=True)
+    headers["ETag"] = f'"report-{session.id}-v{snapshot.version}"'
+    metrics.increment("report_snapshot.served")
+    if "gzip" in accepted_encodings(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(snapshot.body), media_type="application/json", headers=headers)
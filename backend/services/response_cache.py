@@ -0,0 +1,120 @@
+import os
+import time
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend.services.metrics import metrics
+
+# 一覧APIのレスポンスをメモリに保持する秒数（書き込み時に無効化されるため、これは外部から変更された場合の上限）
+RESPONSE_CACHE_SECONDS = int(os.getenv("RESPONSE_CACHE_SECONDS", 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000))
+
+# Cached lists (name used for keys, invalidation and metrics)
+SESSIONS = "sessions"
+SURVEYS = "surveys"
+CASUAL_ANALYSES = "casual_analyses"
+SESSION_ISSUES = "session_issues"
+MY_ORGS = "my_orgs"
+
+
+class CachedBody:
+    """Serialized list response: the data (models or JSON-ready values), the encoded body and its strong ETag."""
+    __slots__ = ("data", "body", "etag")
+
+    def __init__(self, data: Any, adapter: Optional[TypeAdapter] = None):
+        if adapter is not None:
+            # Pydantic's Rust serializer, the same one FastAPI uses for a response_model
+            self.data = adapter.validate_python(data)
+            self.body = adapter.dump_json(self.data)
+        else:
+            self.data = jsonable_encoder(data)
+            self.body = orjson.dumps(self.data)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+
+
+class ResponseCache:
+    """
+    Serialized list responses keyed by (name, organization_id, variant), held in process memory.
+
+    The variant is whatever changes the visible rows for the same organization (admin / member,
+    or the user id when a list includes the user's own rows). Write paths call invalidate()
+    after commit; it bumps a generation counter instead of scanning entries, and a build that
+    started before the bump is not stored, so a concurrent read cannot put stale data back.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Tuple[float, Tuple[int, int], CachedBody]] = {}
+        # (name, organization_id) -> generation; organization_id None is the name-wide generation
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _generation(self, name: str, organization_id: Optional[int]) -> Tuple[int, int]:
+        return self._generations[(name, None)], self._generations[(name, organization_id)]
+
+    def get(self, name: str, organization_id: Optional[int], variant: Hashable, build: Callable[[], Any],
+            adapter: Optional[TypeAdapter] = None) -> CachedBody:
+        """
+        Returns the cached body, calling build() (the list query) only on a miss. Pass the list's
+        TypeAdapter when it has a response model so the body is encoded without jsonable_encoder.
+        """
+        key = (name, organization_id, variant)
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation(name, organization_id)
+            entry = self._entries.get(key)
+        if entry and entry[0] > now and entry[1] == generation:
+            metrics.increment(f"response_cache.{name}.hit")
+            return entry[2]
+
+        metrics.increment(f"response_cache.{name}.miss")
+        cached = CachedBody(build(), adapter)
+        with self._lock:
+            if self._generation(name, organization_id) == generation:
+                if len(self._entries) >= RESPONSE_CACHE_MAX_ENTRIES:
+                    self._entries.clear()
+                self._entries[key] = (now + RESPONSE_CACHE_SECONDS, generation, cached)
+        return cached
+
+    def invalidate(self, name: str, organization_id: Optional[int] = None):
+        """Drops the organization's entries of a list, or every organization's when organization_id is None."""
+        with self._lock:
+            self._generations[(name, organization_id)] += 1
+
+response_cache = ResponseCache()
+
+
+def invalidate_lists(organization_id: Optional[int], *names: str):
+    """Call after commit on write paths that change the given lists."""
+    for name in names:
+        response_cache.invalidate(name, organization_id)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cached_json_response(request: Request, cached: CachedBody) -> Response:
+    """200 with the cached body, or 304 without a body when the client already has this ETag."""
+    headers = {
+        "ETag": cached.etag,
+        # Browsers may keep the body but must revalidate on every use; the content depends on the session cookie
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie",
+    }
+    if etag_matches(request, cached.etag):
+        metrics.increment("response_cache.not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,328 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from backend.database import (
+    OrganizationDailyStat, OrganizationStat, OrganizationMemberActivity, OrganizationMember,
+    Survey, Answer, SurveyParticipation, CasualPost, Comment, AnalysisSession, dialect_insert, now_jst
+)
+
+# Daily metrics (organization_daily_stats). Survey and comment metrics are kept per subject.
+SURVEY_RESPONSES = "survey_responses"  # subject: survey_id
+SURVEY_ANSWERS = "survey_answers"      # subject: survey_id (non-empty answers)
+CASUAL_POSTS = "casual_posts"          # subject: 0
+SESSION_COMMENTS = "session_comments"  # subject: session_id
+DAILY_METRICS = (SURVEY_RESPONSES, SURVEY_ANSWERS, CASUAL_POSTS, SESSION_COMMENTS)
+
+# Survey status counts (organization_stats, alongside the all-time totals of the daily metrics)
+SURVEY_STATUSES = ("pending", "rejected", "active", "closed")
+
+
+def survey_status(approval_status: Optional[str], is_active: Optional[bool]) -> str:
+    """Dashboard bucket of a survey: pending / rejected / active (approved, open) / closed (approved, stopped)."""
+    if approval_status in ("pending", "rejected"):
+        return approval_status
+    return "active" if is_active else "closed"
+
+def _status_metric(status: str) -> str:
+    return f"surveys_{status}"
+
+
+def _add_totals(db: Session, totals: Dict[Tuple[int, str], int]):
+    rows = [
+        {"organization_id": org_id, "metric": metric, "value": value}
+        for (org_id, metric), value in totals.items() if value
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(OrganizationStat.__table__).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["organization_id", "metric"],
+        set_={"value": OrganizationStat.value + stmt.excluded.value}
+    ))
+
+def add_daily_counts(db: Session, counts: Dict[Tuple[int, str, int], int], at: Optional[datetime] = None):
+    """
+    Adds {(organization_id, metric, subject_id): n} to the day's rollup rows and the organization totals
+    (two multi-row UPSERTs regardless of the number of keys; caller commits).
+    """
+    day = (at or now_jst()).date()
+    rows = [
+        {"organization_id": org_id, "stat_date": day, "metric": metric, "subject_id": subject_id, "value": value}
+        for (org_id, metric, subject_id), value in counts.items() if org_id and value
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(OrganizationDailyStat.__table__).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["organization_id", "metric", "subject_id", "stat_date"],
+        set_={"value": OrganizationDailyStat.value + stmt.excluded.value}
+    ))
+
+    totals = Counter()
+    for row in rows:
+        totals[(row["organization_id"], row["metric"])] += row["value"]
+    _add_totals(db, totals)
+
+def touch_members(db: Session, memberships: Iterable[Tuple[int, int]], at: Optional[datetime] = None):
+    """Marks (organization_id, user_id) pairs as active today. Rows already touched today are not rewritten."""
+    day = (at or now_jst()).date()
+    rows = [
+        {"organization_id": org_id, "user_id": user_id, "last_active_on": day}
+        for org_id, user_id in set(memberships) if org_id and user_id
+    ]
+    if not rows:
+        return
+    stmt = dialect_insert(OrganizationMemberActivity.__table__).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["organization_id", "user_id"],
+        set_={"last_active_on": stmt.excluded.last_active_on},
+        where=OrganizationMemberActivity.last_active_on < stmt.excluded.last_active_on
+    ))
+
+def record_activity(db: Session, organization_id: Optional[int], metric: str, subject_id: int = 0,
+                    user_id: Optional[int] = None, amount: int = 1):
+    """Counts one write (a post, a comment, ...) in the organization's rollups (caller commits)."""
+    if not organization_id:
+        return
+    now = now_jst()
+    add_daily_counts(db, {(organization_id, metric, subject_id): amount}, now)
+    if user_id:
+        touch_members(db, [(organization_id, user_id)], now)
+
+def move_survey_status(db: Session, organization_id: Optional[int], old: Optional[str], new: Optional[str]):
+    """Moves one survey between status buckets (old=None on create, new=None on delete; caller commits)."""
+    if not organization_id or old == new:
+        return
+    changes = {}
+    if old:
+        changes[(organization_id, _status_metric(old))] = -1
+    if new:
+        changes[(organization_id, _status_metric(new))] = 1
+    _add_totals(db, changes)
+
+def remove_subject(db: Session, organization_id: Optional[int], metrics: Tuple[str, ...], subject_id: int):
+    """Drops the rollup rows of a deleted survey or session and subtracts them from the totals (caller commits)."""
+    if not organization_id:
+        return
+    removed = db.execute(
+        delete(OrganizationDailyStat).where(
+            OrganizationDailyStat.organization_id == organization_id,
+            OrganizationDailyStat.metric.in_(metrics),
+            OrganizationDailyStat.subject_id == subject_id
+        ).returning(OrganizationDailyStat.metric, OrganizationDailyStat.value)
+    ).all()
+    totals = Counter()
+    for metric, value in removed:
+        totals[(organization_id, metric)] -= value
+    _add_totals(db, totals)
+
+
+# --- Reads ---
+
+def _window(days: int) -> Tuple[date, date]:
+    today = now_jst().date()
+    return today - timedelta(days=days - 1), today
+
+def _totals(db: Session, organization_ids: Optional[List[int]]) -> Dict[int, Dict[str, int]]:
+    query = db.query(OrganizationStat.organization_id, OrganizationStat.metric, OrganizationStat.value)
+    if organization_ids is not None:
+        query = query.filter(OrganizationStat.organization_id.in_(organization_ids))
+    result = {}
+    for org_id, metric, value in query.all():
+        result.setdefault(org_id, {})[metric] = value
+    return result
+
+def _member_counts(db: Session, organization_ids: Optional[List[int]], since: date) -> Dict[int, Tuple[int, int]]:
+    members = db.query(OrganizationMember.organization_id, func.count(OrganizationMember.id)).group_by(
+        OrganizationMember.organization_id
+    )
+    active = db.query(OrganizationMemberActivity.organization_id, func.count()).filter(
+        OrganizationMemberActivity.last_active_on >= since
+    ).group_by(OrganizationMemberActivity.organization_id)
+    if organization_ids is not None:
+        members = members.filter(OrganizationMember.organization_id.in_(organization_ids))
+        active = active.filter(OrganizationMemberActivity.organization_id.in_(organization_ids))
+    active_counts = dict(active.all())
+    return {org_id: (count, active_counts.get(org_id, 0)) for org_id, count in members.all()}
+
+def _summary(totals: Dict[str, int], members: Tuple[int, int]) -> dict:
+    return {
+        "surveys_by_status": {status: totals.get(_status_metric(status), 0) for status in SURVEY_STATUSES},
+        "totals": {metric: totals.get(metric, 0) for metric in DAILY_METRICS},
+        "member_count": members[0],
+        "active_member_count": members[1],
+    }
+
+def get_organization_rollup(db: Session, organization_id: int, days: int) -> dict:
+    """Dashboard numbers of one organization, read from the rollup tables only."""
+    start, end = _window(days)
+    rows = db.query(
+        OrganizationDailyStat.stat_date, OrganizationDailyStat.metric,
+        OrganizationDailyStat.subject_id, OrganizationDailyStat.value
+    ).filter(
+        OrganizationDailyStat.organization_id == organization_id,
+        OrganizationDailyStat.metric.in_(DAILY_METRICS),
+        OrganizationDailyStat.stat_date >= start,
+        OrganizationDailyStat.stat_date <= end
+    ).all()
+
+    daily = {metric: Counter() for metric in DAILY_METRICS}
+    per_survey = {}
+    per_session = Counter()
+    for stat_date, metric, subject_id, value in rows:
+        daily[metric][stat_date] += value
+        if metric in (SURVEY_RESPONSES, SURVEY_ANSWERS):
+            per_survey.setdefault(subject_id, Counter())[metric] += value
+        elif metric == SESSION_COMMENTS:
+            per_session[subject_id] += value
+
+    survey_titles = dict(db.query(Survey.id, Survey.title).filter(Survey.id.in_(per_survey)).all()) if per_survey else {}
+    session_titles = dict(
+        db.query(AnalysisSession.id, AnalysisSession.title).filter(AnalysisSession.id.in_(per_session)).all()
+    ) if per_session else {}
+
+    summary = _summary(
+        _totals(db, [organization_id]).get(organization_id, {}),
+        _member_counts(db, [organization_id], start).get(organization_id, (0, 0))
+    )
+    summary.update({
+        "organization_id": organization_id,
+        "start_date": start,
+        "end_date": end,
+        "daily": {
+            metric: [{"day": d, "value": v} for d, v in sorted(counts.items())]
+            for metric, counts in daily.items()
+        },
+        "surveys": sorted((
+            {
+                "survey_id": survey_id,
+                "title": survey_titles.get(survey_id, ""),
+                "responses": counts[SURVEY_RESPONSES],
+                "answers": counts[SURVEY_ANSWERS],
+            }
+            for survey_id, counts in per_survey.items()
+        ), key=lambda s: s["responses"], reverse=True),
+        "sessions": sorted((
+            {"session_id": session_id, "title": session_titles.get(session_id, ""), "comments": count}
+            for session_id, count in per_session.items()
+        ), key=lambda s: s["comments"], reverse=True),
+    })
+    return summary
+
+def get_all_organizations_rollup(db: Session, days: int) -> dict:
+    """Per-organization summaries for system admins: one grouped read of the window's rollup rows."""
+    start, end = _window(days)
+    window = db.query(
+        OrganizationDailyStat.organization_id, OrganizationDailyStat.metric, func.sum(OrganizationDailyStat.value)
+    ).filter(
+        OrganizationDailyStat.metric.in_(DAILY_METRICS),
+        OrganizationDailyStat.stat_date >= start,
+        OrganizationDailyStat.stat_date <= end
+    ).group_by(OrganizationDailyStat.organization_id, OrganizationDailyStat.metric).all()
+    in_window = {}
+    for org_id, metric, value in window:
+        in_window.setdefault(org_id, {})[metric] = int(value or 0)
+
+    totals = _totals(db, None)
+    members = _member_counts(db, None, start)
+    org_ids = sorted(set(totals) | set(members) | set(in_window))
+    results = []
+    for org_id in org_ids:
+        summary = _summary(totals.get(org_id, {}), members.get(org_id, (0, 0)))
+        summary["organization_id"] = org_id
+        summary["window"] = {metric: in_window.get(org_id, {}).get(metric, 0) for metric in DAILY_METRICS}
+        results.append(summary)
+    return {"start_date": start, "end_date": end, "organizations": results}
+
+
+# --- Rebuild (backfill / drift repair) ---
+
+def _as_date(value) -> date:
+    # SQLite returns 'YYYY-MM-DD' strings from date(), PostgreSQL returns date objects
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def rebuild_rollups(db: Session, organization_id: int):
+    """Recomputes one organization's rollups from the source tables (full scan of its rows; caller commits)."""
+    for model in (OrganizationDailyStat, OrganizationStat, OrganizationMemberActivity):
+        db.execute(delete(model).where(model.organization_id == organization_id))
+
+    daily = Counter()
+    # Form responses: one participation per user; guest/imported responses grouped by timestamp as in the CSV export
+    day = func.date(SurveyParticipation.created_at)
+    for survey_id, d, n in db.query(SurveyParticipation.survey_id, day, func.count()).join(
+        Survey, Survey.id == SurveyParticipation.survey_id
+    ).filter(Survey.organization_id == organization_id).group_by(SurveyParticipation.survey_id, day).all():
+        daily[(SURVEY_RESPONSES, survey_id, _as_date(d))] += n
+
+    day = func.date(Answer.created_at)
+    for survey_id, d, n in db.query(Answer.survey_id, day, func.count(func.distinct(Answer.created_at))).join(
+        Survey, Survey.id == Answer.survey_id
+    ).filter(Survey.organization_id == organization_id, Answer.user_id.is_(None)).group_by(Answer.survey_id, day).all():
+        daily[(SURVEY_RESPONSES, survey_id, _as_date(d))] += n
+
+    for survey_id, d, n in db.query(Answer.survey_id, day, func.count(Answer.id)).join(
+        Survey, Survey.id == Answer.survey_id
+    ).filter(
+        Survey.organization_id == organization_id, Answer.content.isnot(None), Answer.content != ""
+    ).group_by(Answer.survey_id, day).all():
+        daily[(SURVEY_ANSWERS, survey_id, _as_date(d))] += n
+
+    day = func.date(CasualPost.created_at)
+    for d, n in db.query(day, func.count(CasualPost.id)).filter(
+        CasualPost.organization_id == organization_id
+    ).group_by(day).all():
+        daily[(CASUAL_POSTS, 0, _as_date(d))] += n
+
+    day = func.date(Comment.created_at)
+    for session_id, d, n in db.query(Comment.session_id, day, func.count(Comment.id)).join(
+        AnalysisSession, AnalysisSession.id == Comment.session_id
+    ).filter(AnalysisSession.organization_id == organization_id).group_by(Comment.session_id, day).all():
+        daily[(SESSION_COMMENTS, session_id, _as_date(d))] += n
+
+    rows = [
+        {"organization_id": organization_id, "metric": metric, "subject_id": subject_id, "stat_date": d, "value": n}
+        for (metric, subject_id, d), n in daily.items()
+    ]
+    if rows:
+        db.execute(OrganizationDailyStat.__table__.insert(), rows)
+
+    totals = Counter()
+    for (metric, _, _), n in daily.items():
+        totals[(organization_id, metric)] += n
+    for approval_status, is_active, n in db.query(Survey.approval_status, Survey.is_active, func.count(Survey.id)).filter(
+        Survey.organization_id == organization_id
+    ).group_by(Survey.approval_status, Survey.is_active).all():
+        totals[(organization_id, _status_metric(survey_status(approval_status, is_active)))] += n
+    _add_totals(db, totals)
+
+    # Last activity per member from the same sources
+    last_active = {}
+    sources = [
+        db.query(SurveyParticipation.user_id, func.max(SurveyParticipation.created_at)).join(
+            Survey, Survey.id == SurveyParticipation.survey_id
+        ).filter(Survey.organization_id == organization_id).group_by(SurveyParticipation.user_id),
+        db.query(CasualPost.user_id, func.max(CasualPost.created_at)).filter(
+            CasualPost.organization_id == organization_id
+        ).group_by(CasualPost.user_id),
+        db.query(Comment.user_id, func.max(Comment.created_at)).join(
+            AnalysisSession, AnalysisSession.id == Comment.session_id
+        ).filter(AnalysisSession.organization_id == organization_id).group_by(Comment.user_id),
+    ]
+    for query in sources:
+        for user_id, at in query.all():
+            if user_id and at:
+                d = _as_date(at)
+                last_active[user_id] = max(last_active.get(user_id, d), d)
+    member_ids = {uid for (uid,) in db.query(OrganizationMember.user_id).filter(
+        OrganizationMember.organization_id == organization_id
+    ).all()}
+    activity = [
+        {"organization_id": organization_id, "user_id": user_id, "last_active_on": d}
+        for user_id, d in last_active.items() if user_id in member_ids
+    ]
+    if activity:
+        db.execute(OrganizationMemberActivity.__table__.insert(), activity)
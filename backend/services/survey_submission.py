@@ -0,0 +1,281 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, Survey, Question, Answer, SurveyParticipation, dialect_insert, now_jst
+from backend.services.metrics import metrics
+from backend.services.participation_service import add_response_counts
+from backend.services.response_cache import invalidate_lists, SURVEYS
+from backend.services.rollup_service import add_daily_counts, touch_members, SURVEY_RESPONSES, SURVEY_ANSWERS
+
+logger = logging.getLogger(__name__)
+
+# アンケートの所属組織・設問IDをメモリに保持する秒数（回答送信の検証用）
+SURVEY_FORM_CACHE_SECONDS = int(os.getenv("SURVEY_FORM_CACHE_SECONDS", 60))
+# 回答を専用スレッドでまとめてコミットする（公開直後の回答集中向け。デフォルトは無効）
+SURVEY_WRITE_BEHIND_ENABLED = os.getenv("SURVEY_WRITE_BEHIND_ENABLED", "False").lower() == "true"
+SURVEY_WRITE_BEHIND_MAX_BATCH = int(os.getenv("SURVEY_WRITE_BEHIND_MAX_BATCH", 200)) # 1コミットあたりの最大送信数
+SURVEY_WRITE_BEHIND_MAX_WAIT_MS = int(os.getenv("SURVEY_WRITE_BEHIND_MAX_WAIT_MS", 20)) # バッチを溜める最大待ち時間
+SURVEY_WRITE_BEHIND_TIMEOUT_SECONDS = float(os.getenv("SURVEY_WRITE_BEHIND_TIMEOUT_SECONDS", 10)) # リクエスト側の待ち時間上限
+# 1つの INSERT 文に含める回答行数（SQLiteのパラメータ数上限を超えないように分割）
+ANSWER_INSERT_CHUNK = 1000
+
+# Submission results
+ACCEPTED = "accepted"
+REPLAYED = "replayed"   # same Idempotency-Key as the stored participation: treated as success
+DUPLICATE = "duplicate" # already answered (different or no key)
+
+
+class SurveyFormCache:
+    """
+    (organization_id, question ids) per survey, held in process memory for a short time.
+    Questions can only be replaced while a survey has no answers, and update/delete
+    invalidate the entry, so the TTL only bounds staleness for edits made elsewhere.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[float, Optional[int], frozenset]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, survey_id: int) -> Optional[Tuple[Optional[int], frozenset]]:
+        """Returns (organization_id, question_ids), or None if the survey does not exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(survey_id)
+        if entry and entry[0] > now:
+            metrics.increment("survey.form_cache.hit")
+            return entry[1], entry[2]
+
+        metrics.increment("survey.form_cache.miss")
+        rows = db.query(Survey.organization_id, Question.id).outerjoin(
+            Question, Question.survey_id == Survey.id
+        ).filter(Survey.id == survey_id).all()
+        if not rows:
+            return None
+        organization_id = rows[0][0]
+        question_ids = frozenset(qid for _, qid in rows if qid is not None)
+        with self._lock:
+            self._entries[survey_id] = (now + SURVEY_FORM_CACHE_SECONDS, organization_id, question_ids)
+        return organization_id, question_ids
+
+    def invalidate(self, survey_id: int):
+        with self._lock:
+            self._entries.pop(survey_id, None)
+
+survey_forms = SurveyFormCache()
+
+
+class Submission:
+    """One validated form submission: non-empty answers as (question_id, content) pairs."""
+    __slots__ = ("survey_id", "organization_id", "user_id", "answers", "idempotency_key", "result", "error", "done")
+
+    def __init__(self, survey_id: int, organization_id: Optional[int], user_id: int, answers: List[Tuple[int, str]],
+                 idempotency_key: Optional[str] = None):
+        self.survey_id = survey_id
+        self.organization_id = organization_id
+        self.user_id = user_id
+        self.answers = answers
+        self.idempotency_key = idempotency_key
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def write_submissions(db: Session, submissions: List[Submission]):
+    """
+    Writes a batch of submissions in the caller's transaction (caller commits) and sets each `result`.
+
+    Statement count does not grow with the batch: one participation INSERT ... ON CONFLICT DO NOTHING
+    RETURNING, one lookup of the conflicting keys, multi-row answer INSERTs, the counter UPDATEs and the
+    dashboard rollup UPSERTs.
+    """
+    # Only the first submission per (survey, user) in a batch can claim the participation
+    firsts = {}
+    for sub in submissions:
+        firsts.setdefault((sub.survey_id, sub.user_id), sub)
+
+    now = now_jst()
+    claimed = set(db.execute(
+        dialect_insert(SurveyParticipation.__table__).values([
+            {"survey_id": s.survey_id, "user_id": s.user_id, "idempotency_key": s.idempotency_key, "created_at": now}
+            for s in firsts.values()
+        ]).on_conflict_do_nothing().returning(SurveyParticipation.survey_id, SurveyParticipation.user_id)
+    ).tuples().all())
+
+    conflicts = [pair for pair in firsts if pair not in claimed]
+    stored_keys = {}
+    if conflicts:
+        stored_keys = {
+            (survey_id, user_id): key
+            for survey_id, user_id, key in db.execute(
+                select(SurveyParticipation.survey_id, SurveyParticipation.user_id, SurveyParticipation.idempotency_key).where(
+                    tuple_(SurveyParticipation.survey_id, SurveyParticipation.user_id).in_(conflicts)
+                )
+            ).all()
+        }
+
+    answer_rows = []
+    respondents = Counter()
+    answered = defaultdict(Counter)
+    rollups = Counter()
+    for sub in submissions:
+        pair = (sub.survey_id, sub.user_id)
+        if pair in claimed and firsts[pair] is sub:
+            sub.result = ACCEPTED
+            respondents[sub.survey_id] += 1
+            rollups[(sub.organization_id, SURVEY_RESPONSES, sub.survey_id)] += 1
+            rollups[(sub.organization_id, SURVEY_ANSWERS, sub.survey_id)] += len(sub.answers)
+            for question_id, content in sub.answers:
+                answer_rows.append({
+                    "survey_id": sub.survey_id, "question_id": question_id,
+                    "user_id": sub.user_id, "content": content, "created_at": now
+                })
+                answered[sub.survey_id][question_id] += 1
+            continue
+        # Retried request (same key as the stored or the winning submission) gets the original outcome
+        key = stored_keys.get(pair) if pair not in claimed else firsts[pair].idempotency_key
+        sub.result = REPLAYED if sub.idempotency_key and sub.idempotency_key == key else DUPLICATE
+
+    for i in range(0, len(answer_rows), ANSWER_INSERT_CHUNK):
+        db.execute(insert(Answer.__table__).values(answer_rows[i:i + ANSWER_INSERT_CHUNK]))
+    for survey_id, count in respondents.items():
+        add_response_counts(db, survey_id, count, answered[survey_id])
+    add_daily_counts(db, rollups, now)
+    touch_members(db, [(s.organization_id, s.user_id) for s in submissions if s.result == ACCEPTED], now)
+
+def _invalidate_survey_lists(submissions: List[Submission]):
+    # Survey lists show response_count; call after commit
+    for organization_id in {s.organization_id for s in submissions if s.result == ACCEPTED}:
+        invalidate_lists(organization_id, SURVEYS)
+
+
+class SubmissionBuffer(threading.Thread):
+    """
+    Write-behind buffer for survey submissions (group commit).
+
+    Request threads enqueue a submission and wait; this thread collects whatever arrives
+    within SURVEY_WRITE_BEHIND_MAX_WAIT_MS (up to SURVEY_WRITE_BEHIND_MAX_BATCH) and writes
+    it in one transaction, so a launch burst costs one commit and one lock on each counter
+    row per batch instead of per submission. Requests still get the real result.
+    """
+
+    def __init__(self):
+        super().__init__(name="survey-submission-buffer", daemon=True)
+        self._queue = queue.Queue(maxsize=SURVEY_WRITE_BEHIND_MAX_BATCH * 10)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def offer(self, submission: Submission) -> bool:
+        """Enqueues a submission; False when the buffer is full or stopping (write it directly instead)."""
+        if self._stop_event.is_set():
+            return False
+        try:
+            self._queue.put_nowait(submission)
+            return True
+        except queue.Full:
+            metrics.increment("survey.write_behind.full")
+            return False
+
+    def _take_batch(self) -> List[Submission]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + SURVEY_WRITE_BEHIND_MAX_WAIT_MS / 1000
+        while len(batch) < SURVEY_WRITE_BEHIND_MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Submission]):
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                write_submissions(db, batch)
+                db.commit()
+                _invalidate_survey_lists(batch)
+            except Exception as e:
+                # One bad submission must not fail the others: retry each in its own transaction
+                db.rollback()
+                logger.warning(f"Survey submission batch of {len(batch)} failed, writing one by one: {e}")
+                for sub in batch:
+                    try:
+                        write_submissions(db, [sub])
+                        db.commit()
+                        _invalidate_survey_lists([sub])
+                    except Exception as sub_error:
+                        db.rollback()
+                        sub.result = None
+                        sub.error = sub_error
+        finally:
+            db.close()
+            metrics.summarize("survey.write_behind.batch_size", len(batch))
+            metrics.observe("survey.write_behind.flush", time.perf_counter() - started)
+            for sub in batch:
+                sub.done.set()
+
+    def run(self):
+        # Drain what is left after stop() so no accepted submission is lost
+        while not self._stop_event.is_set() or not self._queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+_buffer = None
+
+def start_submission_buffer():
+    global _buffer
+    if not SURVEY_WRITE_BEHIND_ENABLED:
+        return
+    if _buffer is None or not _buffer.is_alive():
+        _buffer = SubmissionBuffer()
+        _buffer.start()
+
+def stop_submission_buffer():
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer.join(timeout=10)
+        _buffer = None
+
+
+def submit(db: Session, submission: Submission) -> Optional[str]:
+    """
+    Writes one submission and returns its result (ACCEPTED / REPLAYED / DUPLICATE), via the
+    write-behind buffer when it is running. Returns None if the buffer did not finish within
+    SURVEY_WRITE_BEHIND_TIMEOUT_SECONDS (the write may still complete; retry with the same key).
+    """
+    buffer = _buffer
+    if buffer is not None and buffer.offer(submission):
+        # Release the request's connection while waiting for the group commit
+        db.rollback()
+        if not submission.done.wait(SURVEY_WRITE_BEHIND_TIMEOUT_SECONDS):
+            metrics.increment("survey.write_behind.timeout")
+            return None
+        if submission.error is not None:
+            raise submission.error
+    else:
+        try:
+            write_submissions(db, [submission])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        _invalidate_survey_lists([submission])
+    metrics.increment(f"survey.submissions.{submission.result}")
+    return submission.result
@@ -0,0 +1,228 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import orjson
+from sqlalchemy.orm import Session, joinedload
+
+from backend.database import SessionLocal, Comment, CommentThreadAnalysis, dialect_insert, now_jst
+from backend.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# スレッド分析で同時に実行する LLM 呼び出しの上限（プロセス全体。一括分析が重なっても超えない）
+THREAD_ANALYSIS_CONCURRENCY = int(os.getenv("THREAD_ANALYSIS_CONCURRENCY", 3))
+
+_llm_slots = threading.BoundedSemaphore(max(1, THREAD_ANALYSIS_CONCURRENCY))
+# 一括分析を実行中のセッション（同じセッションの二重実行を防ぐ）
+_running_sessions = set()
+_running_lock = threading.Lock()
+
+
+class ThreadState(NamedTuple):
+    """What a thread analysis covered: a thread with the same state gives the same input to the LLM."""
+    last_comment_id: int
+    comment_count: int
+    last_edited_at: Optional[datetime]
+
+def thread_state(comments: List[Comment]) -> ThreadState:
+    """State of a thread (parent and replies) as loaded for analysis."""
+    return ThreadState(
+        last_comment_id=max(c.id for c in comments),
+        comment_count=len(comments),
+        last_edited_at=max((c.updated_at or c.created_at) for c in comments)
+    )
+
+def format_thread_comments(comments: List[Comment]) -> List[dict]:
+    """Plain dicts for analyze_thread_logic (no ORM objects, so they can be passed to worker threads)."""
+    return [
+        {
+            "content": c.content,
+            "user_name": "匿名" if c.is_anonymous else (c.user.username if c.user else "Unknown"),
+            "created_at": c.created_at
+        } for c in comments
+    ]
+
+def load_session_threads(db: Session, session_id: int) -> Dict[int, List[Comment]]:
+    """
+    Every thread of a session (root comment followed by its direct replies in time order,
+    the same comments analyze-thread sends), keyed by root comment id. One query.
+    """
+    comments = db.query(Comment).options(joinedload(Comment.user)).filter(
+        Comment.session_id == session_id
+    ).order_by(Comment.created_at.asc(), Comment.id.asc()).all()
+    threads = {c.id: [c] for c in comments if c.parent_id is None}
+    for c in comments:
+        if c.parent_id in threads:
+            threads[c.parent_id].append(c)
+    return threads
+
+def load_thread_states(db: Session, session_id: int) -> Dict[int, ThreadState]:
+    """Recorded state of every analysed thread of a session, keyed by root comment id."""
+    rows = db.query(
+        CommentThreadAnalysis.parent_comment_id, CommentThreadAnalysis.last_comment_id,
+        CommentThreadAnalysis.comment_count, CommentThreadAnalysis.last_edited_at
+    ).filter(CommentThreadAnalysis.session_id == session_id).all()
+    return {r.parent_comment_id: ThreadState(r.last_comment_id, r.comment_count, r.last_edited_at) for r in rows}
+
+def is_failed_result(result) -> bool:
+    """The error placeholder older versions stored when the LLM call failed (never a real analysis)."""
+    if not isinstance(result, dict):
+        return True
+    steps = result.get("next_steps")
+    return isinstance(steps, list) and len(steps) == 1 and isinstance(steps[0], dict) and steps[0].get("title") == "エラー"
+
+def get_unchanged_result(db: Session, session_id: int, parent_comment_id: int, state: ThreadState) -> Optional[dict]:
+    """The stored result of a thread when it was analysed in exactly this state, otherwise None."""
+    row = db.query(
+        CommentThreadAnalysis.result, CommentThreadAnalysis.last_comment_id,
+        CommentThreadAnalysis.comment_count, CommentThreadAnalysis.last_edited_at
+    ).filter(
+        CommentThreadAnalysis.session_id == session_id,
+        CommentThreadAnalysis.parent_comment_id == parent_comment_id
+    ).first()
+    if row is None or ThreadState(row.last_comment_id, row.comment_count, row.last_edited_at) != state:
+        return None
+    if is_failed_result(row.result):
+        return None
+    return row.result
+
+def save_thread_analysis(db: Session, session_id: int, parent_comment_id: int, result: dict, state: ThreadState):
+    """
+    Stores the analysis of one thread as a single-row upsert (caller commits); only call it with
+    a successful result, as the state makes later requests reuse it. Other threads
+    of the session are not read or rewritten, so concurrent analyses of different threads
+    cannot overwrite each other.
+    """
+    now = now_jst()
+    stmt = dialect_insert(CommentThreadAnalysis.__table__).values(
+        session_id=session_id, parent_comment_id=parent_comment_id, result=result,
+        last_comment_id=state.last_comment_id, comment_count=state.comment_count,
+        last_edited_at=state.last_edited_at, created_at=now, updated_at=now
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["session_id", "parent_comment_id"],
+        set_={
+            "result": stmt.excluded.result,
+            "last_comment_id": stmt.excluded.last_comment_id,
+            "comment_count": stmt.excluded.comment_count,
+            "last_edited_at": stmt.excluded.last_edited_at,
+            "updated_at": stmt.excluded.updated_at,
+        }
+    ))
+
+def thread_analyses_json(db: Session, session_id: int) -> Optional[str]:
+    """
+    The session's thread analyses as the `comment_analysis` JSON text the report page reads
+    ({"threads": {"<parent_comment_id>": {...}}}), or None when no thread was analysed.
+    """
+    rows = db.query(CommentThreadAnalysis.parent_comment_id, CommentThreadAnalysis.result).filter(
+        CommentThreadAnalysis.session_id == session_id
+    ).all()
+    if not rows:
+        return None
+    return orjson.dumps({"threads": {str(r.parent_comment_id): r.result for r in rows}}).decode("utf-8")
+
+def run_thread_analysis(formatted: List[dict]) -> dict:
+    """
+    analyze_thread_logic under the process-wide LLM concurrency limit. Raises when the LLM call
+    failed or returned something that is not an analysis, so the caller neither saves nor
+    reports it as analysed.
+    """
+    from backend.services.analysis import analyze_thread_logic
+    with _llm_slots:
+        result = analyze_thread_logic(formatted)
+    if is_failed_result(result):
+        raise ValueError("Thread analysis returned no usable result")
+    return result
+
+def stream_thread_analysis(formatted: List[dict]) -> Iterator[tuple]:
+    """stream_thread_analysis_logic under the same limit; the slot is held until the stream ends or is closed."""
+    from backend.services.analysis import stream_thread_analysis_logic
+    with _llm_slots:
+        yield from stream_thread_analysis_logic(formatted)
+
+def _analyze_and_save_thread(session_id: int, parent_comment_id: int, formatted: List[dict], state: ThreadState) -> dict:
+    """run_thread_analysis, then saves the result on its own DB session (runs in a worker thread)."""
+    result = run_thread_analysis(formatted)
+    db = SessionLocal()
+    try:
+        save_thread_analysis(db, session_id, parent_comment_id, result, state)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return result
+
+def analyze_session_threads(session_id: int, force: bool = False) -> Iterator[dict]:
+    """
+    Analyses every thread of a session and yields progress events (one per thread, then a summary).
+
+    Threads whose state matches their last analysis are skipped without calling the LLM (unless
+    force). The rest run concurrently, at most THREAD_ANALYSIS_CONCURRENCY LLM calls at a time
+    across the process. Each worker saves and commits its own result, so an interrupted run
+    (client gone) still keeps the analyses that were already running. A failed LLM call is
+    reported as an "error" event and not saved, so the next run tries that thread again.
+    Opens its own DB sessions (runs while streaming).
+    """
+    with _running_lock:
+        already_running = session_id in _running_sessions
+        if not already_running:
+            _running_sessions.add(session_id)
+    # Yield outside the lock: the consumer may not resume this generator for a while
+    if already_running:
+        yield {"error": "already_running"}
+        return
+
+    db = SessionLocal()
+    analyzed = unchanged = failed = done = 0
+    try:
+        threads = load_session_threads(db, session_id)
+        states = load_thread_states(db, session_id)
+        total = len(threads)
+
+        pending = {}
+        for parent_id, comments in threads.items():
+            state = thread_state(comments)
+            if not force and states.get(parent_id) == state:
+                unchanged += 1
+                done += 1
+                yield {"parent_comment_id": parent_id, "status": "unchanged", "done": done, "total": total}
+            else:
+                pending[parent_id] = (state, format_thread_comments(comments))
+        metrics.increment("thread_analysis.unchanged", unchanged)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(THREAD_ANALYSIS_CONCURRENCY, len(pending) or 1)))
+        try:
+            futures = {
+                executor.submit(_analyze_and_save_thread, session_id, parent_id, formatted, state): parent_id
+                for parent_id, (state, formatted) in pending.items()
+            }
+            for future in as_completed(futures):
+                parent_id = futures[future]
+                done += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Bulk thread analysis failed for comment {parent_id}: {e}")
+                    failed += 1
+                    yield {"parent_comment_id": parent_id, "status": "error", "done": done, "total": total}
+                    continue
+                analyzed += 1
+                metrics.increment("thread_analysis.analyzed")
+                yield {"parent_comment_id": parent_id, "status": "analyzed", "result": result, "done": done, "total": total}
+        finally:
+            # Returns at once after a full run; if the client went away, threads not started yet are
+            # dropped and the running ones finish and save their results
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        yield {"summary": {"total": total, "analyzed": analyzed, "unchanged": unchanged, "failed": failed}}
+    finally:
+        db.close()
+        with _running_lock:
+            _running_sessions.discard(session_id)
@@ -0,0 +1,232 @@
+import os
+import math
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.database import CasualPost, now_jst
+
+logger = logging.getLogger(__name__)
+
+# 新しい投稿を既存トピックに割り当てるコサイン類似度のしきい値
+TOPIC_STREAM_SIMILARITY = float(os.getenv("TOPIC_STREAM_SIMILARITY", 0.55))
+# 組織ごとに保持するトピック数の上限（超えたら最も勢いの弱いトピックを入れ替え）
+TOPIC_STREAM_MAX_TOPICS = int(os.getenv("TOPIC_STREAM_MAX_TOPICS", 30))
+# 「いまの勢い」の半減期（分）
+TOPIC_STREAM_HALF_LIFE_MINUTES = float(os.getenv("TOPIC_STREAM_HALF_LIFE_MINUTES", 60))
+# 再起動後の初回アクセス時に読み込む期間（時間）と件数
+TOPIC_STREAM_WARMUP_HOURS = 24
+TOPIC_STREAM_WARMUP_LIMIT = 500
+# 別のリクエストが読み込み中のとき、完了を待つ最大秒数
+TOPIC_STREAM_WARMUP_WAIT_SECONDS = 30
+TOPIC_STREAM_SAMPLES_PER_TOPIC = 5
+
+
+_embedder = None
+
+def embed_posts(texts: List[str]) -> np.ndarray:
+    """
+    Embeds posts for online clustering in one batch (one unit vector per row).
+    Vectors must be comparable across calls, so the per-call TF-IDF fallback of
+    get_vectors_semantic() is not usable here; if the embedding model cannot be loaded,
+    a stateless hashing vectorizer is used for the lifetime of the process instead.
+    """
+    global _embedder
+    if _embedder is None:
+        try:
+            from backend.services.analysis import get_embedding_model
+            model = get_embedding_model()
+            _embedder = lambda batch: model.encode(batch, batch_size=32, show_progress_bar=False)
+        except Exception as e:
+            logger.warning(f"Embedding model unavailable for topic stream, using hashing vectors: {e}")
+            from sklearn.feature_extraction.text import HashingVectorizer
+            vectorizer = HashingVectorizer(analyzer='char', ngram_range=(1, 3), n_features=2 ** 12, alternate_sign=False)
+            _embedder = lambda batch: vectorizer.transform(batch).toarray()
+    vectors = np.asarray(_embedder(list(texts)), dtype=float)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def embed_post(text: str) -> np.ndarray:
+    return embed_posts([text])[0]
+
+
+class _Topic:
+    __slots__ = ("id", "centroid", "weight", "post_count", "updated_at", "created_at", "samples")
+
+    def __init__(self, topic_id: int, vector: np.ndarray, text: str, at: datetime):
+        self.id = topic_id
+        self.centroid = vector
+        self.weight = 1.0 # decayed post count ("momentum")
+        self.post_count = 1
+        self.updated_at = at
+        self.created_at = at
+        self.samples = deque([(text, vector)], maxlen=TOPIC_STREAM_SAMPLES_PER_TOPIC)
+
+
+class OrganizationTopicStream:
+    """
+    Online clustering of one organization's posts (streaming k-means with exponential decay).
+
+    Each post joins the most similar topic centroid, or starts a new topic when nothing is
+    similar enough. Topic weights decay with a half-life, so recent activity dominates both
+    the ranking and how far centroids move; stale topics are replaced once the cap is hit.
+    """
+
+    def __init__(self):
+        self._topics: List[_Topic] = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.ready = False
+        # Set once the warm-up finished (or failed), for readers waiting on another request's warm-up
+        self.warmed = threading.Event()
+        # Posts created while the warm-up runs: (post_id, text, created_at)
+        self._backlog = []
+
+    def _decay(self, topic: _Topic, at: datetime) -> float:
+        elapsed = (at - topic.updated_at).total_seconds() / 60
+        if elapsed <= 0:
+            return topic.weight
+        return topic.weight * math.pow(0.5, elapsed / TOPIC_STREAM_HALF_LIFE_MINUTES)
+
+    def observe(self, vector: np.ndarray, text: str, at: datetime):
+        with self._lock:
+            best, best_similarity = None, -1.0
+            for topic in self._topics:
+                similarity = float(topic.centroid @ vector)
+                if similarity > best_similarity:
+                    best, best_similarity = topic, similarity
+
+            if best is not None and best_similarity >= TOPIC_STREAM_SIMILARITY:
+                weight = self._decay(best, at)
+                centroid = best.centroid * weight + vector
+                norm = np.linalg.norm(centroid)
+                best.centroid = centroid / norm if norm else centroid
+                best.weight = weight + 1
+                best.post_count += 1
+                best.updated_at = max(best.updated_at, at)
+                best.samples.append((text, vector))
+                return
+
+            if len(self._topics) >= TOPIC_STREAM_MAX_TOPICS:
+                weakest = min(self._topics, key=lambda t: self._decay(t, at))
+                self._topics.remove(weakest)
+            self._topics.append(_Topic(self._next_id, vector, text, at))
+            self._next_id += 1
+
+    def defer(self, post_id: int, text: str, at: datetime) -> bool:
+        """Keeps a post created during the warm-up. False once the stream is ready (observe it directly)."""
+        with self._lock:
+            if self.ready:
+                return False
+            self._backlog.append((post_id, text, at))
+            return True
+
+    def finish_warm_up(self, loaded_ids: set):
+        """
+        Observes the posts deferred during the warm-up (except those the warm-up query already
+        returned), then marks the stream ready. Posts deferred meanwhile are picked up by the loop.
+        """
+        while True:
+            with self._lock:
+                if not self._backlog:
+                    self.ready = True
+                    return
+                backlog, self._backlog = self._backlog, []
+            backlog = sorted((item for item in backlog if item[0] not in loaded_ids), key=lambda item: item[2])
+            if backlog:
+                vectors = embed_posts([text for _, text, _ in backlog])
+                for (_, text, at), vector in zip(backlog, vectors):
+                    self.observe(vector, text, at)
+
+    def trending(self, limit: int, at: datetime) -> List[dict]:
+        with self._lock:
+            ranked = sorted(
+                ((self._decay(t, at), t) for t in self._topics),
+                key=lambda item: item[0], reverse=True
+            )[:limit]
+            results = []
+            for momentum, topic in ranked:
+                # Label with the stored sample closest to the current centroid
+                label = max(topic.samples, key=lambda s: float(s[1] @ topic.centroid))[0]
+                results.append({
+                    "topic_id": topic.id,
+                    "label": label,
+                    "momentum": round(momentum, 3),
+                    "post_count": topic.post_count,
+                    "first_post_at": topic.created_at,
+                    "last_post_at": topic.updated_at,
+                    "sample_posts": [text for text, _ in reversed(topic.samples)]
+                })
+            return results
+
+
+class TopicStreamRegistry:
+    """Per-organization topic streams held in process memory (rebuilt from recent posts after a restart)."""
+
+    def __init__(self):
+        self._streams: Dict[int, OrganizationTopicStream] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, organization_id: int) -> tuple:
+        with self._lock:
+            stream = self._streams.get(organization_id)
+            created = stream is None
+            if created:
+                stream = OrganizationTopicStream()
+                self._streams[organization_id] = stream
+            return stream, created
+
+    def _warm_up(self, db: Session, organization_id: int, stream: OrganizationTopicStream):
+        since = now_jst() - timedelta(hours=TOPIC_STREAM_WARMUP_HOURS)
+        rows = db.query(CasualPost.id, CasualPost.content, CasualPost.created_at).filter(
+            CasualPost.organization_id == organization_id,
+            CasualPost.created_at >= since
+        ).order_by(CasualPost.created_at.desc()).limit(TOPIC_STREAM_WARMUP_LIMIT).all()
+        rows = [r for r in reversed(rows) if r.content and r.content.strip()]
+        if rows:
+            # One batched encode instead of one model call per post
+            vectors = embed_posts([r.content for r in rows])
+            for r, vector in zip(rows, vectors):
+                stream.observe(vector, r.content, r.created_at)
+        stream.finish_warm_up({r.id for r in rows})
+        logger.info(f"Topic stream warmed up: org={organization_id} posts={len(rows)}")
+
+    def observe_post(self, organization_id: int, post_id: int, content: str, created_at: datetime):
+        """Feeds a newly created post into its organization's stream (run after the response is sent)."""
+        stream = self._streams.get(organization_id)
+        # Streams are built lazily from the DB on first read; until then there is nothing to update
+        if stream is None or not content or not content.strip():
+            return
+        try:
+            # During the warm-up the post is kept and observed when the warm-up finishes
+            if stream.defer(post_id, content, created_at):
+                return
+            stream.observe(embed_post(content), content, created_at)
+        except Exception as e:
+            logger.error(f"Topic stream update failed: {e}")
+
+    def trending(self, db: Session, organization_id: int, limit: int = 5) -> List[dict]:
+        stream, created = self._get_or_create(organization_id)
+        if created:
+            try:
+                self._warm_up(db, organization_id, stream)
+            except Exception:
+                # Let the next request retry the warm-up
+                with self._lock:
+                    self._streams.pop(organization_id, None)
+                raise
+            finally:
+                stream.warmed.set()
+        elif not stream.ready:
+            # Another request is warming this organization up
+            stream.warmed.wait(TOPIC_STREAM_WARMUP_WAIT_SECONDS)
+        return stream.trending(limit, now_jst())
+
+
+topic_streams = TopicStreamRegistry()
@@ -3,7 +3,6 @@
 import { Suspense, useEffect, useState } from 'react';
 import { useRouter } from "next/navigation";
 import Image from "next/image";
-import axios from "axios";
 import Link from 'next/link';
 import { LayoutDashboard, FileText, Key, LogOut, Menu, BarChart2, Folder, Upload, Users, ClipboardList } from "lucide-react";
 import { useSearchParams } from 'next/navigation';
@@ -14,6 +13,7 @@ import AnalysisRunner from "@/components/dashboard/AnalysisRunner";
 import CsvImporter from "@/components/dashboard/CsvImporter";
 import MemberList from "@/components/dashboard/MemberList";
 import CasualChatBoard from "@/components/dashboard/CasualChatBoard";
+import { fetchBootstrap } from "@/lib/bootstrap";
 
 // Types
 interface Session {
@@ -47,11 +47,9 @@ function DashboardContent() {
       try {
         setLoading(true);
 
-        // 1. Fetch User (to determine Role)
-        const userRes = await axios.get('/api/auth/me', {
-          withCredentials: true
-        });
-        const currentUser = userRes.data;
+        // 1. Fetch User, Sessions and Surveys in one request (shared with Sidebar / NotificationBell)
+        const data = await fetchBootstrap();
+        const currentUser = data.user;
         setUser(currentUser);
 
         const isAdmin = currentUser.role === 'system_admin' || currentUser.org_role === 'admin';
@@ -65,23 +63,11 @@ function DashboardContent() {
           }
         }
 
-        // 3. Fetch Sessions (Reports)
-        const sessionRes = await axios.get('/api/dashboard/sessions', {
-          withCredentials: true
-        }).catch(() => ({ data: [] }));
+        // 3. Sessions (Reports)
+        setSessions(data.sessions);
 
-        if (sessionRes.data && Array.isArray(sessionRes.data)) {
-          setSessions(sessionRes.data);
-        }
-
-        // 4. Fetch Active Surveys (for Answering) - All users including admins
-        const surveyRes = await axios.get('/api/dashboard/surveys', {
-          withCredentials: true
-        }).catch(() => ({ data: [] }));
-        if (surveyRes.data && Array.isArray(surveyRes.data)) {
-          // Filter for active only
-          setActiveSurveys(surveyRes.data.filter((s: any) => s.is_active));
-        }
+        // 4. Active Surveys (for Answering) - All users including admins
+        setActiveSurveys(data.surveys.filter((s) => s.is_active));
 
       } catch (error: any) {
         // Handle Unauthorized Access (Redirect) silently
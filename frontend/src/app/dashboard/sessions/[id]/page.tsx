@@ -14,6 +14,8 @@ import { Map as MapIcon, FileText, MessageCircle, ArrowLeft, Sparkles, Users, Ch
 import Link from 'next/link';
 import RichTextEditor from '@/components/ui/RichTextEditor';
 import { useSidebar } from '@/components/SidebarContext';
+import { invalidateBootstrap } from '@/lib/bootstrap';
+import { postEventStream } from '@/lib/eventStream';
 import { Menu as MenuIcon } from 'lucide-react';
 
 // Dynamic import for Plotly
@@ -177,9 +179,12 @@ function SessionDetailContent() {
           setUser(null);
         }
 
-        // 2. Fetch Data
-        const res = await axios.get(`/api/dashboard/sessions/${id}`, { withCredentials: true });
-        setData(res.data);
+        // 2. Fetch Data: the report body (snapshot once published) and the live discussion in parallel
+        const [reportRes, discussionRes] = await Promise.all([
+          axios.get(`/api/dashboard/sessions/${id}/report`, { withCredentials: true }),
+          axios.get(`/api/dashboard/sessions/${id}/discussion`, { withCredentials: true })
+        ]);
+        setData({ ...reportRes.data, ...discussionRes.data });
       } catch (error: any) {
         // Handle Unauthorized Access (Redirect)
         if (error.response && error.response.status === 401) {
@@ -196,6 +201,11 @@ function SessionDetailContent() {
     fetchDetail();
   }, [id, router]);
 
+  const refreshDiscussion = async () => {
+    const res = await axios.get(`/api/dashboard/sessions/${id}/discussion`, { withCredentials: true });
+    setData(prev => prev ? { ...prev, ...res.data } : prev);
+  };
+
   const handlePublishToggle = async () => {
     if (!data) return;
     const action = data.is_published ? "非公開" : "公開";
@@ -272,9 +282,8 @@ function SessionDetailContent() {
       setIsCreatingPost(false);
       setIsAnonymous(false);
 
-      // Reload comments (fetch detail again)
-      const res = await axios.get(`/api/dashboard/sessions/${id}`, { withCredentials: true });
-      setData(res.data);
+      // Reload comments (the report body does not change)
+      await refreshDiscussion();
 
     } catch (error) {
       console.error("Failed to create post", error);
@@ -287,6 +296,7 @@ function SessionDetailContent() {
     setIsUpdating(true);
     try {
       await axios.delete(`/api/dashboard/sessions/${id}`, { withCredentials: true });
+      invalidateBootstrap();
       router.push('/dashboard');
     } catch (error) {
       alert("削除に失敗しました");
@@ -391,18 +401,26 @@ function SessionDetailContent() {
   const handleAnalyzeThread = async (rootCommentId: number) => {
     setIsAnalyzing(true);
     try {
-      const res = await axios.post(`/api/dashboard/sessions/${id}/analyze-thread`, {
+      // SSE: next_step ごとに生成された順で表示し、保存後に result で最終結果に置き換える
+      const steps: any[] = [];
+      let final: any = null;
+      await postEventStream(`/api/dashboard/sessions/${id}/analyze-thread/stream`, {
         parent_comment_id: rootCommentId
-      }, { withCredentials: true });
-
-      // Update local state
-      const newResult = res.data.result;
-      setThreadAnalysisResults(prev => ({
-        ...prev,
-        [rootCommentId]: newResult
-      }));
+      }, (event, data) => {
+        if (event === 'next_step') {
+          steps.push(data);
+          setThreadAnalysisResults(prev => ({ ...prev, [rootCommentId]: { next_steps: [...steps] } }));
+        } else if (event === 'result') {
+          final = data;
+          setThreadAnalysisResults(prev => ({ ...prev, [rootCommentId]: data.result }));
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        }
+      });
+      if (!final) throw new Error('stream ended without result');
 
-      alert("分析が完了しました");
+      // unchanged: 前回の分析からスレッドに変更がなく、保存済みの結果が返った
+      alert(final.unchanged ? "前回の分析からコメントに変更がないため、前回の結果を表示しています" : "分析が完了しました");
     } catch (e) {
       console.error(e);
       alert("分析に失敗しました");
@@ -411,6 +429,60 @@ function SessionDetailContent() {
     }
   };
 
+  // 全スレッドの一括分析（NDJSONで1スレッドごとに進捗が届く。変更のないスレッドはサーバー側で省略）
+  const [bulkProgress, setBulkProgress] = useState<{ done: number; total: number } | null>(null);
+
+  const handleAnalyzeAllThreads = async () => {
+    if (!confirm("すべてのスレッドをAI分析しますか？\n前回の分析からコメントに変更がないスレッドは省略されます。")) return;
+    setIsMenuOpen(false);
+    setBulkProgress({ done: 0, total: 0 });
+    let summary: { analyzed: number; unchanged: number; failed: number } | null = null;
+    try {
+      const res = await fetch(`/api/dashboard/sessions/${id}/analyze-threads`, {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({})
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || '';
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.error === 'already_running') {
+            alert("このレポートのスレッド分析は実行中です");
+            return;
+          }
+          if (event.summary) {
+            summary = event.summary;
+            continue;
+          }
+          setBulkProgress({ done: event.done, total: event.total });
+          if (event.status === 'analyzed') {
+            setThreadAnalysisResults(prev => ({ ...prev, [event.parent_comment_id]: event.result }));
+          }
+        }
+      }
+      if (summary) {
+        alert(`スレッド分析が完了しました（分析 ${summary.analyzed}件・変更なし ${summary.unchanged}件${summary.failed ? `・失敗 ${summary.failed}件` : ''}）`);
+      }
+    } catch (e) {
+      console.error(e);
+      alert("分析に失敗しました");
+    } finally {
+      setBulkProgress(null);
+    }
+  };
+
   // Filter comments for the active thread
   // Return separate root and descendants to render "Flat" thread style
   const { root: activeThreadRoot, descendants: activeThreadDescendants } = useMemo(() => {
@@ -491,6 +563,13 @@ function SessionDetailContent() {
               >
                 {data.is_published ? <><Archive className="w-4 h-4" /> 非公開</> : <><CheckCircle className="w-4 h-4" /> 公開</>}
               </button>
+              <button
+                onClick={handleAnalyzeAllThreads}
+                disabled={bulkProgress !== null}
+                className="px-3 py-1.5 rounded-lg text-sm font-bold bg-amber-100 text-amber-700 hover:bg-amber-200 flex items-center gap-2"
+              >
+                <Sparkles className="w-4 h-4" /> {bulkProgress ? `分析中 ${bulkProgress.done}/${bulkProgress.total}` : '全スレッド分析'}
+              </button>
               <button
                 onClick={handleDelete}
                 disabled={isUpdating}
@@ -520,6 +599,13 @@ function SessionDetailContent() {
                     >
                       {data.is_published ? <><Archive className="w-4 h-4" /> 非公開にする</> : <><CheckCircle className="w-4 h-4 text-green-500" /> 公開する</>}
                     </button>
+                    <button
+                      onClick={handleAnalyzeAllThreads}
+                      disabled={bulkProgress !== null}
+                      className="w-full text-left px-4 py-3 text-sm font-bold text-amber-700 hover:bg-amber-50 border-b border-slate-50 flex items-center gap-2"
+                    >
+                      <Sparkles className="w-4 h-4" /> {bulkProgress ? `分析中 ${bulkProgress.done}/${bulkProgress.total}` : '全スレッドをAI分析'}
+                    </button>
                     <button
                       onClick={handleDelete}
                       disabled={isUpdating}
@@ -913,10 +999,7 @@ function SessionDetailContent() {
                   rootCid={activeThreadRootId || -1}
                   currentUserId={user?.id}
                   sessionId={data.id}
-                  onRefresh={async () => {
-                    const res = await axios.get(`/api/dashboard/sessions/${id}`, { withCredentials: true });
-                    setData(res.data);
-                  }}
+                  onRefresh={refreshDiscussion}
                 />
               </div>
             </div>
@@ -37,6 +37,8 @@ export default function SurveyPage() {
   const [hasAlreadyAnswered, setHasAlreadyAnswered] = useState(false);
   const [user, setUser] = useState<any | null>(null);
   const [error, setError] = useState("");
+  // 再送（タイムアウト後の再試行など）が二重回答エラーにならないよう、フォームごとに1つのキーを使う
+  const [idempotencyKey] = useState(() => crypto.randomUUID());
 
   useEffect(() => {
     if (!uuid) return;
@@ -95,7 +97,10 @@ export default function SurveyPage() {
         }))
       };
 
-      await axios.post(`/api/surveys/${survey.id}/response`, payload, { withCredentials: true });
+      await axios.post(`/api/surveys/${survey.id}/response`, payload, {
+        withCredentials: true,
+        headers: { "Idempotency-Key": idempotencyKey }
+      });
       setIsSubmitted(true);
       window.scrollTo(0, 0);
     } catch (e) {
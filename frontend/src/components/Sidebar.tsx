@@ -6,6 +6,7 @@ import { usePathname, useSearchParams } from 'next/navigation';
 import { LayoutDashboard, FileText, Key, LogOut, Menu, BarChart2, Folder, Upload, Users, ClipboardList, ChevronDown, User as UserIcon, Settings, UserCircle, Building, MessageSquare, Home } from "lucide-react";
 import axios from 'axios';
 import ProfileSettingsModal from './ProfileSettingsModal';
+import { fetchBootstrap } from '@/lib/bootstrap';
 
 interface SidebarProps {
   user: {
@@ -42,32 +43,20 @@ export default function Sidebar({ user, onLogout, isMobileOpen, setIsMobileOpen,
       return;
     }
 
-    const fetchUser = async () => {
-      if (!user) {
-        try {
-          const res = await axios.get('/api/auth/me', { withCredentials: true });
-          setInternalUser(res.data);
-        } catch (e: any) {
-          if (e.response?.status !== 401) {
-            console.error("Failed to fetch user in Sidebar", e);
-          }
-        }
-      } else {
-        setInternalUser(user);
-      }
-    };
-
-    const fetchOrgs = async () => {
+    // User and organizations come from the shared bootstrap request (deduplicated with the dashboard)
+    const fetchUserAndOrgs = async () => {
       try {
-        const res = await axios.get('/api/auth/my-orgs', { withCredentials: true });
-        setAvailableOrgs(res.data);
-      } catch (e) {
-        console.error("Failed to fetch organizations", e);
+        const data = await fetchBootstrap();
+        setInternalUser(user || data.user);
+        setAvailableOrgs(data.organizations);
+      } catch (e: any) {
+        if (e.response?.status !== 401) {
+          console.error("Failed to fetch user in Sidebar", e);
+        }
       }
     };
 
-    fetchUser();
-    fetchOrgs();
+    fetchUserAndOrgs();
   }, [user, pathname]);
 
   const handleOrgChange = async (e: React.ChangeEvent<HTMLSelectElement>) => {
@@ -3,7 +3,7 @@
 import React, { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import axios from 'axios';
-import { Plus, Edit2, Check, X, Users, Trash2 } from 'lucide-react';
+import { Plus, Edit2, Check, X, Users, Trash2, Search } from 'lucide-react';
 
 interface User {
   id: number;
@@ -26,6 +26,9 @@ export default function UserManager() {
   const [isCreating, setIsCreating] = useState(false);
   const [editingUser, setEditingUser] = useState<User | null>(null);
   const [isSubmitting, setIsSubmitting] = useState(false);
+  const [query, setQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   // Form State
   const [email, setEmail] = useState('');
@@ -37,16 +40,35 @@ export default function UserManager() {
     fetchData();
   }, []);
 
+  // 検索語の入力が落ち着いてからサーバー側で検索する (初回は fetchData が取得)
+  const isFirstQuery = React.useRef(true);
+  useEffect(() => {
+    if (isFirstQuery.current) {
+      isFirstQuery.current = false;
+      return;
+    }
+    const timer = setTimeout(() => {
+      fetchUsers().catch(error => console.error("Failed to search users:", error.response?.data || error.message));
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const fetchUsers = async (cursor?: number) => {
+    const params: any = { limit: 50 };
+    if (cursor) params.cursor = cursor;
+    if (query.trim()) params.q = query.trim();
+    const usersRes = await axios.get('/api/users', { params, withCredentials: true });
+    setUsers(prev => cursor ? [...prev, ...usersRes.data.items] : usersRes.data.items);
+    setNextCursor(usersRes.data.next_cursor);
+  };
+
   const fetchData = async () => {
     try {
       setLoading(true);
-      const [usersRes, orgsRes] = await Promise.all([
-        axios.get('/api/users', { withCredentials: true }),
+      const [, orgsRes] = await Promise.all([
+        fetchUsers(),
         axios.get('/api/organizations', { withCredentials: true })
       ]);
-      console.log("Fetched users:", usersRes.data);
-      console.log("Fetched organizations:", orgsRes.data);
-      setUsers(usersRes.data);
       setOrgs(orgsRes.data);
       initAssignments(orgsRes.data);
     } catch (error: any) {
@@ -59,6 +81,18 @@ export default function UserManager() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setIsLoadingMore(true);
+      await fetchUsers(nextCursor);
+    } catch (error: any) {
+      console.error("Failed to fetch users:", error.response?.data || error.message);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const initAssignments = (orgList: Organization[], existingUser?: User) => {
     const assignments: any = {};
     orgList.forEach((o: Organization) => {
@@ -165,6 +199,17 @@ export default function UserManager() {
         </button>
       </div>
 
+      <div className="relative">
+        <Search className="h-4 w-4 text-slate-400 absolute left-3 top-1/2 -translate-y-1/2" />
+        <input
+          type="text"
+          className="glass-input w-full p-2 pl-9 text-sm"
+          placeholder="名前・メールアドレスで検索"
+          value={query}
+          onChange={e => setQuery(e.target.value)}
+        />
+      </div>
+
       {isCreating && (
         <div className="glass-card p-6 animate-in slide-in-from-top-2">
           <h3 className="font-bold mb-4">ユーザーを新規作成</h3>
@@ -345,6 +390,14 @@ export default function UserManager() {
           </tbody>
         </table>
       </div>
+
+      {nextCursor && (
+        <div className="text-center">
+          <button onClick={loadMore} disabled={isLoadingMore} className="px-4 py-2 text-sm text-sage-700 hover:bg-sage-50 rounded-lg disabled:opacity-50">
+            {isLoadingMore ? '読み込み中...' : 'さらに読み込む'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -1,6 +1,6 @@
 'use client';
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { MessageSquare, Heart, RefreshCw, BarChart2, CheckCircle2, User, Sparkles, Reply, ChevronDown, ChevronUp } from 'lucide-react';
 import { format } from 'date-fns';
@@ -9,6 +9,7 @@ import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import remarkBreaks from 'remark-breaks';
 import RichTextEditor from '@/components/ui/RichTextEditor';
+import { postEventStream } from '@/lib/eventStream';
 
 // Define types locally or import if shared. Since CasualPost is specific here:
 interface CasualPost {
@@ -23,6 +24,24 @@ interface CasualPost {
   children?: CasualPost[];
 }
 
+interface CasualFeed {
+  posts: CasualPost[];
+  next_cursor: string | null;
+  latest_cursor: string | null;
+  has_more: boolean;
+}
+
+// 一覧の項目（本文は含まない。開いたときに GET /api/casual/analyses/{id} で取得）
+interface AnalysisSummary {
+  id: number;
+  created_at: string;
+  start_date: string;
+  end_date: string;
+  is_published: boolean;
+  recommendation_count: number;
+  message?: string | null;
+}
+
 interface AnalysisReport {
   id: number;
   created_at: string;
@@ -53,9 +72,15 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
   const [submitting, setSubmitting] = useState(false);
   const [refreshing, setRefreshing] = useState(false);
   const [isComposerOpen, setIsComposerOpen] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  // 取得済みの投稿（フラット）と差分同期用カーソル
+  const postsByIdRef = useRef<Map<number, CasualPost>>(new Map());
+  const latestCursorRef = useRef<string | null>(null);
 
   // Analysis State
-  const [analyses, setAnalyses] = useState<AnalysisReport[]>([]);
+  const [analyses, setAnalyses] = useState<AnalysisSummary[]>([]);
   const [analyzing, setAnalyzing] = useState(false);
   const [selectedAnalysis, setSelectedAnalysis] = useState<AnalysisReport | null>(null);
 
@@ -77,34 +102,64 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
   const isAdmin = user?.role === 'system_admin' || user?.org_role === 'admin';
 
   useEffect(() => {
+    postsByIdRef.current = new Map();
+    latestCursorRef.current = null;
     fetchPosts();
     fetchAnalyses();
   }, [user]);
 
+  const rebuildTree = () => {
+    // Build tree structure (newest first)
+    const allPosts = Array.from(postsByIdRef.current.values()).sort((a, b) =>
+      b.created_at.localeCompare(a.created_at) || b.id - a.id
+    );
+    const postsMap = new Map<number, CasualPost>();
+    const rootPosts: CasualPost[] = [];
+
+    allPosts.forEach((post: CasualPost) => {
+      postsMap.set(post.id, { ...post, children: [] });
+    });
+
+    allPosts.forEach((post: CasualPost) => {
+      const postWithChildren = postsMap.get(post.id)!;
+      if (post.parent_id && postsMap.has(post.parent_id)) {
+        postsMap.get(post.parent_id)!.children!.push(postWithChildren);
+      } else if (!post.parent_id) {
+        rootPosts.push(postWithChildren);
+      }
+    });
+
+    setPosts(rootPosts);
+  };
+
+  const mergePosts = (newPosts: CasualPost[]) => {
+    newPosts.forEach(post => postsByIdRef.current.set(post.id, post));
+  };
+
   const fetchPosts = async () => {
     try {
       if (!loading) setRefreshing(true);
-      const res = await axios.get('/api/casual/posts');
-      const allPosts = res.data;
 
-      // Build tree structure
-      const postsMap = new Map<number, CasualPost>();
-      const rootPosts: CasualPost[] = [];
-
-      allPosts.forEach((post: CasualPost) => {
-        postsMap.set(post.id, { ...post, children: [] });
-      });
-
-      allPosts.forEach((post: CasualPost) => {
-        const postWithChildren = postsMap.get(post.id)!;
-        if (post.parent_id && postsMap.has(post.parent_id)) {
-          postsMap.get(post.parent_id)!.children!.push(postWithChildren);
-        } else if (!post.parent_id) {
-          rootPosts.push(postWithChildren);
+      if (latestCursorRef.current) {
+        // Delta sync: only posts newer than the last one we have
+        let hasMore = true;
+        while (hasMore) {
+          const res = await axios.get<CasualFeed>('/api/casual/feed', {
+            params: { since: latestCursorRef.current }
+          });
+          mergePosts(res.data.posts);
+          latestCursorRef.current = res.data.latest_cursor;
+          hasMore = res.data.has_more;
         }
-      });
+      } else {
+        const res = await axios.get<CasualFeed>('/api/casual/feed');
+        postsByIdRef.current = new Map();
+        mergePosts(res.data.posts);
+        latestCursorRef.current = res.data.latest_cursor;
+        setNextCursor(res.data.next_cursor);
+      }
 
-      setPosts(rootPosts);
+      rebuildTree();
     } catch (e) {
       console.error(e);
     } finally {
@@ -113,6 +168,23 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
     }
   };
 
+  const loadMorePosts = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await axios.get<CasualFeed>('/api/casual/feed', {
+        params: { cursor: nextCursor }
+      });
+      mergePosts(res.data.posts);
+      setNextCursor(res.data.next_cursor);
+      rebuildTree();
+    } catch (e) {
+      console.error(e);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchAnalyses = async () => {
     try {
       const res = await axios.get('/api/casual/analyses');
@@ -141,6 +213,10 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
   const handleLike = async (postId: number) => {
     try {
       const res = await axios.post(`/api/casual/posts/${postId}/like`);
+      const cached = postsByIdRef.current.get(postId);
+      if (cached) {
+        postsByIdRef.current.set(postId, { ...cached, likes_count: res.data.likes_count, is_liked_by_me: res.data.liked });
+      }
       // Update posts recursively
       const updateLikes = (posts: CasualPost[]): CasualPost[] => {
         return posts.map(p => {
@@ -159,19 +235,45 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
     }
   };
 
+  const openAnalysis = async (analysis: AnalysisSummary) => {
+    try {
+      const res = await axios.get(`/api/casual/analyses/${analysis.id}`);
+      setSelectedAnalysis(res.data);
+    } catch (e) {
+      console.error(e);
+      alert('分析レポートの取得に失敗しました');
+    }
+  };
+
   const handleAnalyze = async () => {
     if (!confirm(`${startDate} から ${endDate} までの投稿を分析しますか？`)) return;
     setAnalyzing(true);
     try {
-      await axios.post('/api/casual/analyze', {}, {
-        params: {
-          start_date: startDate,
-          end_date: endDate
+      // SSE: 推奨テーマを生成された順にモーダルへ表示し、保存後の result で確定する
+      const recommendations: Recommendation[] = [];
+      let saved = null as AnalysisReport | null; // set in the callback
+      const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+      await postEventStream(`/api/casual/analyze/stream?${params}`, {}, (event, data) => {
+        if (event === 'recommendation') {
+          recommendations.push(data);
+          setSelectedAnalysis({
+            id: 0,
+            created_at: new Date().toISOString(),
+            start_date: startDate,
+            end_date: endDate,
+            is_published: false,
+            result: { recommendations: [...recommendations] }
+          });
+        } else if (event === 'result') {
+          saved = data;
         }
       });
+      if (!saved) throw new Error('stream ended without result');
+      setSelectedAnalysis(saved.id ? saved : null);
       fetchAnalyses(); // Refresh list
       alert('分析が完了しました');
     } catch (e) {
+      setSelectedAnalysis(null);
       alert('分析に失敗しました');
     } finally {
       setAnalyzing(false);
@@ -301,6 +403,17 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
               />
             ))
           )}
+          {!loading && nextCursor && (
+            <div className="flex justify-center pt-2">
+              <button
+                onClick={loadMorePosts}
+                disabled={loadingMore}
+                className={`px-4 py-2 text-sm font-medium text-amber-700 bg-white/80 border border-amber-200 rounded-lg shadow-sm hover:bg-white transition-all ${loadingMore ? 'opacity-50 cursor-not-allowed' : ''}`}
+              >
+                {loadingMore ? '読み込み中...' : 'さらに読み込む'}
+              </button>
+            </div>
+          )}
         </div>
 
 
@@ -483,11 +596,11 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
                     )}
                   </div>
                   <div
-                    onClick={() => setSelectedAnalysis(analysis)}
+                    onClick={() => openAnalysis(analysis)}
                     className="cursor-pointer"
                   >
                     <div className="text-[10px] text-gray-500 truncate mb-2">
-                      期間: {format(new Date(analysis.start_date), 'M/d', { locale: ja })} - {format(new Date(analysis.end_date), 'M/d', { locale: ja })}
+                      期間: {format(new Date(analysis.start_date), 'M/d', { locale: ja })} - {format(new Date(analysis.end_date), 'M/d', { locale: ja })}・提案 {analysis.recommendation_count}件
                     </div>
 
                     <div className="flex items-center justify-between">
@@ -599,7 +712,8 @@ export default function CasualChatBoard({ user }: CasualChatBoardProps) {
                 )}
               </div>
 
-              {isAdmin && (
+              {/* id 0: 分析をストリーミング中（まだ保存されていない） */}
+              {isAdmin && selectedAnalysis.id > 0 && (
                 <div className="mt-8 pt-6 border-t border-sage-100 flex items-center justify-between bg-sage-50/30 -mx-6 -mb-6 p-6">
                   <p className="text-xs text-sage-700 max-w-[60%]">
                     ※ 「公開」に設定すると、一般メンバーもこの分析レポート（推奨テーマと質問案）を閲覧できるようになります。
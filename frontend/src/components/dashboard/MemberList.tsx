@@ -2,7 +2,7 @@
 
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { Users, Shield, Settings } from 'lucide-react';
+import { Users, Shield, Settings, Search } from 'lucide-react';
 import Link from 'next/link';
 
 interface Member {
@@ -15,22 +15,45 @@ interface Member {
 export default function MemberList({ user }: { user: any }) {
   const [members, setMembers] = useState<Member[]>([]);
   const [loading, setLoading] = useState(true);
+  const [query, setQuery] = useState('');
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  const fetchMembers = async (cursor?: number) => {
+    if (!user?.current_org_id) return;
+    const params: any = { limit: 50 };
+    if (cursor) params.cursor = cursor;
+    if (query.trim()) params.q = query.trim();
+    const res = await axios.get(`/api/organizations/${user.current_org_id}/members`, { params, withCredentials: true });
+    setMembers(prev => cursor ? [...prev, ...res.data.items] : res.data.items);
+    setNextCursor(res.data.next_cursor);
+  };
 
   useEffect(() => {
-    const fetchMembers = async () => {
-      if (!user?.current_org_id) return;
+    // 検索語の入力が落ち着いてからサーバー側で検索する
+    const timer = setTimeout(async () => {
       try {
-        setLoading(true);
-        const res = await axios.get(`/api/organizations/${user.current_org_id}/members`, { withCredentials: true });
-        setMembers(res.data);
+        await fetchMembers();
       } catch (error) {
         console.error("Failed to fetch members", error);
       } finally {
         setLoading(false);
       }
-    };
-    fetchMembers();
-  }, [user?.current_org_id]);
+    }, query ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [user?.current_org_id, query]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setIsLoadingMore(true);
+      await fetchMembers(nextCursor);
+    } catch (error) {
+      console.error("Failed to fetch members", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   if (loading) return <div className="text-center py-12">読み込み中...</div>;
 
@@ -53,6 +76,17 @@ export default function MemberList({ user }: { user: any }) {
         )}
       </div>
 
+      <div className="relative mb-4">
+        <Search className="h-4 w-4 text-slate-400 absolute left-3 top-1/2 -translate-y-1/2" />
+        <input
+          type="text"
+          className="glass-input w-full p-2 pl-9 text-sm"
+          placeholder="名前・メールアドレスで検索"
+          value={query}
+          onChange={e => setQuery(e.target.value)}
+        />
+      </div>
+
       {/* Desktop Table View */}
       <div className="hidden md:block overflow-hidden rounded-xl border border-gray-200">
         <table className="w-full text-left text-sm">
@@ -110,6 +144,14 @@ export default function MemberList({ user }: { user: any }) {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="mt-4 text-center">
+          <button onClick={loadMore} disabled={isLoadingMore} className="px-4 py-2 text-sm text-sage-700 hover:bg-sage-50 rounded-lg disabled:opacity-50">
+            {isLoadingMore ? '読み込み中...' : 'さらに読み込む'}
+          </button>
+        </div>
+      )}
+
       <div className="mt-8 pt-4 border-t border-gray-100 text-center text-xs text-slate-400">
         ※ メンバーの追加・招待はシステム管理画面から可能です
       </div>
@@ -4,6 +4,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { Bell, Check, ExternalLink, Clock } from 'lucide-react';
 import axios from 'axios';
 import { useRouter } from 'next/navigation';
+import { fetchBootstrap } from '@/lib/bootstrap';
 
 interface Notification {
   id: number;
@@ -13,6 +14,8 @@ interface Notification {
   link: string;
   is_read: boolean;
   created_at: string;
+  count?: number;
+  updated_at?: string | null;
 }
 
 export default function NotificationBell() {
@@ -20,6 +23,7 @@ export default function NotificationBell() {
   const [isOpen, setIsOpen] = useState(false);
   const [unreadCount, setUnreadCount] = useState(0);
   const dropdownRef = useRef<HTMLDivElement>(null);
+  const isOpenRef = useRef(false);
   const router = useRouter();
 
   const fetchNotifications = async () => {
@@ -27,18 +31,63 @@ export default function NotificationBell() {
       const res = await axios.get('/api/notifications', { withCredentials: true });
       if (Array.isArray(res.data)) {
         setNotifications(res.data);
-        setUnreadCount(res.data.filter((n: Notification) => !n.is_read).length);
       }
     } catch (err) {
       console.error('Failed to fetch notifications:', err);
     }
   };
 
+  const fetchUnreadCount = async () => {
+    try {
+      const res = await axios.get('/api/notifications/unread-count', { withCredentials: true });
+      setUnreadCount(res.data.unread_count ?? 0);
+    } catch (err) {
+      console.error('Failed to fetch unread count:', err);
+    }
+  };
+
   useEffect(() => {
-    fetchNotifications();
-    // Poll every minute
-    const interval = setInterval(fetchNotifications, 60000);
-    return () => clearInterval(interval);
+    // Initial list and count come with the dashboard bootstrap; the full list is fetched when the dropdown opens
+    fetchBootstrap()
+      .then(data => {
+        setNotifications(data.notifications);
+        setUnreadCount(data.unread_count);
+      })
+      .catch(() => {
+        fetchNotifications();
+        fetchUnreadCount();
+      });
+
+    // Realtime updates via Server-Sent Events
+    const source = new EventSource('/api/notifications/stream', { withCredentials: true });
+    const handleCount = (event: MessageEvent) => {
+      try {
+        const data = JSON.parse(event.data);
+        setUnreadCount(data.unread_count ?? 0);
+      } catch (err) {
+        console.error('Failed to parse notification event:', err);
+      }
+    };
+    source.addEventListener('unread_count', handleCount);
+    source.addEventListener('notification', (event) => {
+      handleCount(event as MessageEvent);
+      // The list is refetched when the dropdown opens; only refresh it now if it is visible
+      if (isOpenRef.current) {
+        fetchNotifications();
+      }
+    });
+
+    // Fallback: poll the lightweight counter only while the stream is down
+    const interval = setInterval(() => {
+      if (source.readyState !== EventSource.OPEN) {
+        fetchUnreadCount();
+      }
+    }, 60000);
+
+    return () => {
+      clearInterval(interval);
+      source.close();
+    };
   }, []);
 
   useEffect(() => {
@@ -51,6 +100,10 @@ export default function NotificationBell() {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, []);
 
+  useEffect(() => {
+    isOpenRef.current = isOpen;
+  }, [isOpen]);
+
   const handleToggle = () => {
     setIsOpen(!isOpen);
     if (!isOpen) {
@@ -151,11 +204,14 @@ export default function NotificationBell() {
                       </span>
                       <span className="text-[10px] text-slate-400 flex items-center gap-1">
                         <Clock className="h-3 w-3" />
-                        {formatTime(n.created_at)}
+                        {formatTime(n.updated_at || n.created_at)}
                       </span>
                     </div>
                     <h4 className={`text-sm font-bold mb-1 ${!n.is_read ? 'text-slate-900' : 'text-slate-600'}`}>
                       {n.title}
+                      {(n.count ?? 1) > 1 && (
+                        <span className="ml-1 text-xs font-medium text-slate-400">({n.count}件)</span>
+                      )}
                     </h4>
                     <p className="text-xs text-slate-500 line-clamp-2 leading-relaxed">
                       {n.content}
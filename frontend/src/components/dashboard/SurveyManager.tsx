@@ -276,6 +276,9 @@ export default function SurveyManager({ user: propUser }: { user?: User }) {
                           </span>
                         )}
                         <h4 className="font-bold text-slate-700">{survey.title}</h4>
+                        {isAdmin && survey.approval_status === 'approved' && (
+                          <span className="text-xs text-slate-400 whitespace-nowrap">回答 {survey.response_count ?? 0}件</span>
+                        )}
                       </div>
 
                     </div>
@@ -0,0 +1,74 @@
+import axios from 'axios';
+import { SurveySummary } from '@/types/dashboard';
+
+export interface BootstrapUser {
+  id: number;
+  email: string;
+  username: string;
+  role: string;
+  must_change_password: boolean;
+  current_org_id?: number | null;
+  org_role?: string | null;
+}
+
+export interface BootstrapOrganization {
+  id: number;
+  name: string;
+  description?: string | null;
+  created_at: string;
+}
+
+export interface BootstrapNotification {
+  id: number;
+  type: string;
+  title: string;
+  content: string;
+  link: string;
+  is_read: boolean;
+  created_at: string;
+  count?: number;
+  updated_at?: string | null;
+}
+
+export interface BootstrapSession {
+  id: number;
+  title: string;
+  theme: string;
+  is_published: boolean;
+  created_at: string;
+}
+
+export interface BootstrapData {
+  user: BootstrapUser;
+  organizations: BootstrapOrganization[];
+  notifications: BootstrapNotification[];
+  unread_count: number;
+  sessions: BootstrapSession[];
+  surveys: SurveySummary[];
+}
+
+// Sidebar, header and dashboard mount together; they share one request instead of five
+const REUSE_MS = 5000;
+
+let pending: Promise<BootstrapData> | null = null;
+let fetchedAt = 0;
+
+export function fetchBootstrap(): Promise<BootstrapData> {
+  if (pending && Date.now() - fetchedAt < REUSE_MS) {
+    return pending;
+  }
+  fetchedAt = Date.now();
+  pending = axios.get<BootstrapData>('/api/dashboard/bootstrap', { withCredentials: true })
+    .then(res => res.data)
+    .catch(err => {
+      // Do not hand a failed response (e.g. 401 before login) to the next caller
+      pending = null;
+      throw err;
+    });
+  return pending;
+}
+
+// Call after changes the cached payload would hide (org switch, profile update, logout)
+export function invalidateBootstrap() {
+  pending = null;
+}
@@ -45,4 +45,5 @@ export interface SurveySummary {
   rejection_reason?: string;
   description?: string;
   created_by?: number;
+  response_count?: number;
 }
@@ -0,0 +1,115 @@
+"""
+Serialization / compression micro-benchmark for a large report payload.
+
+Builds a synthetic SessionDetail with 20,000 analysis results (no database needed)
+and prints, for each JSON encoder the API uses, the median encode time and body
+size, then the size and time of each response compression:
+
+    python scripts/benchmark_serialization.py [--results 20000] [--repeat 5]
+
+Encoders:
+  - jsonable_encoder + json.dumps: FastAPI's path for handlers without a response model
+  - orjson: cached list bodies without a model, report snapshots
+  - TypeAdapter.dump_json: Pydantic's Rust serializer (response_model handlers, cached lists)
+"""
+import sys
+import os
+import json
+import gzip
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend.api.dashboard import SessionDetail
+from backend.services.compression import brotli, RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY
+
+WORDS = ["会議", "残業", "評価", "連絡", "育成", "在宅勤務", "休暇", "面談", "資料", "引き継ぎ", "目標", "相談"]
+
+
+def build_detail(n_results: int) -> dict:
+    rng = random.Random(0)
+    results = []
+    for i in range(n_results):
+        text = "、".join(rng.choice(WORDS) for _ in range(12)) + f"について改善してほしい（{i}）"
+        cluster = rng.randint(-1, 14)
+        results.append({
+            "sub_topic": f"トピック{cluster}",
+            "summary": text[:40],
+            "original_text": text,
+            "x": rng.uniform(-10, 10),
+            "y": rng.uniform(-10, 10),
+            "cluster_id": cluster,
+            "is_noise": cluster == -1,
+        })
+    return {
+        "id": 1,
+        "title": "ベンチマーク",
+        "theme": "職場環境",
+        "is_published": True,
+        "report_content": json.dumps([{"id": f"issue-{k}", "title": f"課題{k}"} for k in range(10)], ensure_ascii=False),
+        "results": results,
+        "comments": [],
+        "comment_analysis": None,
+        "is_comment_analysis_published": False,
+        "created_at": datetime(2026, 1, 1),
+    }
+
+def measure(fn, repeat: int):
+    times = []
+    out = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000, out
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report payload serialization benchmark")
+    parser.add_argument("--results", type=int, default=20000, help="number of analysis results")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is printed)")
+    args = parser.parse_args()
+
+    raw = build_detail(args.results)
+    adapter = TypeAdapter(SessionDetail)
+    model = adapter.validate_python(raw)
+
+    encoders = [
+        ("jsonable_encoder + json.dumps", lambda: json.dumps(
+            jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+        ("orjson (plain dicts)", lambda: orjson.dumps(raw)),
+        ("TypeAdapter.dump_json (model)", lambda: adapter.dump_json(model)),
+    ]
+    print(f"SessionDetail with {args.results} results, median of {args.repeat} runs\n")
+    print(f"{'encoder':<32} {'ms':>9} {'bytes':>12}")
+    body = None
+    for name, fn in encoders:
+        ms, out = measure(fn, args.repeat)
+        body = body or out
+        print(f"{name:<32} {ms:>9.1f} {len(out):>12,}")
+
+    compressors = [("identity", lambda: body)]
+    compressors.append((f"gzip level {RESPONSE_GZIP_LEVEL}", lambda: gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)))
+    compressors.append(("gzip level 9 (snapshots)", lambda: gzip.compress(body, compresslevel=9)))
+    if brotli is not None:
+        compressors.append((f"brotli quality {RESPONSE_BROTLI_QUALITY}", lambda: brotli.compress(
+            body, quality=RESPONSE_BROTLI_QUALITY, mode=brotli.MODE_TEXT)))
+    else:
+        print("\n(brotli is not installed; skipping brotli)")
+
+    print(f"\n{'compression':<32} {'ms':>9} {'bytes':>12} {'ratio':>7}")
+    for name, fn in compressors:
+        ms, out = measure(fn, args.repeat)
+        print(f"{name:<32} {ms:>9.1f} {len(out):>12,} {len(out) / len(body):>7.1%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Query plan regression check for hot endpoints.
+
+Runs EXPLAIN on the queries behind the busiest endpoints against the configured
+database (DATABASE_URL) and exits with status 1 if any of them reads a table with
+a full sequential scan. Run it after seeding (scripts/seed_db.py) and after schema
+changes, e.g. in CI:
+
+    python scripts/check_query_plans.py
+
+On PostgreSQL, sequential scans are disabled for the check session so the planner
+picks an index whenever one exists; a remaining Seq Scan means no usable index.
+"""
+import sys
+import os
+import json
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, tuple_
+
+from backend.database import (
+    engine, User, OrganizationMember, Answer, Comment, Notification,
+    CasualPost, AnalysisResult, UserSession, CasualPostLike, SurveyParticipation,
+    OrganizationDailyStat, OrganizationMemberActivity
+)
+from backend.api.users import user_search_filter
+
+NOW = datetime(2026, 1, 1)
+
+# (name, statement, dialects it applies to or None for all)
+HOT_QUERIES = [
+    ("auth: session lookup",
+     select(UserSession).where(UserSession.id == "token"), None),
+    ("auth: membership check",
+     select(OrganizationMember).where(OrganizationMember.user_id == 1, OrganizationMember.organization_id == 1), None),
+    ("organizations: members page",
+     select(OrganizationMember, User.username).join(User, User.id == OrganizationMember.user_id).where(
+         OrganizationMember.organization_id == 1, OrganizationMember.id < 1000
+     ).order_by(OrganizationMember.id.desc()).limit(51), None),
+    # SQLite's LIKE is case-insensitive and cannot use the lower() expression index
+    ("users: prefix search",
+     select(User.id).where(user_search_filter("adm")).order_by(User.id.desc()).limit(51), {"postgresql"}),
+    ("casual: feed page",
+     select(CasualPost).where(
+         CasualPost.organization_id == 1,
+         tuple_(CasualPost.created_at, CasualPost.id) < tuple_(NOW, 1000)
+     ).order_by(CasualPost.created_at.desc(), CasualPost.id.desc()).limit(51), None),
+    ("casual: posts per day",
+     select(func.date(CasualPost.created_at), func.count(CasualPost.id)).where(
+         CasualPost.organization_id == 1,
+         CasualPost.created_at >= NOW - timedelta(days=30),
+         CasualPost.created_at <= NOW
+     ).group_by(func.date(CasualPost.created_at)), None),
+    ("casual: liked by me",
+     select(CasualPostLike.post_id).where(CasualPostLike.post_id.in_([1, 2, 3]), CasualPostLike.user_id == 1), None),
+    ("notifications: list",
+     select(Notification).where(Notification.user_id == 1).order_by(Notification.updated_at.desc()).limit(99), None),
+    ("notifications: coalesce candidates",
+     select(Notification.id, Notification.user_id).where(
+         Notification.user_id.in_([1, 2, 3]),
+         Notification.type == "chat_new",
+         Notification.link == "/dashboard",
+         Notification.is_read == False,
+         Notification.updated_at >= NOW - timedelta(hours=1)
+     ), None),
+    ("dashboard: session results",
+     select(AnalysisResult).where(AnalysisResult.session_id == 1).order_by(AnalysisResult.id.desc()), None),
+    ("dashboard: session comments",
+     select(Comment).where(Comment.session_id == 1).order_by(Comment.id.desc()), None),
+    ("dashboard: thread replies",
+     select(Comment).where(Comment.parent_id == 1, Comment.session_id == 1).order_by(Comment.created_at.asc()), None),
+    ("surveys: answered check",
+     select(SurveyParticipation.id).where(SurveyParticipation.survey_id == 1, SurveyParticipation.user_id == 1), None),
+    ("surveys: answers of a survey",
+     select(Answer).where(Answer.survey_id == 1), None),
+    ("analysis: answers of a question",
+     select(Answer).where(Answer.question_id == 1), None),
+    ("stats: organization window",
+     select(OrganizationDailyStat).where(
+         OrganizationDailyStat.organization_id == 1,
+         OrganizationDailyStat.metric.in_(["survey_responses", "casual_posts"]),
+         OrganizationDailyStat.stat_date >= (NOW - timedelta(days=30)).date()
+     ), None),
+    ("stats: all organizations window",
+     select(OrganizationDailyStat.organization_id, func.sum(OrganizationDailyStat.value)).where(
+         OrganizationDailyStat.metric == "casual_posts",
+         OrganizationDailyStat.stat_date >= (NOW - timedelta(days=30)).date()
+     ).group_by(OrganizationDailyStat.organization_id), None),
+    ("stats: active members",
+     select(func.count()).select_from(OrganizationMemberActivity).where(
+         OrganizationMemberActivity.organization_id == 1,
+         OrganizationMemberActivity.last_active_on >= (NOW - timedelta(days=30)).date()
+     ), None),
+]
+
+
+def _compile(stmt, dialect):
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    return str(compiled), params
+
+def _pg_seq_scans(plan) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(f"Seq Scan on {plan.get('Relation Name')}")
+    for child in plan.get("Plans", []):
+        found.extend(_pg_seq_scans(child))
+    return found
+
+def explain(conn, stmt) -> tuple:
+    """Returns (plan_lines, full_scans) for one statement."""
+    sql, params = _compile(stmt, conn.dialect)
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        lines = conn.exec_driver_sql("EXPLAIN " + sql, params).scalars().all()
+        return lines, _pg_seq_scans(root)
+
+    # SQLite: "SCAN <table>" without an index is a full table scan
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).all()
+    lines = [row[-1] for row in rows]
+    full_scans = [line for line in lines if line.startswith("SCAN ") and " USING " not in line]
+    return lines, full_scans
+
+def main() -> int:
+    failures = 0
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+
+        for name, stmt, dialects in HOT_QUERIES:
+            if dialects and dialect not in dialects:
+                print(f"[SKIP] {name} ({dialect})")
+                continue
+            lines, full_scans = explain(conn, stmt)
+            if full_scans:
+                failures += 1
+                print(f"[FAIL] {name}: {', '.join(full_scans)}")
+                for line in lines:
+                    print(f"         {line}")
+            else:
+                print(f"[ OK ] {name}")
+
+    print(f"\n{len(HOT_QUERIES)} queries checked, {failures} with full table scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Rebuild the organization dashboard rollups from the source tables.
+
+The rollup tables (organization_daily_stats, organization_stats,
+organization_member_activity) are maintained incrementally by the API write
+paths. Run this after importing data outside the API, or to repair drift:
+
+    python scripts/rebuild_rollups.py                # all organizations
+    python scripts/rebuild_rollups.py --org-id 3     # one organization
+
+Each organization is rebuilt in its own transaction.
+"""
+import sys
+import os
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import SessionLocal, Organization
+from backend.services.rollup_service import rebuild_rollups
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild organization dashboard rollups.")
+    parser.add_argument("--org-id", type=int, help="Rebuild only this organization.")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        query = db.query(Organization.id, Organization.name).order_by(Organization.id)
+        if args.org_id:
+            query = query.filter(Organization.id == args.org_id)
+        organizations = query.all()
+        if not organizations:
+            print("No organizations found")
+            return 1
+
+        for org_id, name in organizations:
+            try:
+                rebuild_rollups(db, org_id)
+                db.commit()
+                print(f"[ OK ] {org_id} {name}")
+            except Exception as e:
+                db.rollback()
+                print(f"[FAIL] {org_id} {name}: {e}")
+                return 1
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -156,7 +156,6 @@ def create_dummy_sessions(db):
             new_form_themes = ['kpt', 'bukai', 'service_spirit', 'organization', 'oneonone_unit']
             if s_data["theme"] in new_form_themes:
                 # Generate simple report for new forms
-                import json
                 report_templates = {
                     "kpt": [
                         {"title": "振り返りプロセスの改善", "description": "KPTの運用方法や振り返りの質向上に関する提案が多数寄せられています。", "urgency": "medium", "category": "Organizational"},
@@ -189,7 +188,7 @@ def create_dummy_sessions(db):
                         {"title": "【要注意】深刻な懸念（Small Voice）", "description": "少数ですが、1on1の守秘義務違反やユニット活動の強制参加に関する深刻な指摘が存在します。", "urgency": "high", "category": "Organizational"}
                     ]
                 }
-                issue_content = json.dumps(report_templates.get(s_data["theme"], []), ensure_ascii=False)
+                issue_content = report_templates.get(s_data["theme"], [])
             else:
                 # Use existing generator for old forms
                 _, issue_content = generate_mock_analysis_data(new_session.theme, num_points=80)
@@ -612,6 +611,14 @@ if __name__ == "__main__":
             else:
                 create_casual_posts(db, users, num_posts=100)
 
+        # Seeded rows bypass the API write paths, so recompute the dashboard rollups
+        if args.seed_sessions or args.seed_comments or args.seed_casual or args.with_dummy_data:
+            from backend.services.rollup_service import rebuild_rollups
+            for (org_id,) in db.query(Organization.id).all():
+                rebuild_rollups(db, org_id)
+            db.commit()
+            print("✅ Dashboard rollups rebuilt")
+
         if not (args.init_users or args.seed_sessions or args.seed_comments or args.seed_casual or args.with_dummy_data):
             print("\nℹ️  No actions selected. Use flags:")
             print("  --init-users     : Create users")